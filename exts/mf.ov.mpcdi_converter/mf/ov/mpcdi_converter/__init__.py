@@ -5,4 +5,10 @@ from pxr import Plug
 pluginsRoot = os.path.join(os.path.dirname(__file__), '../../../plugin/resources')
 Plug.Registry().RegisterPlugins(pluginsRoot)
 
-from .extension import *
+try:
+    import omni.ext  # noqa: F401
+except ImportError:
+    # Running outside of Kit (e.g. the batch converter), only the pxr based modules are usable.
+    pass
+else:
+    from .extension import *
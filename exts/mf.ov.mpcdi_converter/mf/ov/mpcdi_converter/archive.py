@@ -0,0 +1,315 @@
+import io
+import mmap
+import os
+import posixpath
+import struct
+import zipfile
+
+import numpy as np
+
+
+ARCHIVE_SUFFIX = ".mpcdi"
+DOCUMENT_NAME = "mpcdi.xml"
+
+_ZIP_MAGIC = b"PK\x03\x04"
+# Fixed part of a zip local file header, the member data starts after it and its variable length name and extra.
+_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+_PFM_MAX_LINE = 256
+
+
+def is_archive(buffer) -> bool:
+    """Check the zip signature of an in-memory MPCDI file."""
+    return bytes(memoryview(buffer)[:len(_ZIP_MAGIC)]) == _ZIP_MAGIC
+
+
+def is_archive_path(path: str) -> bool:
+    return path.lower().endswith(ARCHIVE_SUFFIX)
+
+
+def _normalize_member_name(name: str) -> str:
+    # Paths of the <files> section are relative to mpcdi.xml and may use either separator.
+    return posixpath.normpath(name.replace("\\", "/")).lstrip("/")
+
+
+def _map_file(f):
+    try:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+        # Empty files cannot be mapped.
+        return None
+
+
+def _close_map(mapped):
+    try:
+        mapped.close()
+    except BufferError:
+        # A view handed out by a member is still alive, the map is released once it is garbage collected.
+        pass
+
+
+class _ViewFile(io.RawIOBase):
+    # Seekable read-only file over a buffer for zipfile, io.BytesIO would copy anything that is not a bytes object.
+    def __init__(self, view: memoryview):
+        super().__init__()
+        self._view = view
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._position = max(0, offset)
+        return self._position
+
+    def readinto(self, b):
+        chunk = self._view[self._position:self._position + len(b)]
+        b[:len(chunk)] = chunk
+        self._position += len(chunk)
+        return len(chunk)
+
+
+class _PackageMember:
+    # Common part of archive and folder members: the content is loaded on the first call to buffer().
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.size = size
+        self._buffer = None
+
+    def _load(self):
+        raise NotImplementedError()
+
+    def buffer(self) -> memoryview:
+        """Content of the member, read on first access."""
+        if self._buffer is None:
+            self._buffer = self._load()
+        return self._buffer
+
+    def release(self):
+        if self._buffer is not None:
+            try:
+                self._buffer.release()
+            except BufferError:
+                # Arrays built on the buffer are still alive, it is released with them.
+                pass
+            self._buffer = None
+
+
+class ArchiveMember(_PackageMember):
+    """A payload file of a .mpcdi archive.
+
+    Members stored without compression in an archive opened from disk are views of the memory-mapped archive, nothing
+    is copied. Compressed members are decompressed on first access.
+    """
+
+    def __init__(self, archive, info: zipfile.ZipInfo):
+        super().__init__(info.filename, info.file_size)
+        self._archive = archive
+        self._info = info
+        # Identifies the content of the member across imports of the same archive.
+        self.cache_key = (archive.path or "", info.filename, info.CRC, info.file_size)
+
+    def _load(self):
+        view = self._archive._view
+        if view is not None and self._info.compress_type == zipfile.ZIP_STORED:
+            header = _LOCAL_HEADER.unpack_from(view, self._info.header_offset)
+            nameLength, extraLength = header[-2], header[-1]
+            start = self._info.header_offset + _LOCAL_HEADER.size + nameLength + extraLength
+            return view[start:start + self._info.file_size]
+
+        return memoryview(self._archive._zip.read(self._info))
+
+    def open(self):
+        """Streaming file object over the member, nothing is read up front."""
+        return self._archive._zip.open(self._info)
+
+
+class FileMember(_PackageMember):
+    """A payload file stored next to a bare .mpcdi.xml, memory-mapped on first access."""
+
+    def __init__(self, path: str):
+        super().__init__(os.path.basename(path), os.path.getsize(path))
+        self.path = path
+        self._map = None
+        self.cache_key = (os.path.abspath(path), os.stat(path).st_mtime_ns, self.size)
+
+    def _load(self):
+        with open(self.path, "rb") as f:
+            self._map = _map_file(f)
+        return memoryview(self._map) if self._map is not None else memoryview(b"")
+
+    def open(self):
+        return open(self.path, "rb")
+
+    def release(self):
+        super().release()
+        if self._map is not None:
+            _close_map(self._map)
+            self._map = None
+
+
+class MPCDIPackage:
+    """An MPCDI document and the payload files it references, `filesets` is filled by parse_batches."""
+
+    def __init__(self):
+        self.filesets = {}
+        self._members = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _create_member(self, name: str):
+        raise NotImplementedError()
+
+    def member(self, name: str):
+        """Return the lazily loaded member `name`, relative to the document."""
+        name = _normalize_member_name(name)
+        member = self._members.get(name)
+        if member is None:
+            member = self._create_member(name)
+            self._members[name] = member
+        return member
+
+    def region_members(self, region_id: str) -> dict:
+        """Members referenced by the fileset of `region_id`, by tag (geometryWarpFile, alphaMap...)."""
+        fileset = self.filesets.get(region_id)
+        if fileset is None:
+            return {}
+
+        members = {}
+        for tag in fileset.files:
+            path = fileset.path(tag)
+            if path:
+                members[tag] = self.member(path)
+        return members
+
+    def close(self):
+        for member in self._members.values():
+            member.release()
+        self._members.clear()
+
+
+class MPCDIArchive(MPCDIPackage):
+    """A .mpcdi zip package, opened from a file path or an in-memory buffer.
+
+    Nothing is extracted: mpcdi.xml is streamed out of the zip by open_document and payload members are only read when
+    a region needs them.
+    """
+
+    def __init__(self, source):
+        super().__init__()
+        self.path = os.path.abspath(source) if isinstance(source, str) else None
+        self._file = None
+        self._map = None
+        self._view = None
+        self._zip = None
+        if isinstance(source, str):
+            self._file = open(source, "rb")
+            self._map = _map_file(self._file)
+            if self._map is not None:
+                self._view = memoryview(self._map)
+        else:
+            self._view = memoryview(source).cast("B")
+
+        try:
+            self._zip = zipfile.ZipFile(self._file if self._file is not None else _ViewFile(self._view))
+        except Exception:
+            self.close()
+            raise
+
+        self._names = {_normalize_member_name(name): name for name in self._zip.namelist()}
+        if DOCUMENT_NAME not in self._names:
+            self.close()
+            raise ValueError(f"The archive has no {DOCUMENT_NAME}.")
+
+    def open_document(self):
+        return self._zip.open(self._names[DOCUMENT_NAME])
+
+    def _create_member(self, name: str):
+        if name not in self._names:
+            raise ValueError(f"The archive has no member {name}.")
+        return ArchiveMember(self, self._zip.getinfo(self._names[name]))
+
+    def close(self):
+        super().close()
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._map is not None:
+            _close_map(self._map)
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class MPCDIFolder(MPCDIPackage):
+    """A bare .mpcdi.xml file, its payload files are looked up next to it."""
+
+    def __init__(self, document_path: str):
+        super().__init__()
+        self.document_path = document_path
+        self._directory = os.path.dirname(os.path.abspath(document_path))
+
+    def open_document(self):
+        return open(self.document_path, "rb")
+
+    def _create_member(self, name: str):
+        path = os.path.join(self._directory, *name.split("/"))
+        if not os.path.isfile(path):
+            raise ValueError(f"Cannot find {name} next to {self.document_path}.")
+        return FileMember(path)
+
+
+def open_package(path: str):
+    """Open a local .mpcdi archive or .mpcdi.xml document."""
+    return MPCDIArchive(path) if is_archive_path(path) else MPCDIFolder(path)
+
+
+def read_pfm(buffer) -> np.ndarray:
+    """Return the (height, width, channels) float32 pixels of a PFM file, top row first.
+
+    The array is a view of `buffer`, no pixel is copied.
+    """
+    view = memoryview(buffer).cast("B")
+    header = []
+    position = 0
+    # Magic, width, height and scale, the header ends with the line holding the scale.
+    while len(header) < 4:
+        end = bytes(view[position:position + _PFM_MAX_LINE]).find(b"\n")
+        if end < 0:
+            raise ValueError("Invalid PFM header.")
+        header.extend(bytes(view[position:position + end]).split())
+        position += end + 1
+
+    magic, width, height, scale = header[0], int(header[1]), int(header[2]), float(header[3])
+    if magic == b"PF":
+        channels = 3
+    elif magic == b"Pf":
+        channels = 1
+    else:
+        raise ValueError(f"Unsupported PFM type {magic!r}.")
+
+    dtype = np.dtype("<f4" if scale < 0 else ">f4")
+    count = width * height * channels
+    if len(view) - position < count * dtype.itemsize:
+        raise ValueError("Truncated PFM data.")
+
+    pixels = np.frombuffer(view, dtype=dtype, count=count, offset=position).reshape(height, width, channels)
+    # Rows are stored bottom to top.
+    return pixels[::-1]
@@ -0,0 +1,160 @@
+"""Headless batch conversion of MPCDI files.
+
+    python -m mf.ov.mpcdi_converter.batch <input_dir> [-o <output_dir>] [-j <jobs>]
+
+Only requires pxr, Kit is not needed. Run it from the extension root folder (exts/mf.ov.mpcdi_converter) or add that
+folder to PYTHONPATH.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+from .archive import ARCHIVE_SUFFIX
+from .converter import LAYOUT_FLAT, LAYOUT_PAYLOADS, MPCDIConverterContext, convert_file
+from .profiling import ImportSummary, collect
+
+
+MPCDI_SUFFIX = ".mpcdi.xml"
+MPCDI_SUFFIXES = (MPCDI_SUFFIX, ARCHIVE_SUFFIX)
+
+
+def _mpcdi_suffix(filename: str):
+    for suffix in MPCDI_SUFFIXES:
+        if filename.lower().endswith(suffix):
+            return suffix
+    return None
+
+
+def find_mpcdi_files(input_dir: str):
+    for dirpath, dirnames, filenames in os.walk(input_dir):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if _mpcdi_suffix(filename) is not None:
+                yield os.path.join(dirpath, filename)
+
+
+def _output_path_for(input_path: str, input_dir: str, output_dir: str, extension: str) -> str:
+    relative_path = os.path.relpath(input_path, input_dir)
+    basename = relative_path[:-len(_mpcdi_suffix(relative_path))]
+    return os.path.join(output_dir, basename + extension)
+
+
+def _convert_worker(job):
+    input_path, output_path, instancing, layout = job
+    start = time.perf_counter()
+    report = {
+        "input": input_path,
+        "output": output_path,
+        "bytes": 0,
+        "regions": 0,
+        "seconds": 0.0,
+        "error": None,
+    }
+
+    summary = ImportSummary(input_path)
+    try:
+        report["bytes"] = os.path.getsize(input_path)
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        with collect(summary):
+            context = MPCDIConverterContext()
+            context.instancing = instancing
+            context.layout = layout
+            result = convert_file(input_path, output_path, context)
+        report["regions"] = result.region_count
+    except Exception as e:
+        report["error"] = f"{type(e).__name__}: {e}"
+
+    report["seconds"] = time.perf_counter() - start
+    report["phases_ms"] = summary.phases_ms
+    return report
+
+
+def _print_report(report):
+    if report["error"] is not None:
+        print(f"FAILED  {report['input']}: {report['error']}", flush=True)
+        return
+
+    milliseconds = report["seconds"] * 1000.0
+    regions_per_second = report["regions"] / report["seconds"] if report["seconds"] > 0 else 0.0
+    phases = ", ".join(f"{phase} {value:.1f}" for phase, value in report["phases_ms"].items())
+    print(
+        f"OK      {report['input']} -> {report['output']} "
+        f"({report['regions']} regions, {milliseconds:.1f} ms, {regions_per_second:.0f} regions/s; {phases} ms)",
+        flush=True,
+    )
+
+
+def _print_summary(reports, wall_seconds):
+    succeeded = [r for r in reports if r["error"] is None]
+    failed = len(reports) - len(succeeded)
+    regions = sum(r["regions"] for r in succeeded)
+    megabytes = sum(r["bytes"] for r in succeeded) / (1024 * 1024)
+    cpu_seconds = sum(r["seconds"] for r in reports)
+
+    print("")
+    print(f"Converted {len(succeeded)} file(s), {failed} failure(s), {regions} region(s) in {wall_seconds:.2f} s")
+    if wall_seconds > 0:
+        print(
+            f"Throughput: {len(reports) / wall_seconds:.2f} files/s, {regions / wall_seconds:.0f} regions/s, "
+            f"{megabytes / wall_seconds:.2f} MB/s"
+        )
+    if succeeded:
+        slowest = max(succeeded, key=lambda r: r["seconds"])
+        print(f"Average per file: {cpu_seconds / len(reports) * 1000.0:.1f} ms, "
+              f"slowest: {slowest['input']} ({slowest['seconds'] * 1000.0:.1f} ms)")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m mf.ov.mpcdi_converter.batch",
+        description="Convert every MPCDI file found under a directory to USD.",
+    )
+    parser.add_argument("input_dir", help="Directory walked recursively for *.mpcdi.xml and *.mpcdi files.")
+    parser.add_argument("-o", "--output-dir", default=None,
+                        help="Destination directory, mirrors the input tree. Defaults to the input directory.")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="Number of worker processes (default: number of CPUs).")
+    parser.add_argument("--max-tasks-per-worker", type=int, default=32,
+                        help="Recycle a worker process after this many files to bound its memory usage.")
+    parser.add_argument("--extension", default=".usd", choices=[".usd", ".usda", ".usdc"],
+                        help="Extension of the written USD files.")
+    parser.add_argument("--instancing", action="store_true",
+                        help="Share the projector light settings and boxes through a class prim and instancing.")
+    parser.add_argument("--layout", default=LAYOUT_FLAT, choices=[LAYOUT_FLAT, LAYOUT_PAYLOADS],
+                        help="Write every region in the output file, or one file per buffer loaded as a payload.")
+    args = parser.parse_args(argv)
+
+    input_dir = os.path.abspath(args.input_dir)
+    output_dir = os.path.abspath(args.output_dir) if args.output_dir else input_dir
+    jobs = [
+        (input_path, _output_path_for(input_path, input_dir, output_dir, args.extension), args.instancing,
+         args.layout)
+        for input_path in find_mpcdi_files(input_dir)
+    ]
+
+    if not jobs:
+        print(f"No {' or '.join(MPCDI_SUFFIXES)} file found under {input_dir}")
+        return 0
+
+    processes = max(1, min(args.jobs, len(jobs)))
+    print(f"Converting {len(jobs)} file(s) with {processes} worker(s)...", flush=True)
+
+    reports = []
+    start = time.perf_counter()
+    # Spawn fresh interpreters, forking a process that already loaded USD plugins is not safe.
+    pool_context = multiprocessing.get_context("spawn")
+    with pool_context.Pool(processes=processes, maxtasksperchild=args.max_tasks_per_worker) as pool:
+        for report in pool.imap_unordered(_convert_worker, jobs):
+            _print_report(report)
+            reports.append(report)
+    wall_seconds = time.perf_counter() - start
+
+    _print_summary(reports, wall_seconds)
+
+    return 0 if all(r["error"] is None for r in reports) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
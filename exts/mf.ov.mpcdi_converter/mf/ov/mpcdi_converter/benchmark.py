@@ -0,0 +1,259 @@
+"""Import benchmark of the converter and of the native file format plugin on synthetic documents.
+
+    python -m mf.ov.mpcdi_converter.benchmark [--sizes 10,100,1000,10000,100000] [--targets parse,sdf,stage,native]
+        [--repeat 3] [--buffers 1] [--warp 64x36] [--blend 512x288] [--json results.json]
+        [--baseline baseline.json] [--tolerance 0.15]
+
+Targets:
+  parse   parse_batches alone, the document is streamed and nothing is authored
+  sdf     the Sdf authoring mode of the importer, into the root layer of a live in-memory stage
+  stage   the UsdStage authoring mode of the importer, into a live in-memory stage
+  native  the MpcdiFileFormat plugin, through Sdf.Layer.FindOrOpen and a copy of every region to an in-memory layer
+          (reported as unavailable if it is not built)
+
+Each measure runs in its own process so the peak RSS is the one of a single target and size. The document cache of
+the plugin is disabled, each run of the native target parses the document again. Results are written as JSON, with
+--baseline they are compared to a previous run and the exit code is 1 if one of them is slower than the baseline by
+more than the tolerance.
+"""
+import argparse
+import functools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from pxr import Sdf, Usd
+
+from .archive import open_package
+from .cache import read_extension_version
+from .converter import AUTHORING_MODE_SDF, AUTHORING_MODE_STAGE, MPCDI_ROOT_PATH, MPCDIConverterContext, \
+    author_to_layer, author_to_stage, native_format_available, parse_batches
+from .synthetic import parse_size, write_synthetic
+
+
+TARGETS = ("parse", "sdf", "stage", "native")
+DEFAULT_SIZES = (10, 100, 1000, 10000, 100000)
+DEFAULT_TOLERANCE = 0.15
+_MODULE = "mf.ov.mpcdi_converter.benchmark"
+_EXTENSION_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+
+
+def _peak_rss() -> int:
+    """Peak resident set size of the process in bytes, None where it cannot be read."""
+    # ru_maxrss survives exec on Linux, a worker would report the peak of the benchmark process that forked it when
+    # that one is larger. VmHWM belongs to the address space of the worker only.
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    maxRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return maxRss if sys.platform == "darwin" else maxRss * 1024
+
+
+def _time_importer(path: str, authoring_mode: str) -> float:
+    # Same calls as MPCDIConverterHelper._convert_xml_to_usd for a local file, without the Kit specific parts.
+    context = MPCDIConverterContext()
+    context.authoring_mode = authoring_mode
+    stage = Usd.Stage.CreateInMemory()
+    start = time.perf_counter()
+    with open_package(path) as package:
+        batches = parse_batches(package)
+        if authoring_mode == AUTHORING_MODE_STAGE:
+            author_to_stage(batches, stage, package, context)
+        else:
+            author_to_layer(batches, stage.GetRootLayer(), package, context)
+    # Make sure the recomposition triggered at the end of the change block is accounted for.
+    stage.GetPrimAtPath(MPCDI_ROOT_PATH).GetChildren()
+    return time.perf_counter() - start
+
+
+def _time_parse(path: str) -> float:
+    start = time.perf_counter()
+    with open_package(path) as package:
+        for _ in parse_batches(package):
+            pass
+    return time.perf_counter() - start
+
+
+def _time_native(path: str) -> float:
+    start = time.perf_counter()
+    layer = Sdf.Layer.FindOrOpen(path)
+    if layer is None:
+        raise RuntimeError(f"Cannot open {path}.")
+    # Opening only creates the buffers, the regions are created when they are traversed. Copying the hierarchy like
+    # author_native does populates all of them.
+    copiedLayer = Sdf.Layer.CreateAnonymous(".usdc")
+    Sdf.CopySpec(layer, MPCDI_ROOT_PATH, copiedLayer, MPCDI_ROOT_PATH)
+    elapsed = time.perf_counter() - start
+    # The next run has to read the file again rather than find the layer in the registry.
+    del layer, copiedLayer
+    return elapsed
+
+
+def _run_worker(target: str, path: str, repeat: int) -> dict:
+    if target == "native":
+        if not native_format_available():
+            return {"status": "unavailable"}
+        timer = _time_native
+    elif target == "parse":
+        timer = _time_parse
+    else:
+        timer = functools.partial(_time_importer, authoring_mode=AUTHORING_MODE_STAGE if target == "stage"
+                                  else AUTHORING_MODE_SDF)
+
+    baseRss = _peak_rss()
+    times = [timer(path) for _ in range(repeat)]
+    return {"status": "ok", "times_s": times, "base_rss_bytes": baseRss, "peak_rss_bytes": _peak_rss()}
+
+
+def _measure(target: str, path: str, repeat: int, timeout: float) -> dict:
+    environment = dict(os.environ)
+    environment["PYTHONPATH"] = os.pathsep.join(filter(None, (_EXTENSION_ROOT, environment.get("PYTHONPATH"))))
+    # Repeats of the native target would otherwise find the parsed document in the cache of the plugin.
+    environment["MPCDI_DOCUMENT_CACHE_SIZE_MB"] = "0"
+    command = [sys.executable, "-m", _MODULE, "--worker", target, path, "--repeat", str(repeat)]
+    try:
+        process = subprocess.run(command, capture_output=True, text=True, env=environment, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {"status": "timeout"}
+    if process.returncode != 0:
+        lines = process.stderr.strip().splitlines()
+        return {"status": "error", "error": lines[-1] if lines else f"exit code {process.returncode}"}
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def _metadata(args) -> dict:
+    return {
+        "extension": read_extension_version(),
+        "python": platform.python_version(),
+        "usd": ".".join(str(part) for part in Usd.GetVersion()),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "repeat": args.repeat,
+    }
+
+
+def _result_key(result: dict):
+    # Only runs on the same document are compared.
+    return (result["target"], result["regions"], result["buffers"], tuple(result.get("warp") or ()),
+            tuple(result.get("blend") or ()))
+
+
+def compare_to_baseline(results: list, baseline: dict, tolerance: float) -> list:
+    """Return the (target, regions, ratio) entries of `results` that are slower than `baseline` beyond `tolerance`.
+
+    The ratio of every result found in the baseline is printed.
+    """
+    baselineResults = {_result_key(result): result for result in baseline.get("results", ())
+                       if result.get("status") == "ok"}
+    regressions = []
+    for result in results:
+        reference = baselineResults.get(_result_key(result))
+        if result["status"] != "ok" or reference is None:
+            continue
+        ratio = result["best_s"] / reference["best_s"] if reference["best_s"] > 0 else 1.0
+        flag = ""
+        if ratio > 1.0 + tolerance:
+            regressions.append((result["target"], result["regions"], ratio))
+            flag = "  REGRESSION"
+        print(f"{result['target']:>6} {result['regions']:>7}: {reference['best_s'] * 1000.0:10.1f} ms -> "
+              f"{result['best_s'] * 1000.0:10.1f} ms ({ratio:.2f}x){flag}")
+    return regressions
+
+
+def _parse_sizes(value: str):
+    return [int(size) for size in value.split(",") if size]
+
+
+def _parse_targets(value: str):
+    targets = [target for target in value.split(",") if target]
+    for target in targets:
+        if target not in TARGETS:
+            raise argparse.ArgumentTypeError(f"Unknown target {target}, expected one of {', '.join(TARGETS)}.")
+    return targets
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m mf.ov.mpcdi_converter.benchmark",
+                                     description="Time the MPCDI importer and file format plugin on synthetic "
+                                                 "documents.")
+    parser.add_argument("--sizes", type=_parse_sizes, default=list(DEFAULT_SIZES),
+                        help="Comma separated numbers of regions.")
+    parser.add_argument("--targets", type=_parse_targets, default=list(TARGETS),
+                        help=f"Comma separated targets among {', '.join(TARGETS)}.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of runs, the best one is reported.")
+    parser.add_argument("--buffers", type=int, default=1,
+                        help="Number of buffers the regions are spread over, sizes are rounded down to a multiple of "
+                             "it.")
+    parser.add_argument("--warp", type=parse_size, default=None,
+                        help="Add PFM warp grids of this size, e.g. 64x36.")
+    parser.add_argument("--blend", type=parse_size, default=None,
+                        help="Add PNG blend maps of this size, e.g. 512x288.")
+    parser.add_argument("--timeout", type=float, default=1800.0, help="Timeout of a single measure, in seconds.")
+    parser.add_argument("--json", default=None, help="Write the results to this file.")
+    parser.add_argument("--baseline", default=None, help="Compare the results to a previous --json output.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Relative slowdown accepted before a result is reported as a regression.")
+    parser.add_argument("--worker", nargs=2, metavar=("TARGET", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(_run_worker(args.worker[0], args.worker[1], args.repeat)))
+        return 0
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="mpcdi_benchmark_") as directory:
+        for size in args.sizes:
+            buffers = max(1, min(args.buffers, size))
+            regions = buffers * (size // buffers)
+            # A bare document with its payloads next to it, the only form the native plugin reads.
+            path = os.path.join(directory, str(regions), "synthetic.mpcdi.xml")
+            write_synthetic(path, buffers, regions // buffers, args.warp, args.blend)
+
+            for target in args.targets:
+                result = {"target": target, "regions": regions, "buffers": buffers,
+                          "warp": list(args.warp) if args.warp else None,
+                          "blend": list(args.blend) if args.blend else None}
+                result.update(_measure(target, path, args.repeat, args.timeout))
+                if result["status"] == "ok":
+                    result["best_s"] = min(result["times_s"])
+                    result["regions_per_s"] = regions / result["best_s"] if result["best_s"] > 0 else None
+                    peak = result["peak_rss_bytes"]
+                    print(f"{target:>6} {regions:>7}: {result['best_s'] * 1000.0:10.1f} ms, "
+                          f"{result['regions_per_s']:12.0f} regions/s, "
+                          f"peak RSS {peak / (1024 * 1024) if peak else float('nan'):8.1f} MB")
+                else:
+                    print(f"{target:>6} {regions:>7}: {result['status']} {result.get('error', '')}".rstrip())
+                results.append(result)
+
+    report = {"metadata": _metadata(args), "results": results}
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,397 @@
+import collections
+import os
+import struct
+import threading
+import zlib
+
+import numpy as np
+
+
+BLEND_MAP_TAGS = ("alphaMap", "betaMap")
+# Largest side of the textures written for the blend maps, larger maps are downsampled. 0 keeps the full resolution.
+DEFAULT_BLEND_MAP_MAX_SIZE = 2048
+DEFAULT_BLEND_CACHE_BYTES = 256 * 1024 * 1024
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_CHUNK_HEADER = struct.Struct(">I4s")
+_IHDR = struct.Struct(">IIBBBBB")
+# Channels of the supported PNG color types: gray, RGB, gray + alpha, RGBA.
+_CHANNELS = {0: 1, 2: 3, 4: 2, 6: 4}
+# Decoded bytes per band, the only full resolution data held in memory while decoding.
+_BAND_BYTES = 4 * 1024 * 1024
+_DECOMPRESS_CHUNK = 1024 * 1024
+# Bytes unfiltered one at a time in the time of a wavefront step, see _unfilter_band.
+_WAVEFRONT_STEP_BYTES = 128
+
+
+class PNGInfo:
+    def __init__(self, width: int, height: int, bit_depth: int, color_type: int):
+        self.width = width
+        self.height = height
+        self.bit_depth = bit_depth
+        self.color_type = color_type
+        self.channels = _CHANNELS[color_type]
+        self.pixel_bytes = self.channels * bit_depth // 8
+        self.row_bytes = self.width * self.pixel_bytes
+        self.dtype = np.dtype(np.uint8 if bit_depth == 8 else ">u2")
+
+
+def _iter_chunks(view: memoryview):
+    position = len(_PNG_SIGNATURE)
+    while position + _CHUNK_HEADER.size <= len(view):
+        length, chunkType = _CHUNK_HEADER.unpack_from(view, position)
+        start = position + _CHUNK_HEADER.size
+        yield chunkType, view[start:start + length]
+        if chunkType == b"IEND":
+            return
+        position = start + length + 4  # CRC
+
+
+def read_png_info(buffer) -> PNGInfo:
+    view = memoryview(buffer).cast("B")
+    if bytes(view[:len(_PNG_SIGNATURE)]) != _PNG_SIGNATURE:
+        raise ValueError("Not a PNG file.")
+
+    chunkType, data = next(_iter_chunks(view), (None, None))
+    if chunkType != b"IHDR":
+        raise ValueError("PNG file without IHDR chunk.")
+    width, height, bitDepth, colorType, _, _, interlace = _IHDR.unpack_from(data)
+    if colorType not in _CHANNELS or bitDepth not in (8, 16):
+        raise ValueError(f"Unsupported PNG format, color type {colorType} with {bitDepth} bits.")
+    if interlace:
+        raise ValueError("Interlaced PNG files are not supported.")
+
+    return PNGInfo(width, height, bitDepth, colorType)
+
+
+def _unfilter_row(filterType: int, row: np.ndarray, previous: np.ndarray, pixelBytes: int):
+    # `row` is unfiltered in place. None, Sub and Up are vectorized, Average and Paeth depend on the previous pixel
+    # of the same row and are done byte by byte, see _unfilter_wavefront for runs of them.
+    if filterType == 0:
+        return
+    if filterType == 1:
+        lanes = row.reshape(-1, pixelBytes)
+        np.cumsum(lanes, axis=0, dtype=np.uint8, out=lanes)
+    elif filterType == 2:
+        row += previous
+    elif filterType == 3:
+        values = row.tolist()
+        above = previous.tolist()
+        for i in range(len(values)):
+            left = values[i - pixelBytes] if i >= pixelBytes else 0
+            values[i] = (values[i] + ((left + above[i]) >> 1)) & 0xFF
+        row[:] = values
+    elif filterType == 4:
+        values = row.tolist()
+        above = previous.tolist()
+        for i in range(len(values)):
+            if i >= pixelBytes:
+                left = values[i - pixelBytes]
+                upperLeft = above[i - pixelBytes]
+            else:
+                left = upperLeft = 0
+            up = above[i]
+            estimate = left + up - upperLeft
+            distanceLeft, distanceUp, distanceUpperLeft = abs(estimate - left), abs(estimate - up), \
+                abs(estimate - upperLeft)
+            if distanceLeft <= distanceUp and distanceLeft <= distanceUpperLeft:
+                predictor = left
+            elif distanceUp <= distanceUpperLeft:
+                predictor = up
+            else:
+                predictor = upperLeft
+            values[i] = (values[i] + predictor) & 0xFF
+        row[:] = values
+    else:
+        raise ValueError(f"Invalid PNG filter type {filterType}.")
+
+
+def _paeth(left: np.ndarray, up: np.ndarray, upperLeft: np.ndarray) -> np.ndarray:
+    # Distances of the estimate left + up - upperLeft to the three neighbours.
+    upDelta = up - upperLeft
+    leftDelta = left - upperLeft
+    distanceUpperLeft = np.abs(upDelta + leftDelta)
+    distanceLeft = np.abs(upDelta)
+    distanceUp = np.abs(leftDelta)
+    return np.where((distanceLeft <= distanceUp) & (distanceLeft <= distanceUpperLeft), left,
+                    np.where(distanceUp <= distanceUpperLeft, up, upperLeft))
+
+
+def _unfilter_wavefront(filtered: np.ndarray, out: np.ndarray, previous: np.ndarray, pixelBytes: int):
+    # Unfilter the (rows, 1 + row bytes) scanlines of `filtered` into `out`, whatever their filters. A pixel only
+    # depends on the unfiltered pixels on its left, above and above left, so the pixels of an anti-diagonal are
+    # unfiltered together, in rows + width steps. The rows are padded with a column of zeros on the left and
+    # `previous` on top: pixel (row, column) is at row * (width + 1) + column of the flattened padding and a diagonal
+    # is a slice of stride width.
+    rowCount = len(filtered)
+    width = out.shape[1] // pixelBytes
+    padded = np.zeros((rowCount + 1, width + 1, pixelBytes), dtype=np.int16)
+    padded[0, 1:] = previous.reshape(width, pixelBytes)
+    pixels = padded.reshape(-1, pixelBytes)
+    raw = filtered[:, 1:].reshape(-1, pixelBytes).astype(np.int16)
+
+    # Runs of a single filter are common. In mixed runs, None, Sub and Up are Paeth predictors with the other
+    # neighbours set to zero.
+    filterTypes = filtered[:, 0]
+    uniform = int(filterTypes[0]) if (filterTypes == filterTypes[0]).all() else None
+    average = (filterTypes == 3)[:, None]
+    masks = [np.isin(filterTypes, kept)[:, None].astype(np.int16) for kept in ((1, 4), (2, 4), (4,))]
+
+    for step in range(rowCount + width - 1):
+        first = max(0, step - width + 1)
+        count = min(rowCount - 1, step) - first + 1
+        target = (first + 1) * (width + 1) + step - first + 1
+        stop = target + (count - 1) * width + 1
+        # Contiguous copies, the arithmetic on strided views is twice as slow.
+        left = pixels[target - 1:stop - 1:width].copy()
+        up = pixels[target - width - 1:stop - width - 1:width].copy()
+        upperLeft = pixels[target - width - 2:stop - width - 2:width].copy()
+        rawStart = first * width + step - first
+        rawPixels = raw[rawStart:rawStart + (count - 1) * (width - 1) + 1:max(1, width - 1)]
+
+        if uniform == 4:
+            predictor = _paeth(left, up, upperLeft)
+        elif uniform == 3:
+            predictor = (left + up) >> 1
+        else:
+            rows = slice(first, first + count)
+            predictor = _paeth(left * masks[0][rows], up * masks[1][rows], upperLeft * masks[2][rows])
+            predictor = np.where(average[rows], (left + up) >> 1, predictor)
+        pixels[target:stop:width] = (rawPixels + predictor) & 0xFF
+
+    out[:] = padded[1:, 1:].reshape(rowCount, -1)
+
+
+def _unfilter_band(filtered: np.ndarray, out: np.ndarray, previous: np.ndarray, pixelBytes: int):
+    # Unfilter the (rows, 1 + row bytes) scanlines of `filtered` into `out`, `previous` is the unfiltered row above.
+    # The rows from the first to the last Average or Paeth row go through the wavefront when its steps cost less than
+    # unfiltering those rows byte by byte, the other rows are unfiltered one at a time.
+    filterTypes = filtered[:, 0]
+    if len(filterTypes) and filterTypes.max() > 4:
+        raise ValueError(f"Invalid PNG filter type {int(filterTypes.max())}.")
+    dependent = np.flatnonzero(filterTypes >= 3)
+    first = last = len(filtered)
+    if len(dependent):
+        steps = dependent[-1] + 1 - dependent[0] + out.shape[1] // pixelBytes
+        if steps * _WAVEFRONT_STEP_BYTES < len(dependent) * out.shape[1]:
+            first, last = dependent[0], dependent[-1] + 1
+
+    for index in range(len(filtered)):
+        if index == first:
+            _unfilter_wavefront(filtered[first:last], out[first:last], previous, pixelBytes)
+        if first <= index < last:
+            previous = out[index]
+            continue
+        out[index] = filtered[index, 1:]
+        _unfilter_row(int(filterTypes[index]), out[index], previous, pixelBytes)
+        previous = out[index]
+
+
+def _iter_filtered_rows(view: memoryview, info: PNGInfo):
+    # Yields arrays of complete filtered scanlines (filter type byte followed by the row) as the IDAT data inflates.
+    stride = 1 + info.row_bytes
+    decompressor = zlib.decompressobj()
+    pending = bytearray()
+    rowsLeft = info.height
+
+    def take_rows():
+        nonlocal rowsLeft
+        count = min(len(pending) // stride, rowsLeft)
+        rows = np.frombuffer(bytes(pending[:count * stride]), dtype=np.uint8).reshape(count, stride)
+        del pending[:count * stride]
+        rowsLeft -= count
+        return rows
+
+    for chunkType, data in _iter_chunks(view):
+        if chunkType != b"IDAT":
+            continue
+        data = bytes(data)
+        while data and rowsLeft > 0:
+            pending += decompressor.decompress(data, _DECOMPRESS_CHUNK)
+            data = decompressor.unconsumed_tail
+            yield take_rows()
+
+    pending += decompressor.flush()
+    yield take_rows()
+    if rowsLeft > 0:
+        raise ValueError("Truncated PNG data.")
+
+
+def iter_png_bands(buffer, band_rows: int):
+    """Decode a PNG file `band_rows` rows at a time, yields (height, width, channels) arrays.
+
+    The compressed stream is inflated incrementally, memory use is bounded by the band size whatever the image size.
+    """
+    view = memoryview(buffer).cast("B")
+    info = read_png_info(view)
+    previous = np.zeros(info.row_bytes, dtype=np.uint8)
+    # Scanlines are gathered until a band is complete and unfiltered together.
+    filteredBand = np.empty((band_rows, 1 + info.row_bytes), dtype=np.uint8)
+    bandRow = 0
+
+    def unfilter(rowCount):
+        band = np.empty((rowCount, info.row_bytes), dtype=np.uint8)
+        _unfilter_band(filteredBand[:rowCount], band, previous, info.pixel_bytes)
+        return band
+
+    for rows in _iter_filtered_rows(view, info):
+        position = 0
+        while position < len(rows):
+            count = min(len(rows) - position, band_rows - bandRow)
+            filteredBand[bandRow:bandRow + count] = rows[position:position + count]
+            position += count
+            bandRow += count
+            if bandRow == band_rows:
+                band = unfilter(band_rows)
+                yield band.view(info.dtype).reshape(band_rows, info.width, info.channels)
+                # The previous row must survive the next band.
+                previous = band[-1].copy()
+                bandRow = 0
+
+    if bandRow > 0:
+        yield unfilter(bandRow).view(info.dtype).reshape(bandRow, info.width, info.channels)
+
+
+def decode_png(buffer, max_size: int = 0) -> np.ndarray:
+    """Decode a PNG file to a (height, width, channels) array of its own bit depth.
+
+    When `max_size` is set, the image is box filtered band by band so its largest side fits in `max_size`, the full
+    resolution image is never held in memory.
+    """
+    info = read_png_info(buffer)
+    factor = 1
+    if max_size > 0:
+        factor = max(1, -(-max(info.width, info.height) // max_size))
+
+    bandRows = max(factor, _BAND_BYTES // max(1, info.row_bytes) // factor * factor)
+    columnStarts = np.arange(0, info.width, factor)
+    columnCounts = np.diff(np.append(columnStarts, info.width))
+    outputBands = []
+    for band in iter_png_bands(buffer, bandRows):
+        if factor == 1:
+            outputBands.append(np.array(band, dtype=info.dtype.newbyteorder("=")))
+            continue
+        rowStarts = np.arange(0, len(band), factor)
+        rowCounts = np.diff(np.append(rowStarts, len(band)))
+        sums = np.add.reduceat(np.add.reduceat(band.astype(np.float32), rowStarts, axis=0), columnStarts, axis=1)
+        means = sums / (rowCounts[:, None, None] * columnCounts[None, :, None])
+        outputBands.append(np.rint(means).astype(info.dtype.newbyteorder("=")))
+
+    return np.concatenate(outputBands, axis=0)
+
+
+def _png_chunk(chunkType: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + chunkType + data + struct.pack(">I", zlib.crc32(chunkType + data))
+
+
+def encode_png(pixels: np.ndarray) -> bytes:
+    """Encode a (height, width, channels) uint8 or uint16 array, without filtering."""
+    height, width, channels = pixels.shape
+    colorType = {value: key for key, value in _CHANNELS.items()}[channels]
+    bitDepth = 16 if pixels.dtype.itemsize == 2 else 8
+    rows = pixels.astype(">u2" if bitDepth == 16 else np.uint8).reshape(height, -1).view(np.uint8)
+    scanlines = np.zeros((height, rows.shape[1] + 1), dtype=np.uint8)
+    scanlines[:, 1:] = rows
+    return (_PNG_SIGNATURE +
+            _png_chunk(b"IHDR", _IHDR.pack(width, height, bitDepth, colorType, 0, 0, 0)) +
+            _png_chunk(b"IDAT", zlib.compress(scanlines.tobytes(), 6)) +
+            _png_chunk(b"IEND", b""))
+
+
+class BlendMapCache:
+    """In-process LRU cache of decoded blend maps, keyed by package and member (see member cache keys).
+
+    The decoded maps are kept until their total size goes over `max_bytes`, so importing the same package again does
+    not decode its maps again.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_BLEND_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, decode):
+        """Return the map stored for `key`, calling `decode()` to create it on a miss."""
+        with self._lock:
+            pixels = self._entries.get(key)
+            if pixels is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return pixels
+            self.misses += 1
+
+        pixels = decode()
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = pixels
+                self._bytes += pixels.nbytes
+            self._evict()
+        return pixels
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._entries:
+            _, pixels = self._entries.popitem(last=False)
+            self._bytes -= pixels.nbytes
+            self.evictions += 1
+
+    def resize(self, max_bytes: int):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "size_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+_blendMapCache = BlendMapCache()
+
+
+def get_blend_map_cache() -> BlendMapCache:
+    return _blendMapCache
+
+
+def write_blend_map(member, directory: str, name: str, max_size: int = DEFAULT_BLEND_MAP_MAX_SIZE,
+                    cache: BlendMapCache = None) -> str:
+    """Return the path of a texture file for the blend map `member` of a package.
+
+    Loose files that are small enough are used in place, archive members that are small enough are copied as is.
+    Larger maps are decoded, downsampled and written to `directory` as `name`.png. Returns None when the map has to be
+    written and no directory is given.
+    """
+    info = read_png_info(member.buffer())
+    tooLarge = max_size > 0 and max(info.width, info.height) > max_size
+    path = getattr(member, "path", None)
+    if path is not None and not tooLarge:
+        return os.path.abspath(path)
+    if not directory:
+        return None
+
+    os.makedirs(directory, exist_ok=True)
+    texturePath = os.path.join(directory, name + ".png")
+    if tooLarge:
+        cache = cache if cache is not None else get_blend_map_cache()
+        pixels = cache.get(member.cache_key + (max_size,), lambda: decode_png(member.buffer(), max_size))
+        content = encode_png(pixels)
+    else:
+        content = member.buffer()
+
+    with open(texturePath, "wb") as f:
+        f.write(content)
+    return texturePath
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+
+
+CACHE_FILE_EXTENSION = ".usdc"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Folder of the textures of an entry, next to its layer.
+MAPS_FOLDER_SUFFIX = "_maps"
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+_extensionTomlPath = os.path.join(os.path.dirname(__file__), '../../../config/extension.toml')
+
+
+def read_extension_version(path: str = _extensionTomlPath) -> str:
+    # Only the [package] version is needed, no need for a TOML parser (tomllib is not available in Kit's Python).
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            inPackage = False
+            for line in f:
+                line = line.strip()
+                if line.startswith("["):
+                    inPackage = line == "[package]"
+                    continue
+                match = re.match(r'version\s*=\s*"([^"]+)"', line)
+                if inPackage and match:
+                    return match.group(1)
+    except OSError:
+        pass
+
+    return "unknown"
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_buffer(buffer) -> str:
+    return hashlib.sha256(memoryview(buffer)).hexdigest()
+
+
+def _folder_size(path: str) -> int:
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return size
+
+
+class ConversionCache:
+    """On-disk cache of converted layers.
+
+    Entries are content addressed: the key combines the hash of the MPCDI input, the extension version and the
+    conversion options, so a new release or different options never reuse stale results. The modification time of
+    each entry is refreshed when it is used and the least recently used entries are evicted once the cache grows
+    over `max_bytes`. The textures written for an entry live in its maps_directory and are evicted with it.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES, version: str = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.version = version if version is not None else read_extension_version()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def make_key(self, content_hash: str, options: dict) -> str:
+        payload = json.dumps({"content": content_hash, "version": self.version, "options": options}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, key + CACHE_FILE_EXTENSION)
+
+    def maps_directory(self, key: str) -> str:
+        return os.path.join(self.directory, key + MAPS_FOLDER_SUFFIX)
+
+    def contains(self, key: str) -> bool:
+        """Check for an entry without counting a hit or a miss."""
+        return os.path.isfile(self._entry_path(key))
+
+    def lookup(self, key: str):
+        """Return the path of the cached layer for `key`, or None on a miss."""
+        path = self._entry_path(key)
+        with self._lock:
+            if os.path.isfile(path):
+                self.hits += 1
+                try:
+                    # Mark the entry as recently used.
+                    os.utime(path, None)
+                except OSError:
+                    pass
+                return path
+
+            self.misses += 1
+            return None
+
+    def store(self, key: str, layer) -> str:
+        """Export `layer` as the cache entry for `key` and return its path."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._entry_path(key)
+        # Export next to the final location then rename, concurrent readers never see a partial file.
+        temporaryPath = os.path.join(self.directory, f"{key}.{os.getpid()}.{threading.get_ident()}.tmp"
+                                                     f"{CACHE_FILE_EXTENSION}")
+        if not layer.Export(temporaryPath):
+            raise IOError(f"Cannot write cache entry {path}.")
+        os.replace(temporaryPath, path)
+
+        self.evict()
+        return path
+
+    def evict(self):
+        with self._lock:
+            entries = []
+            totalBytes = 0
+            try:
+                for entry in os.scandir(self.directory):
+                    if not entry.name.endswith(CACHE_FILE_EXTENSION) or ".tmp" in entry.name:
+                        continue
+                    stat = entry.stat()
+                    size = stat.st_size + _folder_size(self._maps_path(entry.path))
+                    entries.append((stat.st_mtime, size, entry.path))
+                    totalBytes += size
+            except OSError:
+                return
+
+            entries.sort()
+            for _, size, path in entries:
+                if totalBytes <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    # The layer may still be open elsewhere (Windows), it will be evicted on a later pass.
+                    logging.getLogger(__name__).info(f"Cannot evict cache entry {path}: {e}")
+                    continue
+                shutil.rmtree(self._maps_path(path), ignore_errors=True)
+                totalBytes -= size
+                self.evictions += 1
+
+    def _maps_path(self, entryPath: str) -> str:
+        return entryPath[:-len(CACHE_FILE_EXTENSION)] + MAPS_FOLDER_SUFFIX
+
+    def clear(self):
+        with self._lock:
+            if not os.path.isdir(self.directory):
+                return
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(CACHE_FILE_EXTENSION):
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        pass
+                elif entry.name.endswith(MAPS_FOLDER_SUFFIX) and entry.is_dir():
+                    shutil.rmtree(entry.path, ignore_errors=True)
+
+    def stats(self) -> dict:
+        entries = 0
+        sizeBytes = 0
+        if os.path.isdir(self.directory):
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(CACHE_FILE_EXTENSION) and ".tmp" not in entry.name:
+                    entries += 1
+                    sizeBytes += entry.stat().st_size + _folder_size(self._maps_path(entry.path))
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": entries,
+            "size_bytes": sizeBytes,
+            "max_bytes": self.max_bytes,
+        }
@@ -0,0 +1,185 @@
+import math
+import numpy as np
+from pxr import Gf
+from .parser import MPCDIRegion, FRUSTUM_TAGS, COORDINATE_FRAME_TAGS
+
+
+FOCAL_LENGTH = 10  # We chose a fixed focal length.
+FOCUS_DISTANCE = 2000.0
+POSITION_SCALE = 10.0
+
+# Column indices in the gathered arrays
+_RIGHT_ANGLE, _LEFT_ANGLE, _UP_ANGLE, _DOWN_ANGLE = (FRUSTUM_TAGS.index(tag) for tag in
+                                                     ("rightAngle", "leftAngle", "upAngle", "downAngle"))
+_YAW, _PITCH, _ROLL = (FRUSTUM_TAGS.index(tag) for tag in ("yaw", "pitch", "roll"))
+
+
+class ProjectorParameters:
+    """Camera, light and transform values of a batch of regions, one array entry per region."""
+
+    def __init__(self, count: int):
+        self.count = count
+        self.horizontal_aperture = np.empty(count, dtype=np.float64)
+        self.horizontal_aperture_offset = np.empty(count, dtype=np.float64)
+        self.vertical_aperture = np.empty(count, dtype=np.float64)
+        self.vertical_aperture_offset = np.empty(count, dtype=np.float64)
+        self.light_width = np.empty(count, dtype=np.float64)
+        self.light_height = np.empty(count, dtype=np.float64)
+        self.translate = np.empty((count, 3), dtype=np.float32)
+        self.yaw = np.empty(count, dtype=np.float64)
+        self.pitch = np.empty(count, dtype=np.float64)
+        self.roll = np.empty(count, dtype=np.float64)
+        self.lens_shifting = np.empty(count, dtype=bool)
+
+
+def gather_regions(regions):
+    """Return the (N, 7) frustum and (N, 12) coordinate frame arrays of `regions`, columns follow the parser tags."""
+    frustums = np.array([[region.frustum[tag] for tag in FRUSTUM_TAGS] for region in regions], dtype=np.float64)
+    frames = np.array([[region.coordinate_frame[tag] for tag in COORDINATE_FRAME_TAGS] for region in regions],
+                      dtype=np.float64)
+    return frustums.reshape(-1, len(FRUSTUM_TAGS)), frames.reshape(-1, len(COORDINATE_FRAME_TAGS))
+
+
+def compute_projectors(frustums: np.ndarray, frames: np.ndarray) -> ProjectorParameters:
+    """Vectorized version of compute_projector, the results are identical once stored as float attributes."""
+    parameters = ProjectorParameters(len(frustums))
+
+    tanRight = np.tan(np.radians(frustums[:, _RIGHT_ANGLE]))
+    tanLeft = np.tan(np.radians(frustums[:, _LEFT_ANGLE]))
+    tanUp = np.tan(np.radians(frustums[:, _UP_ANGLE]))
+    tanDown = np.tan(np.radians(frustums[:, _DOWN_ANGLE]))
+
+    parameters.light_width[:] = np.abs(tanRight) + np.abs(tanLeft)
+    parameters.light_height[:] = np.abs(tanUp) + np.abs(tanDown)
+    parameters.horizontal_aperture[:] = parameters.light_width * FOCAL_LENGTH
+    parameters.vertical_aperture[:] = parameters.light_height * FOCAL_LENGTH
+
+    degenerate = (tanLeft == tanRight) | (tanUp == tanDown)
+    if degenerate.any():
+        raise ValueError(f"Region #{int(np.argmax(degenerate))} of the batch has a degenerate frustum.")
+
+    horizLensShiftAmount = (tanLeft + tanRight) / (tanLeft - tanRight)
+    vertLensShiftAmount = (tanUp + tanDown) / (tanUp - tanDown)
+    parameters.horizontal_aperture_offset[:] = horizLensShiftAmount * parameters.horizontal_aperture / 2.0
+    parameters.vertical_aperture_offset[:] = vertLensShiftAmount * parameters.vertical_aperture / 2.0
+
+    parameters.lens_shifting[:] = ((frustums[:, _RIGHT_ANGLE] != frustums[:, _LEFT_ANGLE]) |
+                                   (frustums[:, _UP_ANGLE] != frustums[:, _DOWN_ANGLE]))
+
+    parameters.yaw[:] = frustums[:, _YAW] * -1
+    parameters.pitch[:] = frustums[:, _PITCH]
+    parameters.roll[:] = frustums[:, _ROLL]
+
+    # Rows of the source to standard matrix are the pitch (right), yaw (up) and roll (forward) axis, see
+    # compute_projector. The product is done in single precision, term by term, like Gf.Matrix3f * Gf.Vec3f.
+    position = (frames[:, 0:3] * 10).astype(np.float32)
+    sourceToStandard = np.stack((frames[:, 6:9], frames[:, 3:6], frames[:, 9:12]), axis=1).astype(np.float32)
+    newPos = (sourceToStandard[:, :, 0] * position[:, 0:1] +
+              sourceToStandard[:, :, 1] * position[:, 1:2] +
+              sourceToStandard[:, :, 2] * position[:, 2:3])
+    newPos[:, 1:3] *= np.float32(-1.0)
+    parameters.translate[:] = newPos * np.float32(POSITION_SCALE)
+
+    return parameters
+
+
+def _rotations(degrees: np.ndarray, first: int, second: int) -> np.ndarray:
+    # (N, 3, 3) rotations in the plane of two axes, laid out like Gf.Matrix4d.SetRotate (row vectors).
+    radians = np.radians(degrees)
+    matrices = np.zeros((len(degrees), 3, 3))
+    matrices[:, 3 - first - second, 3 - first - second] = 1.0
+    matrices[:, first, first] = matrices[:, second, second] = np.cos(radians)
+    matrices[:, first, second] = np.sin(radians)
+    matrices[:, second, first] = -np.sin(radians)
+    return matrices
+
+
+def camera_matrices(parameters: ProjectorParameters) -> np.ndarray:
+    """(N, 4, 4) local to world matrices of the cameras, in Gf row vector layout.
+
+    Cameras are authored with the translate, rotateY, rotateX, rotateZ xformOpOrder, they look down -Z.
+    """
+    matrices = np.zeros((parameters.count, 4, 4))
+    rotation = _rotations(parameters.roll, 0, 1) @ _rotations(parameters.pitch, 1, 2) @ \
+        _rotations(parameters.yaw, 2, 0)
+    matrices[:, :3, :3] = rotation
+    matrices[:, 3, :3] = parameters.translate
+    matrices[:, 3, 3] = 1.0
+    return matrices
+
+
+def compute_projector(region: MPCDIRegion) -> dict:
+    """Scalar reference implementation for a single region."""
+    coordinateFrame = region.coordinate_frame
+
+    # Get Position
+    posX = coordinateFrame['posx'] * 10
+    posY = coordinateFrame['posy'] * 10
+    posZ = coordinateFrame['posz'] * 10
+
+    # Get Axis up
+    upX = coordinateFrame['yawx']
+    upY = coordinateFrame['yawy']
+    upZ = coordinateFrame['yawz']
+
+    # Get Axis right
+    rightX = coordinateFrame['pitchx']
+    rightY = coordinateFrame['pitchy']
+    rightZ = coordinateFrame['pitchz']
+
+    # Get Axis down
+    forwardX = coordinateFrame['rollx']
+    forwardY = coordinateFrame['rolly']
+    forwardZ = coordinateFrame['rollz']
+
+    # The "coordinateFrame" provided in the MPCDI comes with three vectors to solve any coordinate
+    # system ambiguity we meed to convert the position from the "source" coordinate system to the
+    # standard MPCDI system And then convert from the standard to the Omniverse system
+    sourceToStandard = Gf.Matrix3f(
+        rightX, rightY, rightZ,
+        upX, upY, upZ,
+        forwardX, forwardY, forwardZ)
+
+    # Omniverse uses the same axis for Roll/Pitch/Yaw than the standard, so we have a diagonal matrix
+    # BUT the Y and Z axis are pointing to the opposite direction, so we need to invert them
+    # in the matrix. Here we'll avoid a second matrix product and simply invert Y and Z of the
+    # vector instead.
+    newPos = sourceToStandard * Gf.Vec3f(posX, posY, posZ)
+    newPos[1] = newPos[1] * -1.0
+    newPos[2] = newPos[2] * -1.0
+
+    frustum = region.frustum
+
+    # For the moment we do not support lens shifting, so we simply add the two angles and assume
+    # They are the same on both sides of the angle.
+    fovRight = frustum['rightAngle']
+    fovLeft = frustum['leftAngle']
+    fovTop = frustum['upAngle']
+    fovBottom = frustum['downAngle']
+
+    focalLength = FOCAL_LENGTH
+    tanRight = math.tan(math.radians(fovRight))
+    tanLeft = math.tan(math.radians(fovLeft))
+    tanUp = math.tan(math.radians(fovTop))
+    tanDown = math.tan(math.radians(fovBottom))
+    apertureH = (abs(tanRight) + abs(tanLeft)) * focalLength
+    apertureV = (abs(tanUp) + abs(tanDown)) * focalLength
+    lightWidth = abs(tanRight) + abs(tanLeft)
+    lightHeight = abs(tanUp) + abs(tanDown)
+
+    horizLensShiftAmount = (tanLeft + tanRight) / (tanLeft - tanRight)
+    vertLensShiftAmount = (tanUp + tanDown) / (tanUp - tanDown)
+
+    return {
+        "horizontalAperture": apertureH,
+        "horizontalApertureOffset": horizLensShiftAmount * apertureH / 2.0,
+        "verticalAperture": apertureV,
+        "verticalApertureOffset": vertLensShiftAmount * apertureV / 2.0,
+        "translate": newPos * POSITION_SCALE,
+        "yaw": frustum['yaw'] * -1,
+        "pitch": frustum['pitch'],
+        "roll": frustum['roll'],
+        "lightWidth": lightWidth,
+        "lightHeight": lightHeight,
+        "lensShifting": fovRight != fovLeft or fovTop != fovBottom,
+    }
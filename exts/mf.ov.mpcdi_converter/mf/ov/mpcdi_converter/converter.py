@@ -0,0 +1,986 @@
+import concurrent.futures
+import copy
+import hashlib
+import itertools
+import logging
+import os
+import shutil
+from pxr import Ar, Usd, UsdGeom, Sdf, Gf, Tf, Vt
+from .archive import MPCDIPackage, open_package, read_pfm
+from .blend import BLEND_MAP_TAGS, DEFAULT_BLEND_MAP_MAX_SIZE, write_blend_map
+from .cache import CACHE_FILE_EXTENSION
+from .compute import FOCAL_LENGTH, FOCUS_DISTANCE, ProjectorParameters, compute_projectors, gather_regions
+from .document import DEFAULT_BATCH_SIZE, MPCDIDocument, MPCDIRegionView
+from .parser import COORDINATE_FRAME_TAGS, FRUSTUM_TAGS, iter_regions
+from .profiling import current_summary, span
+from .warp import DEFAULT_WARP_DECIMATION, WARP_MESH_NAME, WarpMesh, build_warp_mesh
+
+
+# Only depends on pxr so it can be used by the Kit importer as well as headless tools (see batch.py).
+MPCDI_ROOT_PATH = "/MPCDI"
+# Shared projector content of the instancing mode, an abstract (class) scope under the root so it travels with it when
+# the root is referenced.
+PROTOTYPES_NAME = "_Prototypes"
+PROTOTYPES_PATH = MPCDI_ROOT_PATH + '/' + PROTOTYPES_NAME
+_PROJECT_LIGHT_CLASS_PATH = PROTOTYPES_PATH + '/ProjectLight'
+_PROJECTOR_BOX_PROTOTYPE_PATH = PROTOTYPES_PATH + '/ProjectorBox'
+
+# "sdf" writes specs straight to the layer inside a single Sdf.ChangeBlock, "stage" goes through the UsdStage API.
+AUTHORING_MODE_SDF = "sdf"
+AUTHORING_MODE_STAGE = "stage"
+# The document is read by the native MpcdiFileFormat plugin and its layer is copied, see author_native.
+AUTHORING_MODE_NATIVE = "native"
+NATIVE_FORMAT_ID = "mpcdiFileFormat"
+
+# Every region in the written layer, or one layer per buffer loaded as a payload of the written layer, see
+# write_buffer_payloads.
+LAYOUT_FLAT = "flat"
+LAYOUT_PAYLOADS = "payloads"
+# Number of buffer layers saved at the same time.
+MAX_CONCURRENT_WRITES = 8
+
+_REGION_COUNT_KEY = "mpcdi:regionCount"
+_LENS_SHIFTING_KEY = "mpcdi:hasLensShifting"
+_BUFFERS_KEY = "mpcdi:buffers"
+# customData of the region cameras: {"mpcdi": {"hash": ..., "payloadHash": ...}}, compared by incremental imports.
+_HASHES_KEY = "mpcdi"
+# Bump when the authored content of a region changes, so incremental imports re-author regions written before.
+_HASH_VERSION = 1
+
+
+class MPCDIConverterContext:
+    usd_reference_path = ""
+    authoring_mode = AUTHORING_MODE_SDF
+    use_cache = True
+    # Step between the warp grid samples kept in the warp meshes, see warp.py.
+    warp_decimation = DEFAULT_WARP_DECIMATION
+    # Blend maps larger than this are downsampled, see blend.py. Textures that cannot be used in place are written to
+    # maps_directory, which defaults to a `<layer>_maps` folder next to the written layer.
+    blend_map_max_size = DEFAULT_BLEND_MAP_MAX_SIZE
+    maps_directory = ""
+    # Local path the written layer is saved at, when it is authored in an anonymous layer. Texture paths are authored
+    # relative to it, or to the path of the authored layer. Neither this nor maps_directory are part of options(), see
+    # convert_to_layer_cached.
+    layer_path = ""
+    # Only author the regions that were added or changed since the previous import in the same layer, and remove
+    # the regions that are gone. Only applies to the Sdf authoring mode.
+    incremental = False
+    # Lights inherit their projector settings from a class prim and projector boxes are instanceable references to a
+    # single prototype, regions only hold their own transform and frustum.
+    instancing = False
+    # LAYOUT_FLAT or LAYOUT_PAYLOADS, applied once the document is converted so it does not change the cached layers.
+    layout = LAYOUT_FLAT
+
+    def options(self) -> dict:
+        # Options that change the converted content, they are part of the conversion cache key. Where the layer and
+        # its textures are written is not, the same document imported to another folder reuses the cached layer.
+        return {
+            "warp_decimation": self.warp_decimation,
+            "blend_map_max_size": self.blend_map_max_size,
+            "instancing": self.instancing,
+        }
+
+
+class MPCDIChangeReport:
+    """Camera paths of the regions touched by an incremental import."""
+
+    def __init__(self):
+        self.added = []
+        self.removed = []
+        self.changed = []
+        self.unchanged = []
+
+    def __str__(self):
+        return (f"{len(self.added)} added, {len(self.changed)} changed, {len(self.removed)} removed, "
+                f"{len(self.unchanged)} unchanged")
+
+
+class MPCDIConversionResult:
+    def __init__(self):
+        self.region_count = 0
+        self.has_lens_shifting = False
+        # Camera path and coordinate frame of each region id, used to attach the payload files of the regions.
+        self.cameras = {}
+        # MPCDIChangeReport of incremental imports, None otherwise.
+        self.changes = None
+        # Buffer layers written with LAYOUT_PAYLOADS.
+        self.payload_paths = []
+
+    def add_region(self, region: MPCDIRegionView, cameraPath: str):
+        self.cameras[region.region_id] = (cameraPath, region.coordinate_frame)
+
+    def add_batch(self, parameters: ProjectorParameters):
+        self.region_count += parameters.count
+        self.has_lens_shifting = self.has_lens_shifting or bool(parameters.lens_shifting.any())
+
+
+def clean_name_for_usd(strIn: str) -> str:
+    strOut = strIn
+    # Do not allow for a blank name
+    if len(strOut) == 0:
+        return "Default"
+    elif len(strOut) == 1 and strIn.isnumeric():
+        # If we have an index as a name, we only need to add _ beforehand.
+        return "_" + strIn
+
+    return Tf.MakeValidIdentifier(strIn)
+
+
+def parse_document(source) -> MPCDIDocument:
+    """Parse `source`, a file path, a binary file object or an MPCDIPackage, into an MPCDIDocument.
+
+    The filesets of a package are filled as well.
+    """
+    with span("parse"):
+        if isinstance(source, MPCDIPackage):
+            with source.open_document() as document:
+                return MPCDIDocument.from_source(document, source.filesets)
+        return MPCDIDocument.from_source(source)
+
+
+def parse_batches(source, size: int = DEFAULT_BATCH_SIZE):
+    """Yield (regions, ProjectorParameters) batches of at most `size` regions read from `source`, a file path, a binary
+    file object, an MPCDIPackage or an already parsed MPCDIDocument. The filesets of a package are filled once the
+    generator is exhausted.
+
+    Documents are batched by rows. Other sources are streamed without building a document: regions are parsed `size`
+    at a time and dropped once their batch is consumed, so memory stays flat whatever the document size.
+    """
+    if isinstance(source, MPCDIDocument):
+        yield from source.batches(size)
+    elif isinstance(source, MPCDIPackage):
+        with source.open_document() as document:
+            yield from _stream_batches(document, source.filesets, size)
+    else:
+        yield from _stream_batches(source, None, size)
+
+
+def _stream_batches(source, filesets, size):
+    # Spans never straddle a yield, the parse and compute time stays separate from the consumer's authoring time.
+    regions = iter_regions(source, filesets)
+    while True:
+        with span("parse"):
+            batch = list(itertools.islice(regions, size))
+        if not batch:
+            return
+        with span("compute"):
+            parameters = compute_projectors(*gather_regions(batch))
+        yield batch, parameters
+
+
+def _define_prototypes_on_stage(stage: Usd.Stage):
+    stage.CreateClassPrim(PROTOTYPES_PATH).SetTypeName("Scope")
+
+    rectLight = stage.DefinePrim(_PROJECT_LIGHT_CLASS_PATH, 'RectLight')
+    rectLight.CreateAttribute('isProjector', Sdf.ValueTypeNames.Bool).Set(True)
+    rectLight.CreateAttribute('intensity', Sdf.ValueTypeNames.Float).Set(15000)
+    rectLight.CreateAttribute('exposure', Sdf.ValueTypeNames.Float).Set(5)
+
+    projectorXform = UsdGeom.Xformable(stage.DefinePrim(_PROJECTOR_BOX_PROTOTYPE_PATH, 'Xform'))
+    projectorXform.ClearXformOpOrder()
+    projectorXform.AddTranslateOp().Set(value=(0, 0, 42.0))
+    projectorXform.AddScaleOp().Set(value=(50.0, 15, 40.0))
+    stage.DefinePrim(_PROJECTOR_BOX_PROTOTYPE_PATH + '/Box', 'Cube')
+
+
+def _author_region_on_stage(stage: Usd.Stage, bufferPath: str, region: MPCDIRegionView,
+                            parameters: ProjectorParameters, index: int, instancing: bool = False) -> str:
+    regionId = region.region_id
+    primPath = bufferPath + '/' + clean_name_for_usd(regionId)
+
+    prim = stage.DefinePrim(primPath, "Camera")
+    prim.GetAttribute('focalLength').Set(FOCAL_LENGTH)
+    prim.GetAttribute('focusDistance').Set(FOCUS_DISTANCE)
+
+    prim.GetAttribute('horizontalAperture').Set(float(parameters.horizontal_aperture[index]))
+    prim.GetAttribute('horizontalApertureOffset').Set(float(parameters.horizontal_aperture_offset[index]))
+    prim.GetAttribute('verticalAperture').Set(float(parameters.vertical_aperture[index]))
+    prim.GetAttribute('verticalApertureOffset').Set(float(parameters.vertical_aperture_offset[index]))
+
+    primXform = UsdGeom.Xformable(prim)
+
+    # This prevents from trying to add another Operation if overwritting nodes.
+    primXform.ClearXformOpOrder()
+
+    primXform.AddTranslateOp().Set(value=Gf.Vec3d(*parameters.translate[index].tolist()))
+    primXform.AddRotateYOp().Set(value=float(parameters.yaw[index]))
+    primXform.AddRotateXOp().Set(value=float(parameters.pitch[index]))
+    primXform.AddRotateZOp().Set(value=float(parameters.roll[index]))
+
+    # Create rectLight node
+    rectLightpath = primPath + '/ProjectLight'
+    rectLight = stage.DefinePrim(rectLightpath, 'RectLight')
+
+    if instancing:
+        rectLight.GetInherits().AddInherit(_PROJECT_LIGHT_CLASS_PATH)
+    else:
+        # We need to create those attributes as they are not standard in USD and they are omniverse
+        # Specific. At this point in time Omniverse hasn't added their own attributes.
+        # We simply do it ourselves.
+        rectLight.CreateAttribute('isProjector', Sdf.ValueTypeNames.Bool).Set(True)
+        rectLight.CreateAttribute('intensity', Sdf.ValueTypeNames.Float).Set(15000)
+        rectLight.CreateAttribute('exposure', Sdf.ValueTypeNames.Float).Set(5)
+    rectLight.GetAttribute('inputs:width').Set(float(parameters.light_width[index]))
+    rectLight.GetAttribute('inputs:height').Set(float(parameters.light_height[index]))
+
+    # Creating projector box mesh to simulate the space a projector takes in the space
+    projectorBoxPath = primPath + '/ProjectorBox'
+    if instancing:
+        projector = stage.DefinePrim(projectorBoxPath, 'Xform')
+        projector.GetReferences().AddInternalReference(_PROJECTOR_BOX_PROTOTYPE_PATH)
+        projector.SetInstanceable(True)
+        return primPath
+
+    projector = stage.DefinePrim(projectorBoxPath, 'Cube')
+    projectorXform = UsdGeom.Xformable(projector)
+
+    projectorXform.ClearXformOpOrder()
+    projectorXform.AddTranslateOp().Set(value=(0, 0, 42.0))
+    projectorXform.AddScaleOp().Set(value=(50.0, 15, 40.0))
+
+    return primPath
+
+
+def _author_warp_mesh_on_stage(stage: Usd.Stage, cameraPath: str, mesh: WarpMesh):
+    warpMesh = UsdGeom.Mesh.Define(stage, cameraPath + '/' + WARP_MESH_NAME)
+    # Warp points are already in stage space, the transform of the camera is ignored.
+    warpMesh.SetResetXformStack(True)
+    warpMesh.CreatePointsAttr(Vt.Vec3fArray.FromNumpy(mesh.points))
+    warpMesh.CreateFaceVertexCountsAttr(Vt.IntArray.FromNumpy(mesh.face_vertex_counts))
+    warpMesh.CreateFaceVertexIndicesAttr(Vt.IntArray.FromNumpy(mesh.face_vertex_indices))
+    warpMesh.CreateExtentAttr(Vt.Vec3fArray.FromNumpy(mesh.extent))
+    warpMesh.CreateSubdivisionSchemeAttr(UsdGeom.Tokens.none)
+    UsdGeom.PrimvarsAPI(warpMesh).CreatePrimvar('st', Sdf.ValueTypeNames.TexCoord2fArray,
+                                                UsdGeom.Tokens.vertex).Set(Vt.Vec2fArray.FromNumpy(mesh.uvs))
+
+
+def _author_blend_maps_on_stage(stage: Usd.Stage, cameraPath: str, textures: dict):
+    rectLight = stage.GetPrimAtPath(cameraPath + '/ProjectLight')
+    if 'alphaMap' in textures:
+        rectLight.CreateAttribute('inputs:texture:file', Sdf.ValueTypeNames.Asset).Set(
+            Sdf.AssetPath(textures['alphaMap']))
+    if 'betaMap' in textures:
+        rectLight.CreateAttribute('inputs:mpcdi:betaMap', Sdf.ValueTypeNames.Asset, custom=True).Set(
+            Sdf.AssetPath(textures['betaMap']))
+
+
+_XFORM_OP_ORDER = Sdf.ValueTypeNames.TokenArray
+_CAMERA_XFORM_OP_ORDER = ["xformOp:translate", "xformOp:rotateY", "xformOp:rotateX", "xformOp:rotateZ"]
+_PROJECTOR_BOX_XFORM_OP_ORDER = ["xformOp:translate", "xformOp:scale"]
+_WARP_MESH_XFORM_OP_ORDER = ["!resetXformStack!"]
+
+
+def _define_prim_spec(layer: Sdf.Layer, path: str, typeName: str) -> Sdf.PrimSpec:
+    primSpec = Sdf.CreatePrimInLayer(layer, path)
+    primSpec.specifier = Sdf.SpecifierDef
+    primSpec.typeName = typeName
+    return primSpec
+
+
+def _set_attribute_spec(primSpec: Sdf.PrimSpec, name: str, typeName: Sdf.ValueTypeName, value,
+                        variability=Sdf.VariabilityVarying, custom=False) -> Sdf.AttributeSpec:
+    attributeSpec = primSpec.layer.GetAttributeAtPath(primSpec.path.AppendProperty(name))
+    if attributeSpec is None:
+        attributeSpec = Sdf.AttributeSpec(primSpec, name, typeName, variability, custom)
+    attributeSpec.default = value
+    return attributeSpec
+
+
+def _set_light_defaults(rectLight: Sdf.PrimSpec):
+    _set_attribute_spec(rectLight, 'isProjector', Sdf.ValueTypeNames.Bool, True, custom=True)
+    _set_attribute_spec(rectLight, 'intensity', Sdf.ValueTypeNames.Float, 15000, custom=True)
+    _set_attribute_spec(rectLight, 'exposure', Sdf.ValueTypeNames.Float, 5, custom=True)
+
+
+def _set_projector_box_ops(projector: Sdf.PrimSpec):
+    _set_attribute_spec(projector, 'xformOp:translate', Sdf.ValueTypeNames.Double3, Gf.Vec3d(0, 0, 42.0))
+    _set_attribute_spec(projector, 'xformOp:scale', Sdf.ValueTypeNames.Float3, Gf.Vec3f(50.0, 15, 40.0))
+    _set_attribute_spec(projector, 'xformOpOrder', _XFORM_OP_ORDER, _PROJECTOR_BOX_XFORM_OP_ORDER,
+                        Sdf.VariabilityUniform)
+
+
+def _define_prototypes_on_layer(layer: Sdf.Layer):
+    prototypes = _define_prim_spec(layer, PROTOTYPES_PATH, "Scope")
+    prototypes.specifier = Sdf.SpecifierClass
+    _set_light_defaults(_define_prim_spec(layer, _PROJECT_LIGHT_CLASS_PATH, 'RectLight'))
+    _set_projector_box_ops(_define_prim_spec(layer, _PROJECTOR_BOX_PROTOTYPE_PATH, 'Xform'))
+    _define_prim_spec(layer, _PROJECTOR_BOX_PROTOTYPE_PATH + '/Box', 'Cube')
+
+
+def _author_region_on_layer(layer: Sdf.Layer, bufferPath: str, region: MPCDIRegionView,
+                            parameters: ProjectorParameters, index: int, instancing: bool = False) -> str:
+    # Same content as _author_region_on_stage, but written as specs so no stage is notified per attribute.
+    primPath = bufferPath + '/' + clean_name_for_usd(region.region_id)
+
+    prim = _define_prim_spec(layer, primPath, "Camera")
+    _set_attribute_spec(prim, 'focalLength', Sdf.ValueTypeNames.Float, FOCAL_LENGTH)
+    _set_attribute_spec(prim, 'focusDistance', Sdf.ValueTypeNames.Float, FOCUS_DISTANCE)
+    _set_attribute_spec(prim, 'horizontalAperture', Sdf.ValueTypeNames.Float,
+                        float(parameters.horizontal_aperture[index]))
+    _set_attribute_spec(prim, 'horizontalApertureOffset', Sdf.ValueTypeNames.Float,
+                        float(parameters.horizontal_aperture_offset[index]))
+    _set_attribute_spec(prim, 'verticalAperture', Sdf.ValueTypeNames.Float, float(parameters.vertical_aperture[index]))
+    _set_attribute_spec(prim, 'verticalApertureOffset', Sdf.ValueTypeNames.Float,
+                        float(parameters.vertical_aperture_offset[index]))
+
+    _set_attribute_spec(prim, 'xformOp:translate', Sdf.ValueTypeNames.Double3,
+                        Gf.Vec3d(*parameters.translate[index].tolist()))
+    _set_attribute_spec(prim, 'xformOp:rotateY', Sdf.ValueTypeNames.Float, float(parameters.yaw[index]))
+    _set_attribute_spec(prim, 'xformOp:rotateX', Sdf.ValueTypeNames.Float, float(parameters.pitch[index]))
+    _set_attribute_spec(prim, 'xformOp:rotateZ', Sdf.ValueTypeNames.Float, float(parameters.roll[index]))
+    _set_attribute_spec(prim, 'xformOpOrder', _XFORM_OP_ORDER, _CAMERA_XFORM_OP_ORDER, Sdf.VariabilityUniform)
+
+    rectLight = _define_prim_spec(layer, primPath + '/ProjectLight', 'RectLight')
+    if instancing:
+        rectLight.inheritPathList.Prepend(Sdf.Path(_PROJECT_LIGHT_CLASS_PATH))
+    else:
+        _set_light_defaults(rectLight)
+    _set_attribute_spec(rectLight, 'inputs:width', Sdf.ValueTypeNames.Float, float(parameters.light_width[index]))
+    _set_attribute_spec(rectLight, 'inputs:height', Sdf.ValueTypeNames.Float, float(parameters.light_height[index]))
+
+    if instancing:
+        projector = _define_prim_spec(layer, primPath + '/ProjectorBox', 'Xform')
+        projector.referenceList.Prepend(Sdf.Reference(primPath=_PROJECTOR_BOX_PROTOTYPE_PATH))
+        projector.instanceable = True
+    else:
+        _set_projector_box_ops(_define_prim_spec(layer, primPath + '/ProjectorBox', 'Cube'))
+
+    return primPath
+
+
+def _author_warp_mesh_on_layer(layer: Sdf.Layer, cameraPath: str, mesh: WarpMesh):
+    # Each array is converted from NumPy in a single call, see _author_warp_mesh_on_stage for the stage version.
+    warpMesh = _define_prim_spec(layer, cameraPath + '/' + WARP_MESH_NAME, 'Mesh')
+    _set_attribute_spec(warpMesh, 'xformOpOrder', _XFORM_OP_ORDER, _WARP_MESH_XFORM_OP_ORDER, Sdf.VariabilityUniform)
+    _set_attribute_spec(warpMesh, 'points', Sdf.ValueTypeNames.Point3fArray, Vt.Vec3fArray.FromNumpy(mesh.points))
+    _set_attribute_spec(warpMesh, 'faceVertexCounts', Sdf.ValueTypeNames.IntArray,
+                        Vt.IntArray.FromNumpy(mesh.face_vertex_counts))
+    _set_attribute_spec(warpMesh, 'faceVertexIndices', Sdf.ValueTypeNames.IntArray,
+                        Vt.IntArray.FromNumpy(mesh.face_vertex_indices))
+    _set_attribute_spec(warpMesh, 'extent', Sdf.ValueTypeNames.Float3Array, Vt.Vec3fArray.FromNumpy(mesh.extent))
+    _set_attribute_spec(warpMesh, 'subdivisionScheme', Sdf.ValueTypeNames.Token, UsdGeom.Tokens.none,
+                        Sdf.VariabilityUniform)
+    uvs = _set_attribute_spec(warpMesh, 'primvars:st', Sdf.ValueTypeNames.TexCoord2fArray,
+                              Vt.Vec2fArray.FromNumpy(mesh.uvs))
+    uvs.SetInfo('interpolation', UsdGeom.Tokens.vertex)
+
+
+def _author_blend_maps_on_layer(layer: Sdf.Layer, cameraPath: str, textures: dict):
+    # The alpha (blend) map is the light texture, the beta (black level) map has no standard input.
+    rectLight = layer.GetPrimAtPath(cameraPath + '/ProjectLight')
+    if 'alphaMap' in textures:
+        _set_attribute_spec(rectLight, 'inputs:texture:file', Sdf.ValueTypeNames.Asset,
+                            Sdf.AssetPath(textures['alphaMap']))
+    if 'betaMap' in textures:
+        _set_attribute_spec(rectLight, 'inputs:mpcdi:betaMap', Sdf.ValueTypeNames.Asset,
+                            Sdf.AssetPath(textures['betaMap']), custom=True)
+
+
+def _iter_warp_meshes(package: MPCDIPackage, result: MPCDIConversionResult, decimation: int, regionIds=None):
+    # Warp files are read one region at a time and released once their mesh is built.
+    for regionId, fileset in package.filesets.items():
+        if regionIds is not None and regionId not in regionIds:
+            continue
+        camera = result.cameras.get(regionId)
+        warpPath = fileset.path('geometryWarpFile')
+        if camera is None or not warpPath:
+            continue
+
+        member = package.member(warpPath)
+        try:
+            with span("compute"):
+                mesh = build_warp_mesh(read_pfm(member.buffer()), camera[1], decimation)
+        finally:
+            member.release()
+        yield camera[0], mesh
+
+
+def _iter_blend_maps(package: MPCDIPackage, result: MPCDIConversionResult, maxSize: int, mapsDirectory: str,
+                     layerDirectory: str, regionIds=None):
+    # Maps are decoded lazily, one region at a time. A broken map only loses its texture, not the whole import.
+    logger = logging.getLogger(__name__)
+    for regionId, fileset in package.filesets.items():
+        if regionIds is not None and regionId not in regionIds:
+            continue
+        camera = result.cameras.get(regionId)
+        if camera is None:
+            continue
+
+        textures = {}
+        for tag in BLEND_MAP_TAGS:
+            mapPath = fileset.path(tag)
+            if not mapPath:
+                continue
+            try:
+                member = package.member(mapPath)
+                with span("compute"):
+                    texturePath = write_blend_map(member, mapsDirectory, clean_name_for_usd(regionId) + '_' + tag,
+                                                  maxSize)
+                member.release()
+            except (OSError, ValueError) as e:
+                logger.warning(f"Cannot read {tag} {mapPath} of region '{regionId}': {e}")
+                continue
+
+            if texturePath is None:
+                logger.warning(f"No maps directory to write {tag} {mapPath} of region '{regionId}'.")
+                continue
+            textures[tag] = _anchored_asset_path(texturePath, layerDirectory)
+
+        if textures:
+            yield camera[0], textures
+
+
+def _layer_path(context: MPCDIConverterContext, layer: Sdf.Layer) -> str:
+    return context.layer_path or layer.realPath
+
+
+def _maps_directory(context: MPCDIConverterContext, layer: Sdf.Layer) -> str:
+    if context.maps_directory:
+        return context.maps_directory
+    layerPath = _layer_path(context, layer)
+    if layerPath:
+        return os.path.splitext(layerPath)[0] + "_maps"
+    return ""
+
+
+def _anchored_asset_path(path: str, layerDirectory: str) -> str:
+    # Asset path of a local file relative to the directory of the layer, so the layer and its maps can be moved
+    # together. Absolute when there is no layer directory or the file is on another drive.
+    if layerDirectory:
+        try:
+            path = "./" + os.path.relpath(path, layerDirectory)
+        except ValueError:
+            pass
+    return path.replace("\\", "/")
+
+
+def _reanchor_asset_path(path: str, prefix: str) -> str:
+    # Asset path of a file relative to a layer, seen from a layer in a sub folder `prefix` is the way back from.
+    if path.startswith("./"):
+        return prefix + path[2:]
+    if path.startswith("../"):
+        return prefix + path
+    return path
+
+
+def _region_hash(region: MPCDIRegionView, instancing: bool = False) -> str:
+    values = (_HASH_VERSION, region.buffer_id, region.region_id, region.x_resolution, region.y_resolution,
+              tuple(region.frustum[tag] for tag in FRUSTUM_TAGS),
+              tuple(region.coordinate_frame[tag] for tag in COORDINATE_FRAME_TAGS))
+    if instancing:
+        # Only marks instanced regions, the hashes of the regions imported before the option existed stay valid.
+        values += ("instancing",)
+    return hashlib.sha1(repr(values).encode("utf-8")).hexdigest()
+
+
+def _payload_hash(package: MPCDIPackage, regionId: str, context: MPCDIConverterContext) -> str:
+    # Covers the fileset entries, the content of the files they reference (see the member cache keys) and the
+    # options used to convert them. Empty when the region has no payload.
+    fileset = package.filesets.get(regionId) if package is not None else None
+    if fileset is None or not fileset.files:
+        return ""
+
+    values = [context.options()]
+    for tag, entry in sorted(fileset.files.items()):
+        try:
+            memberKey = package.member(entry.get("path", "")).cache_key
+        except (OSError, ValueError):
+            memberKey = None
+        values.append((tag, sorted(entry.items()), memberKey))
+    return hashlib.sha1(repr(values).encode("utf-8")).hexdigest()
+
+
+def _get_region_hashes(primSpec: Sdf.PrimSpec):
+    hashes = primSpec.customData.get(_HASHES_KEY, {})
+    return hashes.get("hash"), hashes.get("payloadHash", "")
+
+
+def _set_region_hashes(primSpec: Sdf.PrimSpec, regionHash: str, payloadHash: str):
+    primSpec.SetInfo('customData', {_HASHES_KEY: {"hash": regionHash, "payloadHash": payloadHash}})
+
+
+def _read_region_hashes(layer: Sdf.Layer) -> dict:
+    # Hashes of the region cameras already in `layer`, by camera path.
+    hashes = {}
+    root = layer.GetPrimAtPath(MPCDI_ROOT_PATH)
+    if root is not None:
+        for buffer in root.nameChildren:
+            if buffer.name == PROTOTYPES_NAME:
+                continue
+            for primSpec in buffer.nameChildren:
+                hashes[primSpec.path.pathString] = _get_region_hashes(primSpec)
+    return hashes
+
+
+def _remove_prim_spec(layer: Sdf.Layer, path: str):
+    primSpec = layer.GetPrimAtPath(path)
+    if primSpec is not None:
+        del primSpec.realNameParent.nameChildren[primSpec.name]
+
+
+def _clear_prim_spec(layer: Sdf.Layer, path: str):
+    # Empty the spec at `path` but keep it, and so its place among its siblings.
+    primSpec = layer.GetPrimAtPath(path)
+    if primSpec is None:
+        return
+    for name in list(primSpec.nameChildren.keys()):
+        del primSpec.nameChildren[name]
+    for propertySpec in list(primSpec.properties):
+        primSpec.RemoveProperty(propertySpec)
+    for key in primSpec.ListInfoKeys():
+        if key not in ("specifier", "typeName"):
+            primSpec.ClearInfo(key)
+
+
+def _remove_regions(layer: Sdf.Layer, paths, changes: MPCDIChangeReport):
+    # Buffers left without region are removed as well.
+    buffers = set()
+    for path in paths:
+        _remove_prim_spec(layer, path)
+        changes.removed.append(path)
+        buffers.add(Sdf.Path(path).GetParentPath().pathString)
+    for bufferPath in buffers:
+        buffer = layer.GetPrimAtPath(bufferPath)
+        if buffer is not None and len(buffer.nameChildren) == 0:
+            _remove_prim_spec(layer, bufferPath)
+
+
+def _clear_payloads_on_layer(layer: Sdf.Layer, cameraPath: str):
+    _remove_prim_spec(layer, cameraPath + '/' + WARP_MESH_NAME)
+    rectLight = layer.GetPrimAtPath(cameraPath + '/ProjectLight')
+    if rectLight is None:
+        return
+    for name in ('inputs:texture:file', 'inputs:mpcdi:betaMap'):
+        attributeSpec = rectLight.properties.get(name)
+        if attributeSpec is not None:
+            rectLight.RemoveProperty(attributeSpec)
+
+
+def _iter_blend_map_specs(layer: Sdf.Layer, cameraPaths=None):
+    # Texture attributes of the lights of the regions in `layer`, or of the regions at `cameraPaths`.
+    if cameraPaths is None:
+        root = layer.GetPrimAtPath(MPCDI_ROOT_PATH)
+        if root is None:
+            return
+        cameras = [camera for buffer in root.nameChildren for camera in buffer.nameChildren]
+    else:
+        cameras = [layer.GetPrimAtPath(path) for path in cameraPaths]
+    for camera in cameras:
+        rectLight = camera.nameChildren.get('ProjectLight') if camera is not None else None
+        if rectLight is None:
+            continue
+        for name in ('inputs:texture:file', 'inputs:mpcdi:betaMap'):
+            attributeSpec = rectLight.properties.get(name)
+            if attributeSpec is not None and attributeSpec.default:
+                yield attributeSpec
+
+
+def _reanchor_blend_maps(layer: Sdf.Layer, prefix: str, cameraPaths=None):
+    for attributeSpec in _iter_blend_map_specs(layer, cameraPaths):
+        attributeSpec.default = Sdf.AssetPath(_reanchor_asset_path(attributeSpec.default.path, prefix))
+
+
+def _export_blend_maps(layer: Sdf.Layer, cachedMapsDirectory: str, mapsDirectory: str, layerDirectory: str):
+    # Textures of a cached layer are authored with absolute paths into the cache entry. They are copied to the maps
+    # directory of `layer`, so they do not go away with the entry, and authored relative to it like author_to_layer
+    # does. Regions kept by an incremental copy already have relative paths.
+    cachedMapsDirectory = os.path.normcase(os.path.normpath(cachedMapsDirectory))
+    for attributeSpec in _iter_blend_map_specs(layer):
+        path = attributeSpec.default.path
+        if path.startswith("./") or path.startswith("../"):
+            continue
+        if mapsDirectory and os.path.normcase(os.path.dirname(os.path.normpath(path))) == cachedMapsDirectory:
+            os.makedirs(mapsDirectory, exist_ok=True)
+            texturePath = os.path.join(mapsDirectory, os.path.basename(path))
+            shutil.copyfile(path, texturePath)
+            path = texturePath
+        attributeSpec.default = Sdf.AssetPath(_anchored_asset_path(path, layerDirectory))
+
+
+def author_to_layer(batches, layer: Sdf.Layer, package: MPCDIPackage = None,
+                    context: MPCDIConverterContext = None) -> MPCDIConversionResult:
+    """Write the regions of `batches` (see parse_batches) as specs under /MPCDI in `layer`.
+
+    Everything is authored inside a single Sdf.ChangeBlock, stages using the layer recompose once at the end.
+    When the batches were parsed from `package`, the warp files of its filesets are added as meshes under the cameras
+    and the blend maps as textures of the lights.
+
+    Each region camera records the hashes of its inputs. With `context.incremental`, regions whose hashes match the
+    ones already in `layer` are left untouched and regions missing from the batches are removed, see result.changes.
+    """
+    if context is None:
+        context = MPCDIConverterContext()
+    result = MPCDIConversionResult()
+
+    with Sdf.ChangeBlock():
+        existing = None
+        if context.incremental:
+            result.changes = MPCDIChangeReport()
+            existing = _read_region_hashes(layer)
+
+        _define_prim_spec(layer, MPCDI_ROOT_PATH, "Xform")
+        if context.instancing:
+            _define_prototypes_on_layer(layer)
+        else:
+            _remove_prim_spec(layer, PROTOTYPES_PATH)
+
+        bufferPaths = {}
+        authoredIds = set()
+        for regions, parameters in batches:
+            for index, region in enumerate(regions):
+                bufferPath = bufferPaths.get(region.buffer_id)
+                if bufferPath is None:
+                    bufferPath = MPCDI_ROOT_PATH + '/' + clean_name_for_usd(region.buffer_id)
+                    _define_prim_spec(layer, bufferPath, "Scope")
+                    bufferPaths[region.buffer_id] = bufferPath
+
+                regionHash = _region_hash(region, context.instancing)
+                if existing is not None:
+                    cameraPath = bufferPath + '/' + clean_name_for_usd(region.region_id)
+                    previous = existing.pop(cameraPath, None)
+                    if previous is None:
+                        result.changes.added.append(cameraPath)
+                    elif previous[0] == regionHash:
+                        result.changes.unchanged.append(cameraPath)
+                        result.add_region(region, cameraPath)
+                        continue
+                    else:
+                        # Start from an empty spec, no stale op or attribute survives. The spec itself is kept so the
+                        # region keeps its place in the buffer.
+                        result.changes.changed.append(cameraPath)
+                        _clear_prim_spec(layer, cameraPath)
+
+                cameraPath = _author_region_on_layer(layer, bufferPath, region, parameters, index, context.instancing)
+                _set_region_hashes(layer.GetPrimAtPath(cameraPath), regionHash, "")
+                result.add_region(region, cameraPath)
+                authoredIds.add(region.region_id)
+
+            result.add_batch(parameters)
+
+        if existing:
+            _remove_regions(layer, existing.keys(), result.changes)
+
+        # Filesets are only known once all the batches are parsed.
+        payloadIds = set()
+        for regionId, (cameraPath, _) in result.cameras.items():
+            payloadHash = _payload_hash(package, regionId, context)
+            authored = regionId in authoredIds
+            if authored and not payloadHash:
+                continue
+
+            cameraSpec = layer.GetPrimAtPath(cameraPath)
+            regionHash, previousPayloadHash = _get_region_hashes(cameraSpec)
+            if not authored:
+                if payloadHash == previousPayloadHash:
+                    continue
+                _clear_payloads_on_layer(layer, cameraPath)
+                result.changes.unchanged.remove(cameraPath)
+                result.changes.changed.append(cameraPath)
+            _set_region_hashes(cameraSpec, regionHash, payloadHash)
+            if payloadHash:
+                payloadIds.add(regionId)
+
+        if payloadIds:
+            for cameraPath, mesh in _iter_warp_meshes(package, result, context.warp_decimation, payloadIds):
+                _author_warp_mesh_on_layer(layer, cameraPath, mesh)
+            for cameraPath, textures in _iter_blend_maps(package, result, context.blend_map_max_size,
+                                                         _maps_directory(context, layer),
+                                                         os.path.dirname(_layer_path(context, layer)), payloadIds):
+                _author_blend_maps_on_layer(layer, cameraPath, textures)
+
+    return result
+
+
+def convert_to_layer(source, layer: Sdf.Layer, context: MPCDIConverterContext = None) -> MPCDIConversionResult:
+    """Write the MPCDI document read from `source` as specs under /MPCDI in `layer`.
+
+    `source` is a file path, a binary file object or an MPCDIPackage, it is streamed in batches of
+    regions, no document is built.
+    Raises on malformed documents, callers are responsible for reporting the error.
+    """
+    package = source if isinstance(source, MPCDIPackage) else None
+    return author_to_layer(parse_batches(source), layer, package, context)
+
+
+def author_to_stage(batches, stage: Usd.Stage, package: MPCDIPackage = None,
+                    context: MPCDIConverterContext = None) -> MPCDIConversionResult:
+    """Author the regions of `batches` (see parse_batches) under /MPCDI in `stage`, through the UsdStage API."""
+    if context is None:
+        context = MPCDIConverterContext()
+    result = MPCDIConversionResult()
+
+    mpcdiId = MPCDI_ROOT_PATH
+    stage.DefinePrim(mpcdiId, "Xform")
+    if context.instancing:
+        _define_prototypes_on_stage(stage)
+
+    bufferPaths = {}
+    for regions, parameters in batches:
+        for index, region in enumerate(regions):
+            bufferPath = bufferPaths.get(region.buffer_id)
+            if bufferPath is None:
+                bufferPath = mpcdiId + '/' + clean_name_for_usd(region.buffer_id)
+                stage.DefinePrim(bufferPath, "Scope")
+                bufferPaths[region.buffer_id] = bufferPath
+
+            # A region is a projector
+            cameraPath = _author_region_on_stage(stage, bufferPath, region, parameters, index, context.instancing)
+            result.add_region(region, cameraPath)
+
+        result.add_batch(parameters)
+
+    if package is not None:
+        for cameraPath, mesh in _iter_warp_meshes(package, result, context.warp_decimation):
+            _author_warp_mesh_on_stage(stage, cameraPath, mesh)
+        for cameraPath, textures in _iter_blend_maps(package, result, context.blend_map_max_size,
+                                                     _maps_directory(context, stage.GetRootLayer()),
+                                                     os.path.dirname(_layer_path(context, stage.GetRootLayer()))):
+            _author_blend_maps_on_stage(stage, cameraPath, textures)
+
+    return result
+
+
+def convert_to_stage(source, stage: Usd.Stage, context: MPCDIConverterContext = None) -> MPCDIConversionResult:
+    """Author the MPCDI document read from `source` under /MPCDI in `stage`, see convert_to_layer."""
+    package = source if isinstance(source, MPCDIPackage) else None
+    return author_to_stage(parse_batches(source), stage, package, context)
+
+
+def copy_mpcdi_hierarchy(sourceLayer: Sdf.Layer, layer: Sdf.Layer, changes: MPCDIChangeReport = None,
+                         bufferNames=None):
+    """Copy the regions found under /MPCDI in `sourceLayer` to `layer`, keeping other regions of `layer`.
+
+    With `changes`, the copy is incremental: regions with the same hashes in both layers are skipped, regions of
+    `layer` missing from `sourceLayer` are removed and `changes` reports what was done. `bufferNames` restricts the
+    copy to some buffers.
+    """
+    with Sdf.ChangeBlock():
+        existing = None
+        if changes is not None:
+            existing = _read_region_hashes(layer)
+
+        root = _define_prim_spec(layer, MPCDI_ROOT_PATH, "Xform")
+        # Sdf.CopySpec replaces existing specs in place, they keep their place among their siblings.
+        if sourceLayer.GetPrimAtPath(PROTOTYPES_PATH) is not None:
+            Sdf.CopySpec(sourceLayer, PROTOTYPES_PATH, layer, PROTOTYPES_PATH)
+        else:
+            _remove_prim_spec(layer, PROTOTYPES_PATH)
+
+        for sourceBuffer in sourceLayer.GetPrimAtPath(MPCDI_ROOT_PATH).nameChildren:
+            if sourceBuffer.name == PROTOTYPES_NAME or (bufferNames is not None and
+                                                        sourceBuffer.name not in bufferNames):
+                continue
+            buffer = root.nameChildren.get(sourceBuffer.name)
+            if buffer is None:
+                buffer = _define_prim_spec(layer, sourceBuffer.path.pathString, sourceBuffer.typeName)
+            for sourceRegion in sourceBuffer.nameChildren:
+                if existing is not None:
+                    path = sourceRegion.path.pathString
+                    previous = existing.pop(path, None)
+                    if previous is None:
+                        changes.added.append(path)
+                    elif previous == _get_region_hashes(sourceRegion):
+                        changes.unchanged.append(path)
+                        continue
+                    else:
+                        changes.changed.append(path)
+                Sdf.CopySpec(sourceLayer, sourceRegion.path, layer, sourceRegion.path)
+
+        if existing:
+            _remove_regions(layer, existing.keys(), changes)
+
+
+def convert_to_layer_cached(batches, layer: Sdf.Layer, cache, content_hash: str, context: MPCDIConverterContext,
+                            package: MPCDIPackage = None) -> MPCDIConversionResult:
+    """Same as author_to_layer, but reuses the converted layer stored in `cache` when the input is unchanged.
+
+    `batches` is only consumed on a cache miss, pass the lazy parse_batches generator to skip parsing on hits.
+    The key does not depend on where `layer` is written: the textures of the cached layer are kept in the cache and
+    copied to the maps directory of `layer` on each use.
+    """
+    key = cache.make_key(content_hash, context.options())
+    cachedPath = cache.lookup(key)
+
+    result = MPCDIConversionResult()
+    summary = current_summary()
+    if summary is not None:
+        summary.cache_hit = cachedPath is not None
+    if cachedPath is not None:
+        with span("read"):
+            cachedLayer = Sdf.Layer.FindOrOpen(cachedPath)
+        layerData = cachedLayer.customLayerData
+        result.region_count = layerData.get(_REGION_COUNT_KEY, 0)
+        result.has_lens_shifting = layerData.get(_LENS_SHIFTING_KEY, False)
+    else:
+        cachedLayer = Sdf.Layer.CreateAnonymous(CACHE_FILE_EXTENSION)
+        cachedContext = copy.copy(context)
+        cachedContext.maps_directory = cache.maps_directory(key)
+        cachedContext.layer_path = ""
+        result = author_to_layer(batches, cachedLayer, package, cachedContext)
+        cachedLayer.defaultPrim = MPCDI_ROOT_PATH[1:]
+        cachedLayer.customLayerData = {
+            _REGION_COUNT_KEY: result.region_count,
+            _LENS_SHIFTING_KEY: result.has_lens_shifting,
+        }
+        with span("save"):
+            cache.store(key, cachedLayer)
+
+    # The cached layer is complete, the changes are the ones between the cached regions and `layer`.
+    result.changes = MPCDIChangeReport() if context.incremental else None
+    with span("author"), Sdf.ChangeBlock():
+        copy_mpcdi_hierarchy(cachedLayer, layer, result.changes)
+        _export_blend_maps(layer, cache.maps_directory(key), _maps_directory(context, layer),
+                           os.path.dirname(_layer_path(context, layer)))
+
+    return result
+
+
+def native_format_available() -> bool:
+    # Importing the package registered the plugin if it was built.
+    return Sdf.FileFormat.FindById(NATIVE_FORMAT_ID) is not None
+
+
+def _spec_hash(primSpec: Sdf.PrimSpec) -> str:
+    # Hash of the values authored on a prim and its descendants, used for the regions read by the native plugin.
+    values = (primSpec.name, primSpec.typeName,
+              sorted((attribute.name, repr(attribute.default)) for attribute in primSpec.attributes),
+              [_spec_hash(child) for child in primSpec.nameChildren])
+    return hashlib.sha1(repr((_HASH_VERSION, "native", values)).encode("utf-8")).hexdigest()
+
+
+def author_native(path: str, layer: Sdf.Layer, context: MPCDIConverterContext = None) -> MPCDIConversionResult:
+    """Write the `.mpcdi.xml` document at `path` under /MPCDI in `layer`, parsed by the native MpcdiFileFormat plugin.
+
+    The plugin produces the same hierarchy as author_to_layer, it is copied region by region. Warp and blend payloads
+    and instancing are not supported by the plugin. With `context.incremental`, the regions are compared with hashes
+    of their authored values.
+    """
+    if context is None:
+        context = MPCDIConverterContext()
+    if not native_format_available():
+        raise RuntimeError("The native MPCDI file format plugin is not registered.")
+
+    with span("parse"):
+        nativeLayer = Sdf.Layer.FindOrOpen(path)
+    if nativeLayer is None:
+        raise IOError(f"Cannot open {path} with the native MPCDI file format plugin.")
+
+    # The plugin creates the regions of a buffer on first traversal, they are copied to a staging layer where the
+    # region hashes can be written.
+    result = MPCDIConversionResult()
+    stagingLayer = Sdf.Layer.CreateAnonymous(CACHE_FILE_EXTENSION)
+    with Sdf.ChangeBlock():
+        Sdf.CopySpec(nativeLayer, MPCDI_ROOT_PATH, stagingLayer, MPCDI_ROOT_PATH)
+        for buffer in stagingLayer.GetPrimAtPath(MPCDI_ROOT_PATH).nameChildren:
+            for camera in buffer.nameChildren:
+                _set_region_hashes(camera, _spec_hash(camera), "")
+                result.region_count += 1
+                offsets = (camera.attributes.get(name) for name in ('horizontalApertureOffset',
+                                                                      'verticalApertureOffset'))
+                if any(offset is not None and offset.default for offset in offsets):
+                    result.has_lens_shifting = True
+
+    result.changes = MPCDIChangeReport() if context.incremental else None
+    copy_mpcdi_hierarchy(stagingLayer, layer, result.changes)
+    return result
+
+
+def _buffer_layer_paths(path: str, bufferName: str):
+    # Absolute path of a buffer layer and the asset path of its payload, relative to the layer at `path`.
+    stem, ext = os.path.splitext(path)
+    folder = os.path.basename(stem) + "_buffers"
+    return stem + "_buffers/" + bufferName + ext, "./" + folder + "/" + bufferName + ext
+
+
+def write_buffer_payloads(sourceLayer: Sdf.Layer, layer: Sdf.Layer, path: str,
+                          changes: MPCDIChangeReport = None) -> list:
+    """Write each buffer under /MPCDI in `sourceLayer` to its own layer next to `path`, and make `layer`, the layer
+    that will be saved at `path`, a summary loading them as payloads of /MPCDI/<buffer>.
+
+    The buffer layers go to a `<name>_buffers` folder and are saved concurrently, `layer` only holds the buffer prims
+    and lists the buffers with their number of regions in its customLayerData. With `changes`, each buffer layer is
+    updated incrementally from its previous version, see copy_mpcdi_hierarchy. Returns the buffer layer paths.
+
+    Relative texture paths of `sourceLayer`, authored next to `path`, are rewritten for the buffer folder in the
+    buffer layers, `sourceLayer` is left untouched.
+    """
+    sourceRoot = sourceLayer.GetPrimAtPath(MPCDI_ROOT_PATH)
+    bufferNames = [buffer.name for buffer in sourceRoot.nameChildren if buffer.name != PROTOTYPES_NAME]
+
+    bufferLayers = []
+    bufferCounts = {}
+    with span("author"):
+        for bufferName in bufferNames:
+            bufferPath, _ = _buffer_layer_paths(path, bufferName)
+            bufferLayer = None
+            if changes is not None and Ar.GetResolver().Resolve(bufferPath):
+                bufferLayer = Sdf.Layer.OpenAsAnonymous(bufferPath)
+            if bufferLayer is None:
+                bufferLayer = Sdf.Layer.CreateAnonymous(os.path.splitext(path)[1])
+            # Only the regions copied from `sourceLayer` are re-anchored, the ones kept from the previous version of
+            # the buffer layer already are.
+            bufferChanges = MPCDIChangeReport() if changes is not None else None
+            copy_mpcdi_hierarchy(sourceLayer, bufferLayer, bufferChanges, {bufferName})
+            if bufferChanges is None:
+                _reanchor_blend_maps(bufferLayer, "../")
+            else:
+                _reanchor_blend_maps(bufferLayer, "../", bufferChanges.added + bufferChanges.changed)
+                for name in ("added", "removed", "changed", "unchanged"):
+                    getattr(changes, name).extend(getattr(bufferChanges, name))
+            bufferLayer.defaultPrim = MPCDI_ROOT_PATH[1:]
+            bufferCounts[bufferName] = len(sourceRoot.nameChildren[bufferName].nameChildren)
+            bufferLayers.append((bufferLayer, bufferPath))
+
+        with Sdf.ChangeBlock():
+            # The summary is small, it is written again from scratch.
+            previous = layer.GetPrimAtPath(MPCDI_ROOT_PATH)
+            if previous is not None and changes is not None:
+                for buffer in previous.nameChildren:
+                    if buffer.name not in bufferCounts and buffer.name != PROTOTYPES_NAME:
+                        changes.removed.append(buffer.path.pathString)
+            _remove_prim_spec(layer, MPCDI_ROOT_PATH)
+            _define_prim_spec(layer, MPCDI_ROOT_PATH, "Xform")
+            for bufferName in bufferNames:
+                _, assetPath = _buffer_layer_paths(path, bufferName)
+                buffer = _define_prim_spec(layer, MPCDI_ROOT_PATH + '/' + bufferName, "Scope")
+                buffer.payloadList.Prepend(Sdf.Payload(assetPath, Sdf.Path(MPCDI_ROOT_PATH + '/' + bufferName)))
+            layer.defaultPrim = MPCDI_ROOT_PATH[1:]
+            customLayerData = layer.customLayerData
+            customLayerData[_BUFFERS_KEY] = bufferCounts
+            layer.customLayerData = customLayerData
+
+    def save(bufferLayer, bufferPath):
+        if not bufferLayer.Export(bufferPath):
+            raise IOError(f"Cannot write {bufferPath}.")
+
+    with span("save"), concurrent.futures.ThreadPoolExecutor(MAX_CONCURRENT_WRITES) as executor:
+        for future in [executor.submit(save, *entry) for entry in bufferLayers]:
+            future.result()
+
+    return [bufferPath for _, bufferPath in bufferLayers]
+
+
+def convert_file(input_path: str, output_path: str, context: MPCDIConverterContext = None) -> MPCDIConversionResult:
+    """Convert a local .mpcdi archive or .mpcdi.xml file to a new USD layer written at `output_path`.
+
+    The layer is authored in memory and only written once the conversion succeeded, a corrupt input leaves no file.
+    """
+    if context is None:
+        context = MPCDIConverterContext()
+    if not context.layer_path:
+        context = copy.copy(context)
+        context.layer_path = os.path.abspath(output_path)
+    layer = Sdf.Layer.CreateAnonymous(os.path.splitext(output_path)[1])
+    authoredLayer = layer
+    if context.layout == LAYOUT_PAYLOADS:
+        authoredLayer = Sdf.Layer.CreateAnonymous(os.path.splitext(output_path)[1])
+    with open_package(input_path) as package, span("author"):
+        result = convert_to_layer(package, authoredLayer, context)
+    if context.layout == LAYOUT_PAYLOADS:
+        result.payload_paths = write_buffer_payloads(authoredLayer, layer, output_path)
+    layer.defaultPrim = MPCDI_ROOT_PATH[1:]
+    with span("save"):
+        if not layer.Export(output_path):
+            raise IOError(f"Cannot write {output_path}.")
+
+    return result
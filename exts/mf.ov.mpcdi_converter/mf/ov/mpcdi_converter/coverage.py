@@ -0,0 +1,448 @@
+"""Projection coverage of the projectors of an MPCDI document on the meshes of a venue, computed on the CPU.
+
+    python -m mf.ov.mpcdi_converter.coverage <document.mpcdi.xml|.mpcdi> <venue.usd> [--density 64] [-j <jobs>]
+        [--json report.json] [--output hit_counts.usda]
+
+Each projector casts a grid of rays through its frustum, `density` rays along the larger side of its resolution,
+against a bounding volume hierarchy of the triangulated meshes of the venue. The report gives, for each projector, the
+fraction of its rays that hit a surface and the meshes they hit. With --output, a layer adding the number of rays that
+hit each face as a `primvars:mpcdi:hitCount` uniform primvar is written, to be used as a sublayer of the venue.
+
+Only pxr and numpy are needed, projectors are distributed over a process pool.
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+from pxr import Sdf, Usd, UsdGeom, Vt
+
+from .archive import open_package
+from .compute import camera_matrices
+from .converter import MPCDI_ROOT_PATH, parse_document
+from .document import MPCDIDocument
+from .parser import FRUSTUM_TAGS
+from .warp import WARP_MESH_NAME
+
+
+DEFAULT_DENSITY = 64
+# Triangles per BVH leaf.
+LEAF_SIZE = 8
+# Rays traced together, bounds the size of the ray/node pairs.
+RAY_CHUNK = 1024
+HIT_COUNT_PRIMVAR = "primvars:mpcdi:hitCount"
+
+_EPSILON = 1e-9
+# Nearest leaves tested per ray between two pruning steps.
+_LEAF_WAVE = 4
+_RIGHT_ANGLE, _LEFT_ANGLE, _UP_ANGLE, _DOWN_ANGLE = (FRUSTUM_TAGS.index(tag) for tag in
+                                                     ("rightAngle", "leftAngle", "upAngle", "downAngle"))
+
+
+class SceneMeshes:
+    """Triangulated meshes of a stage in world space. Faces are numbered across the meshes, the faces of
+    `paths[i]` are `face_offsets[i]` to `face_offsets[i + 1]`.
+    """
+
+    def __init__(self, paths, face_offsets, triangles, triangle_faces):
+        self.paths = paths
+        self.face_offsets = np.asarray(face_offsets, dtype=np.int64)
+        # (T, 3, 3) vertices and face of each triangle.
+        self.triangles = triangles
+        self.triangle_faces = triangle_faces
+
+    @property
+    def face_count(self) -> int:
+        return int(self.face_offsets[-1])
+
+    def mesh_of_faces(self, faces: np.ndarray) -> np.ndarray:
+        return np.searchsorted(self.face_offsets, faces, side="right") - 1
+
+
+def _triangulate(counts: np.ndarray, indices: np.ndarray):
+    # Fan triangulation, returns the (T, 3) vertex indices and the face of each triangle.
+    starts = np.cumsum(counts) - counts
+    triangleCounts = np.maximum(counts - 2, 0)
+    faces = np.repeat(np.arange(len(counts)), triangleCounts)
+    corners = np.arange(len(faces)) - np.repeat(np.cumsum(triangleCounts) - triangleCounts, triangleCounts)
+    first = starts[faces]
+    return np.stack((indices[first], indices[first + corners + 1], indices[first + corners + 2]), axis=1), faces
+
+
+def gather_meshes(stage: Usd.Stage, exclude=(MPCDI_ROOT_PATH,)) -> SceneMeshes:
+    """Collect the visible meshes of `stage`, except the ones under `exclude` and the warp meshes of the projectors."""
+    excluded = [Sdf.Path(path) for path in exclude]
+    xformCache = UsdGeom.XformCache()
+    paths = []
+    faceOffsets = [0]
+    triangles = []
+    triangleFaces = []
+    for prim in stage.Traverse():
+        if not prim.IsA(UsdGeom.Mesh) or prim.GetName() == WARP_MESH_NAME:
+            continue
+        if any(prim.GetPath().HasPrefix(path) for path in excluded):
+            continue
+        if UsdGeom.Imageable(prim).ComputeVisibility() == UsdGeom.Tokens.invisible:
+            continue
+
+        mesh = UsdGeom.Mesh(prim)
+        points = mesh.GetPointsAttr().Get()
+        counts = mesh.GetFaceVertexCountsAttr().Get()
+        indices = mesh.GetFaceVertexIndicesAttr().Get()
+        if not points or not counts or not indices:
+            continue
+        points = np.asarray(points, dtype=np.float64)
+        counts = np.asarray(counts, dtype=np.int64)
+        indices = np.asarray(indices, dtype=np.int64)
+        if counts.sum() != len(indices) or indices.min() < 0 or indices.max() >= len(points):
+            continue
+
+        matrix = np.array(xformCache.GetLocalToWorldTransform(prim), dtype=np.float64)
+        worldPoints = points @ matrix[:3, :3] + matrix[3, :3]
+        vertexIndices, faces = _triangulate(counts, indices)
+        triangles.append(worldPoints[vertexIndices].astype(np.float32))
+        triangleFaces.append(faces + faceOffsets[-1])
+        paths.append(prim.GetPath().pathString)
+        faceOffsets.append(faceOffsets[-1] + len(counts))
+
+    if not triangles:
+        return SceneMeshes(paths, faceOffsets, np.empty((0, 3, 3), dtype=np.float32), np.empty(0, dtype=np.int64))
+    return SceneMeshes(paths, faceOffsets, np.concatenate(triangles), np.concatenate(triangleFaces))
+
+
+def _spread_bits(x: np.ndarray) -> np.ndarray:
+    # Insert two zero bits between each of the 10 low bits, see _morton_codes.
+    x = (x | (x << 16)) & 0x030000FF
+    x = (x | (x << 8)) & 0x0300F00F
+    x = (x | (x << 4)) & 0x030C30C3
+    x = (x | (x << 2)) & 0x09249249
+    return x
+
+
+def _morton_codes(points: np.ndarray) -> np.ndarray:
+    low = points.min(axis=0)
+    extent = np.maximum(points.max(axis=0) - low, _EPSILON)
+    cells = np.clip(((points - low) / extent * 1023.0).astype(np.int64), 0, 1023)
+    return (_spread_bits(cells[:, 0]) << 2) | (_spread_bits(cells[:, 1]) << 1) | _spread_bits(cells[:, 2])
+
+
+class TriangleBVH:
+    """Bounding volume hierarchy of triangles, built and traversed with NumPy.
+
+    Triangles are sorted along a Morton curve and grouped by `leaf_size` into leaves. The tree over the leaves is
+    complete: level k holds 2**k boxes and the children of box i are boxes 2i and 2i+1 of the next level. Rays are
+    traversed breadth-first, all the ray/box pairs of a level at once, and the leaves they reach are tested nearest
+    first so that farther leaves are pruned once a closer hit is found.
+    """
+
+    def __init__(self, triangles: np.ndarray, leaf_size: int = LEAF_SIZE):
+        self.leaf_size = leaf_size
+        self.triangle_count = triangleCount = len(triangles)
+        leafCount = max(1, -(-triangleCount // leaf_size))
+        depth = max(0, math.ceil(math.log2(leafCount)))
+        paddedLeaves = 1 << depth
+        padding = paddedLeaves * leaf_size - triangleCount
+
+        order = np.argsort(_morton_codes(triangles.mean(axis=1)), kind="stable") if triangleCount else \
+            np.empty(0, dtype=np.int64)
+        # Original index of each sorted triangle, -1 for the padding.
+        self.triangle_ids = np.concatenate((order, np.full(padding, -1, dtype=np.int64)))
+        # Padding triangles are NaN, they never pass the intersection test.
+        sortedTriangles = np.concatenate((triangles[order], np.full((padding, 3, 3), np.nan, dtype=np.float32)))
+        self.v0 = sortedTriangles[:, 0]
+        self.e1 = sortedTriangles[:, 1] - sortedTriangles[:, 0]
+        self.e2 = sortedTriangles[:, 2] - sortedTriangles[:, 0]
+
+        # Box bounds, from the root to the leaves, padding boxes are empty (low > high).
+        low = np.concatenate((triangles[order].min(axis=1), np.full((padding, 3), np.inf, dtype=np.float32)))
+        high = np.concatenate((triangles[order].max(axis=1), np.full((padding, 3), -np.inf, dtype=np.float32)))
+        low = low.reshape(paddedLeaves, leaf_size, 3).min(axis=1)
+        high = high.reshape(paddedLeaves, leaf_size, 3).max(axis=1)
+        self.low = [low]
+        self.high = [high]
+        while len(low) > 1:
+            low = low.reshape(-1, 2, 3).min(axis=1)
+            high = high.reshape(-1, 2, 3).max(axis=1)
+            self.low.insert(0, low)
+            self.high.insert(0, high)
+        # Number of non empty boxes of each level.
+        self.box_counts = [-(-leafCount // (1 << (depth - level))) for level in range(depth + 1)]
+
+    def __len__(self):
+        return self.triangle_count
+
+    def _boxes(self, level, rays, boxes, origins, inverses):
+        # Slab test, returns the entry distance and whether each ray/box pair overlaps.
+        with np.errstate(invalid="ignore"):
+            t1 = (self.low[level][boxes] - origins[rays]) * inverses[rays]
+            t2 = (self.high[level][boxes] - origins[rays]) * inverses[rays]
+            near = np.fmax(np.fmin(t1, t2).max(axis=1), 0.0)
+            far = np.fmin(np.fmax(t1, t2).min(axis=1), np.inf)
+        return near, (far >= near) & (boxes < self.box_counts[level])
+
+    def _triangles(self, rays, triangles, origins, directions):
+        # Moller-Trumbore, distance to each ray/triangle pair, inf when they do not intersect.
+        with np.errstate(invalid="ignore", divide="ignore"):
+            d = directions[rays]
+            e1 = self.e1[triangles]
+            e2 = self.e2[triangles]
+            p = np.cross(d, e2)
+            determinant = np.einsum("ij,ij->i", e1, p)
+            inverse = 1.0 / determinant
+            s = origins[rays] - self.v0[triangles]
+            u = np.einsum("ij,ij->i", s, p) * inverse
+            q = np.cross(s, e1)
+            v = np.einsum("ij,ij->i", d, q) * inverse
+            t = np.einsum("ij,ij->i", e2, q) * inverse
+            hit = (np.abs(determinant) > _EPSILON) & (u >= 0.0) & (v >= 0.0) & (u + v <= 1.0) & (t > _EPSILON)
+        return np.where(hit, t, np.inf)
+
+    def intersect(self, origins: np.ndarray, directions: np.ndarray):
+        """Nearest hit of each ray: distance along the direction and original triangle index, inf and -1 on a miss."""
+        count = len(origins)
+        distances = np.full(count, np.inf)
+        hits = np.full(count, -1, dtype=np.int64)
+        if len(self) == 0 or count == 0:
+            return distances, hits
+
+        origins = np.asarray(origins, dtype=np.float64)
+        directions = np.asarray(directions, dtype=np.float64)
+        with np.errstate(divide="ignore"):
+            inverses = 1.0 / directions
+
+        rays = np.arange(count)
+        boxes = np.zeros(count, dtype=np.int64)
+        near, overlap = self._boxes(0, rays, boxes, origins, inverses)
+        rays, boxes, near = rays[overlap], boxes[overlap], near[overlap]
+        for level in range(1, len(self.low)):
+            rays = np.repeat(rays, 2)
+            boxes = np.repeat(boxes * 2, 2) + np.tile((0, 1), len(boxes))
+            near, overlap = self._boxes(level, rays, boxes, origins, inverses)
+            rays, boxes, near = rays[overlap], boxes[overlap], near[overlap]
+
+        # Leaves of each ray, nearest first.
+        order = np.lexsort((near, rays))
+        rays, leaves, near = rays[order], boxes[order], near[order]
+        firsts = np.searchsorted(rays, rays)
+        ranks = np.arange(len(rays)) - firsts
+        lastRank = ranks.max() if len(ranks) else -1
+        corners = np.arange(self.leaf_size)
+        for wave in range(0, lastRank + 1, _LEAF_WAVE):
+            selected = (ranks >= wave) & (ranks < wave + _LEAF_WAVE) & (near < distances[rays])
+            if not selected.any():
+                continue
+            waveRays = np.repeat(rays[selected], self.leaf_size)
+            waveTriangles = (leaves[selected][:, None] * self.leaf_size + corners).ravel()
+            t = self._triangles(waveRays, waveTriangles, origins, directions)
+            closer = t < distances[waveRays]
+            if not closer.any():
+                continue
+            waveRays, waveTriangles, t = waveRays[closer], waveTriangles[closer], t[closer]
+            nearest = np.lexsort((t, waveRays))
+            waveRays, waveTriangles, t = waveRays[nearest], waveTriangles[nearest], t[nearest]
+            first = np.concatenate(([True], waveRays[1:] != waveRays[:-1]))
+            distances[waveRays[first]] = t[first]
+            hits[waveRays[first]] = waveTriangles[first]
+
+        found = hits >= 0
+        hits[found] = self.triangle_ids[hits[found]]
+        return distances, hits
+
+
+def projector_rays(document: MPCDIDocument, row: int, density: int = DEFAULT_DENSITY):
+    """Origin and (N, 3) unit directions of the ray grid of a region, in stage space.
+
+    Rays go through the centers of a grid of `density` cells along the larger side of the region resolution, evenly
+    spaced on the image plane like the pixels they stand for.
+    """
+    region = document[row]
+    width, height = max(region.x_resolution, 1), max(region.y_resolution, 1)
+    columns = max(1, round(density * min(1.0, width / height)))
+    rows = max(1, round(density * min(1.0, height / width)))
+
+    frustum = document.frustums[row]
+    left, right = np.tan(np.radians(frustum[[_LEFT_ANGLE, _RIGHT_ANGLE]]))
+    down, up = np.tan(np.radians(frustum[[_DOWN_ANGLE, _UP_ANGLE]]))
+    u = left + (np.arange(columns) + 0.5) * (right - left) / columns
+    v = up - (np.arange(rows) + 0.5) * (up - down) / rows
+    uu, vv = np.meshgrid(u, v)
+    # Cameras look down -Z.
+    local = np.stack((uu.ravel(), vv.ravel(), -np.ones(uu.size)), axis=1)
+
+    matrix = camera_matrices(document.compute(row, row + 1))[0]
+    directions = local @ matrix[:3, :3]
+    directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+    return matrix[3, :3].copy(), directions
+
+
+class ProjectorCoverage:
+    def __init__(self, buffer_id: str, region_id: str, rays: int, hits: int, meshes: dict):
+        self.buffer_id = buffer_id
+        self.region_id = region_id
+        self.rays = rays
+        self.hits = hits
+        # Number of rays hitting each mesh, by path.
+        self.meshes = meshes
+
+    @property
+    def coverage(self) -> float:
+        """Fraction of the pixels of the projector landing on a surface, the others are wasted."""
+        return self.hits / self.rays if self.rays else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "buffer": self.buffer_id,
+            "region": self.region_id,
+            "rays": self.rays,
+            "hits": self.hits,
+            "coverage": self.coverage,
+            "meshes": self.meshes,
+        }
+
+
+class CoverageReport:
+    def __init__(self, meshes: SceneMeshes, density: int):
+        self.mesh_paths = meshes.paths
+        self.face_offsets = meshes.face_offsets
+        self.triangle_count = len(meshes.triangles)
+        self.density = density
+        self.projectors = []
+        # Rays hitting each face, faces numbered like in SceneMeshes.
+        self.face_hits = np.zeros(meshes.face_count, dtype=np.int64)
+        self.seconds = 0.0
+
+    def mesh_hit_counts(self, path: str) -> np.ndarray:
+        index = self.mesh_paths.index(path)
+        return self.face_hits[self.face_offsets[index]:self.face_offsets[index + 1]]
+
+    def to_dict(self) -> dict:
+        return {
+            "density": self.density,
+            "meshes": len(self.mesh_paths),
+            "triangles": self.triangle_count,
+            "seconds": round(self.seconds, 3),
+            "projectors": [projector.to_dict() for projector in self.projectors],
+        }
+
+    def author_hit_counts(self, layer: Sdf.Layer):
+        """Add the hit counts of each mesh face as a uniform int primvar, on over specs of the mesh paths."""
+        with Sdf.ChangeBlock():
+            for path in self.mesh_paths:
+                primSpec = Sdf.CreatePrimInLayer(layer, path)
+                attributeSpec = layer.GetAttributeAtPath(primSpec.path.AppendProperty(HIT_COUNT_PRIMVAR))
+                if attributeSpec is None:
+                    attributeSpec = Sdf.AttributeSpec(primSpec, HIT_COUNT_PRIMVAR, Sdf.ValueTypeNames.IntArray)
+                attributeSpec.SetInfo("interpolation", UsdGeom.Tokens.uniform)
+                attributeSpec.default = Vt.IntArray.FromNumpy(self.mesh_hit_counts(path).astype(np.int32))
+
+
+# BVH and triangle faces of the worker processes, see _init_worker.
+_worker_scene = None
+
+
+def _init_worker(bvh: TriangleBVH, triangle_faces: np.ndarray):
+    global _worker_scene
+    _worker_scene = (bvh, triangle_faces)
+
+
+def _trace(job):
+    # Faces hit by the rays of a projector, -1 for the rays hitting nothing.
+    row, origin, directions = job
+    bvh, triangleFaces = _worker_scene
+    faces = np.full(len(directions), -1, dtype=np.int64)
+    for start in range(0, len(directions), RAY_CHUNK):
+        chunk = directions[start:start + RAY_CHUNK]
+        _, triangles = bvh.intersect(np.broadcast_to(origin, chunk.shape), chunk)
+        hit = triangles >= 0
+        faces[start:start + len(chunk)][hit] = triangleFaces[triangles[hit]]
+    return row, faces
+
+
+def analyze_coverage(document: MPCDIDocument, stage: Usd.Stage, density: int = DEFAULT_DENSITY, processes: int = 1,
+                     meshes: SceneMeshes = None) -> CoverageReport:
+    """Cast the ray grid of each region of `document` against the meshes of `stage`, see projector_rays.
+
+    With more than one process, the projectors are traced in a pool of spawned processes which receive the BVH once.
+    """
+    start = time.perf_counter()
+    if meshes is None:
+        meshes = gather_meshes(stage)
+    bvh = TriangleBVH(meshes.triangles)
+    report = CoverageReport(meshes, density)
+    jobs = [(row, *projector_rays(document, row, density)) for row in range(len(document))]
+
+    if processes <= 1 or len(jobs) <= 1:
+        _init_worker(bvh, meshes.triangle_faces)
+        results = map(_trace, jobs)
+        pool = None
+    else:
+        # Spawn fresh interpreters, forking a process that already loaded USD plugins is not safe.
+        pool = multiprocessing.get_context("spawn").Pool(min(processes, len(jobs)), _init_worker,
+                                                         (bvh, meshes.triangle_faces))
+        results = pool.imap(_trace, jobs)
+
+    try:
+        for row, faces in results:
+            hitFaces = faces[faces >= 0]
+            report.face_hits += np.bincount(hitFaces, minlength=meshes.face_count)
+            meshIndices, meshHits = np.unique(meshes.mesh_of_faces(hitFaces), return_counts=True)
+            region = document[row]
+            report.projectors.append(ProjectorCoverage(
+                region.buffer_id, region.region_id, len(faces), len(hitFaces),
+                {meshes.paths[index]: int(hits) for index, hits in zip(meshIndices, meshHits)}))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m mf.ov.mpcdi_converter.coverage",
+        description="Compute which surfaces of a venue the projectors of an MPCDI document cover.",
+    )
+    parser.add_argument("document", help="MPCDI document, .mpcdi.xml or .mpcdi archive.")
+    parser.add_argument("venue", help="USD stage holding the meshes projected on.")
+    parser.add_argument("--density", type=int, default=DEFAULT_DENSITY,
+                        help="Rays along the larger side of each projector image.")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="Number of worker processes (default: number of CPUs).")
+    parser.add_argument("--json", default=None, help="Write the report to this JSON file.")
+    parser.add_argument("--output", default=None,
+                        help="Write a layer with the per-face hit counts of the meshes, to sublayer over the venue.")
+    args = parser.parse_args(argv)
+
+    with open_package(args.document) as package:
+        document = parse_document(package)
+    stage = Usd.Stage.Open(args.venue)
+    if stage is None:
+        print(f"Cannot open {args.venue}")
+        return 1
+
+    report = analyze_coverage(document, stage, args.density, args.jobs)
+    for projector in report.projectors:
+        print(f"{projector.buffer_id}/{projector.region_id}: {projector.coverage:.1%} of {projector.rays} rays "
+              f"on {len(projector.meshes)} mesh(es)")
+    print(f"{len(report.projectors)} projector(s) against {report.triangle_count} triangle(s) in "
+          f"{report.seconds:.2f} s")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report.to_dict(), f, indent=2)
+    if args.output:
+        layer = Sdf.Layer.CreateNew(args.output)
+        report.author_hit_counts(layer)
+        layer.Save()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
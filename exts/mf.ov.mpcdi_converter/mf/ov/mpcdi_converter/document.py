@@ -0,0 +1,173 @@
+import json
+import numpy as np
+from .compute import ProjectorParameters, compute_projectors
+from .parser import COORDINATE_FRAME_TAGS, FRUSTUM_TAGS, MPCDIFileset, iter_regions
+from .profiling import span
+
+
+# Bump when the arrays stored by MPCDIDocument.save change.
+DOCUMENT_FORMAT_VERSION = 1
+DEFAULT_BATCH_SIZE = 1024
+_INITIAL_CAPACITY = 1024
+_CHARACTER_SIZE = np.dtype("<U1").itemsize
+
+
+def _grow(column: np.ndarray, capacity: int) -> np.ndarray:
+    grown = np.empty((capacity,) + column.shape[1:], dtype=column.dtype)
+    grown[:len(column)] = column
+    return grown
+
+
+class MPCDIRegionView:
+    """Row of an MPCDIDocument, it reads like an MPCDIRegion without holding a copy of the values."""
+    __slots__ = ("document", "index")
+
+    def __init__(self, document, index: int):
+        self.document = document
+        self.index = index
+
+    @property
+    def buffer_id(self) -> str:
+        return str(self.document.buffer_ids[self.document.buffer_indices[self.index]])
+
+    @property
+    def region_id(self) -> str:
+        return str(self.document.region_ids[self.index])
+
+    @property
+    def x_resolution(self) -> int:
+        return int(self.document.resolutions[self.index, 0])
+
+    @property
+    def y_resolution(self) -> int:
+        return int(self.document.resolutions[self.index, 1])
+
+    @property
+    def frustum(self) -> dict:
+        return dict(zip(FRUSTUM_TAGS, self.document.frustums[self.index].tolist()))
+
+    @property
+    def coordinate_frame(self) -> dict:
+        return dict(zip(COORDINATE_FRAME_TAGS, self.document.coordinate_frames[self.index].tolist()))
+
+
+class MPCDIDocument:
+    """Regions of an MPCDI document as a structure of arrays, one row per region in document order.
+
+    Columns of `frustums` and `coordinate_frames` follow the parser tags. Buffers sharing an id are merged, the
+    buffer of a region is `buffer_ids[buffer_indices[row]]`.
+    """
+
+    def __init__(self, buffer_ids, region_ids, buffer_indices, resolutions, frustums, coordinate_frames,
+                 filesets: dict = None):
+        self.buffer_ids = np.asarray(buffer_ids, dtype=np.str_).reshape(-1)
+        self.region_ids = np.asarray(region_ids, dtype=np.str_).reshape(-1)
+        self.buffer_indices = np.asarray(buffer_indices, dtype=np.int32).reshape(-1)
+        self.resolutions = np.asarray(resolutions, dtype=np.int32).reshape(-1, 2)
+        self.frustums = np.asarray(frustums, dtype=np.float64).reshape(-1, len(FRUSTUM_TAGS))
+        self.coordinate_frames = np.asarray(coordinate_frames, dtype=np.float64).reshape(-1, len(COORDINATE_FRAME_TAGS))
+        # MPCDIFileset of the regions by region id, complete once the whole document was parsed.
+        self.filesets = filesets if filesets is not None else {}
+        self._positions = None
+
+    @classmethod
+    def from_source(cls, source, filesets: dict = None):
+        """Parse `source`, a file path or a binary file object (see parser.iter_regions).
+
+        Regions are written straight into arrays grown by doubling, no Python object is kept per region.
+        """
+        if filesets is None:
+            filesets = {}
+        bufferIds = {}
+        capacity = _INITIAL_CAPACITY
+        columns = [
+            np.empty(capacity, dtype=np.str_),
+            np.empty(capacity, dtype=np.int32),
+            np.empty((capacity, 2), dtype=np.int32),
+            np.empty((capacity, len(FRUSTUM_TAGS)), dtype=np.float64),
+            np.empty((capacity, len(COORDINATE_FRAME_TAGS)), dtype=np.float64),
+        ]
+        count = 0
+        for region in iter_regions(source, filesets):
+            if count == capacity:
+                capacity *= 2
+                columns = [_grow(column, capacity) for column in columns]
+            regionIds, bufferIndices, resolutions, frustums, frames = columns
+            if len(region.region_id) > regionIds.itemsize // _CHARACTER_SIZE:
+                # Fixed width strings, widened when a longer id comes up.
+                regionIds = columns[0] = regionIds.astype(f"<U{len(region.region_id)}")
+            regionIds[count] = region.region_id
+            bufferIndices[count] = bufferIds.setdefault(region.buffer_id, len(bufferIds))
+            resolutions[count] = (region.x_resolution, region.y_resolution)
+            for column, tag in enumerate(FRUSTUM_TAGS):
+                frustums[count, column] = region.frustum[tag]
+            for column, tag in enumerate(COORDINATE_FRAME_TAGS):
+                frames[count, column] = region.coordinate_frame[tag]
+            count += 1
+
+        return cls(list(bufferIds), *(column[:count] for column in columns), filesets)
+
+    def __len__(self):
+        return len(self.region_ids)
+
+    def __getitem__(self, index: int) -> MPCDIRegionView:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"Region #{index} out of range.")
+        return MPCDIRegionView(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield MPCDIRegionView(self, index)
+
+    def buffer_regions(self, buffer_id: str) -> np.ndarray:
+        """Rows of the regions of `buffer_id`."""
+        matches = np.flatnonzero(self.buffer_ids == buffer_id)
+        if len(matches) == 0:
+            return np.empty(0, dtype=np.intp)
+        return np.flatnonzero(self.buffer_indices == matches[0])
+
+    @property
+    def positions(self) -> np.ndarray:
+        """(N, 3) projector positions in stage space, the translation authored on the cameras."""
+        if self._positions is None:
+            self._positions = self.compute().translate
+        return self._positions
+
+    def regions_in_bounds(self, minimum, maximum) -> np.ndarray:
+        """Rows of the regions whose projector lies in the stage space box [minimum, maximum]."""
+        minimum = np.asarray(minimum, dtype=np.float32)
+        maximum = np.asarray(maximum, dtype=np.float32)
+        inside = ((self.positions >= minimum) & (self.positions <= maximum)).all(axis=1)
+        return np.flatnonzero(inside)
+
+    def compute(self, start: int = 0, stop: int = None) -> ProjectorParameters:
+        return compute_projectors(self.frustums[start:stop], self.coordinate_frames[start:stop])
+
+    def batches(self, size: int = DEFAULT_BATCH_SIZE):
+        """Yield (regions, ProjectorParameters) batches of at most `size` rows, see converter.author_to_layer."""
+        for start in range(0, len(self), size):
+            stop = min(start + size, len(self))
+            with span("compute"):
+                parameters = self.compute(start, stop)
+            yield [MPCDIRegionView(self, index) for index in range(start, stop)], parameters
+
+    def save(self, path_or_file):
+        """Write the document as an uncompressed .npz, see load."""
+        filesets = {regionId: fileset.files for regionId, fileset in self.filesets.items()}
+        np.savez(path_or_file, version=np.int32(DOCUMENT_FORMAT_VERSION), buffer_ids=self.buffer_ids,
+                 region_ids=self.region_ids, buffer_indices=self.buffer_indices, resolutions=self.resolutions,
+                 frustums=self.frustums, coordinate_frames=self.coordinate_frames,
+                 filesets=np.str_(json.dumps(filesets)))
+
+    @classmethod
+    def load(cls, path_or_file):
+        with np.load(path_or_file, allow_pickle=False) as data:
+            version = int(data["version"])
+            if version != DOCUMENT_FORMAT_VERSION:
+                raise ValueError(f"Unsupported MPCDI document version {version}, expected {DOCUMENT_FORMAT_VERSION}.")
+            filesets = {regionId: MPCDIFileset(regionId, files)
+                        for regionId, files in json.loads(str(data["filesets"])).items()}
+            return cls(data["buffer_ids"], data["region_ids"], data["buffer_indices"], data["resolutions"],
+                       data["frustums"], data["coordinate_frames"], filesets)
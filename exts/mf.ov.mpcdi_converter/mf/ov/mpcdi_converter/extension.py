@@ -1,3 +1,6 @@
+import asyncio
+import collections
+import copy
 import os
 import time
 from typing import List
@@ -12,241 +15,443 @@ from omni.kit.tool.asset_importer.filebrowser import FileBrowserMode, FileBrowse
 import omni.ui as ui
 import omni.kit.tool.asset_importer as ai
 import omni.kit.window.content_browser as content
+from pxr import Sdf, Usd
 from .omni_client_wrapper import OmniClientWrapper
-import xml.etree.ElementTree as ET
-from pxr import UsdGeom, Sdf, Gf, Tf
-import math
+from .archive import MPCDIArchive, is_archive, is_archive_path, open_package
+from .blend import get_blend_map_cache
+from .cache import ConversionCache, hash_buffer, hash_file
+from .converter import MPCDIConverterContext, MPCDIChangeReport, AUTHORING_MODE_NATIVE, AUTHORING_MODE_STAGE, \
+    LAYOUT_FLAT, LAYOUT_PAYLOADS, MPCDI_ROOT_PATH, author_native, author_to_layer, author_to_stage, \
+    clean_name_for_usd, convert_to_layer_cached, native_format_available, parse_document, write_buffer_payloads
+from .parser import open_buffer
+from .progress import ImportCancelled, ImportProgress, track_batches
+from .watcher import MPCDIWatcher
+from .profiling import ImportSummary, add_bytes_read, collect, span
 import logging
 
 
-class MPCDIConverterContext:
-    usd_reference_path = ""
+SETTINGS_PATH = "/exts/mf.ov.mpcdi_converter"
+# Number of files read at the same time by create_import_task.
+MAX_CONCURRENT_READS = 8
+# Number of import summaries kept by MPCDIConverterHelper.summaries.
+SUMMARY_HISTORY = 64
+# Converted documents are written as binary crate layers.
+OUTPUT_FILE_EXTENSION = ".usdc"
+# Blend map textures of layers written to Nucleus, which cannot hold them next to the layer.
+DEFAULT_MAPS_ROOT = "${cache}/mf.ov.mpcdi_converter/maps"
+# Minimum seconds between two posts of the progress notification.
+PROGRESS_NOTIFICATION_INTERVAL = 1.0
 
 
-class MPCDIConverterHelper:
+class _PreparedDocument:
+    # Result of the worker thread part of an import: content hash, parsed document and the package holding the payload
+    # files of an archive.
     def __init__(self):
-        pass
-
-    def _cleanNameForUSD(self, strIn: str) -> str:
-        strOut = strIn
-        # Do not allow for a blank name
-        if len(strOut) == 0:
-            return "Default"
-        elif len(strOut) == 1 and strIn.isnumeric():
-            # If we have an index as a name, we only need to add _ beforehand.
-            return "_" + strIn
-
-        return Tf.MakeValidIdentifier(strIn)
+        self.content_hash = None
+        self.content = None
+        self.document = None
+        self.package = None
+        self.summary = None
+
+
+def _is_local_path(path):
+    # Textures can only be written next to layers saved to the local file system, not to Nucleus.
+    return omni.client.break_url(path).scheme in (None, "file") and not path.startswith("file:")
+
+
+def _open_content(content):
+    # Archives are read in place from the downloaded content, bare documents are streamed by the parser.
+    return MPCDIArchive(content) if is_archive(content) else open_buffer(content)
+
+
+class _ProgressNotification:
+    # Notification of a running import with a Cancel button. The notification manager cannot edit a notification, it
+    # is posted again on the main thread when the conversion threads report progress, at most once per
+    # PROGRESS_NOTIFICATION_INTERVAL: the reports received in between are shown together by the next post.
+    def __init__(self, progress: ImportProgress, loop):
+        self._progress = progress
+        self._loop = loop
+        self._notification = None
+        self._text = None
+        self._posted = 0.0
+        self._pending = None
+        self._closed = False
+        self._post()
+
+    def on_progress(self, progress: ImportProgress):
+        self._loop.call_soon_threadsafe(self._schedule)
+
+    def _schedule(self):
+        if self._closed or self._pending is not None:
+            return
+        delay = self._posted + PROGRESS_NOTIFICATION_INTERVAL - time.monotonic()
+        if delay > 0.0:
+            self._pending = self._loop.call_later(delay, self._post)
+        else:
+            self._post()
+
+    def _post(self):
+        self._pending = None
+        text = f"Importing {self._progress.name}"
+        text += f": {self._progress}." if self._progress.total else "..."
+        if self._closed or text == self._text:
+            return
+        if self._notification is not None:
+            self._notification.dismiss()
+        self._notification = nm.post_notification(
+            text,
+            hide_after_timeout=False,
+            button_infos=[nm.NotificationButtonInfo("Cancel", on_complete=self._progress.cancel)],
+        )
+        self._text = text
+        self._posted = time.monotonic()
+
+    def close(self):
+        self._closed = True
+        if self._pending is not None:
+            self._pending.cancel()
+            self._pending = None
+        if self._notification is not None:
+            self._notification.dismiss()
+            self._notification = None
+
+
+def _uses_native(converter_context, absolute_path):
+    # Archives are only read by the Python converter, so is everything when the plugin was not built.
+    if converter_context.authoring_mode != AUTHORING_MODE_NATIVE or is_archive_path(absolute_path):
+        return False
+    if not native_format_available():
+        logging.getLogger(__name__).warning("The native MPCDI file format plugin is not registered, "
+                                            f"{absolute_path} is converted in Python.")
+        return False
+    return True
+
+
+def _open_output_layer(usd_path, incremental):
+    # Incremental re-imports start from a detached copy of the previous output, so that only what changed is authored
+    # without editing a layer the open stage may be composing.
+    if incremental and OmniClientWrapper.exists_sync(usd_path):
+        layer = Sdf.Layer.OpenAsAnonymous(usd_path)
+        if layer is not None:
+            return layer
+    return Sdf.Layer.CreateAnonymous(OUTPUT_FILE_EXTENSION)
 
-    def _convert_xml_to_usd(self, absolute_path_xml):
-        result = 0
 
-        try:
-            _, _, content = omni.client.read_file(absolute_path_xml)
+class MPCDIConverterHelper:
+    def __init__(self):
+        self._cache = self._create_cache()
+        self._summaries = collections.deque(maxlen=SUMMARY_HISTORY)
+        settings = carb.settings.get_settings()
+        mapsRoot = settings.get(SETTINGS_PATH + "/maps/path")
+        self._maps_root = carb.tokens.get_tokens_interface().resolve(mapsRoot) if mapsRoot else ""
+        self._incremental = bool(settings.get(SETTINGS_PATH + "/incremental"))
+        self._instancing = bool(settings.get(SETTINGS_PATH + "/instancing"))
+        self._native = bool(settings.get(SETTINGS_PATH + "/native"))
+        self._layout = settings.get(SETTINGS_PATH + "/layout") or LAYOUT_FLAT
+        get_blend_map_cache().resize(int(settings.get(SETTINGS_PATH + "/blendCache/maxSizeMB") * 1024 * 1024))
+        # Layer written for each imported file, re-imports of a file without an export folder write the same layer.
+        self._outputs = {}
 
-            data = memoryview(content).tobytes()
+    def destroy(self):
+        self._cache = None
 
-            # Read xml file here
-            root = ET.fromstring(data)
+    @property
+    def cache(self):
+        return self._cache
 
-            hasLensShifting = False
-            stage = omni.usd.get_context().get_stage()
+    @property
+    def summaries(self):
+        """ImportSummary records of the latest imports, oldest first."""
+        return list(self._summaries)
+
+    def _record_summary(self, summary: ImportSummary, status: str):
+        summary.finish(status)
+        self._summaries.append(summary)
+        logging.getLogger(__name__).info(f"MPCDI import summary: {summary}")
+
+    def _create_cache(self):
+        settings = carb.settings.get_settings()
+        if not settings.get(SETTINGS_PATH + "/cache/enabled"):
+            return None
 
-            mpcdiId = "/MPCDI"
-            stage.DefinePrim(mpcdiId, "Xform")
+        directory = carb.tokens.get_tokens_interface().resolve(settings.get(SETTINGS_PATH + "/cache/path"))
+        maxSizeMB = settings.get(SETTINGS_PATH + "/cache/maxSizeMB")
+        return ConversionCache(directory, int(maxSizeMB * 1024 * 1024))
 
-            # Create usd content here
-            for display in root:
-                if display.tag != 'display':
-                    continue
+    def _cleanNameForUSD(self, strIn: str) -> str:
+        return clean_name_for_usd(strIn)
+
+    def _file_context(self, converter_context, absolute_path, usd_path=None):
+        # Per file copy of the options: blend map textures go next to the layer written at `usd_path` and are authored
+        # relative to it. With the maps.path setting, or when the layer is not written to a local folder, they go to a
+        # folder per imported file instead. The incremental, instancing, native and layout settings apply.
+        converter_context = copy.copy(converter_context)
+        if usd_path is not None and _is_local_path(usd_path):
+            converter_context.layer_path = usd_path
+        if not converter_context.maps_directory and (self._maps_root or not converter_context.layer_path):
+            filename = os.path.basename(absolute_path.replace("\\", "/"))
+            mapsRoot = self._maps_root or carb.tokens.get_tokens_interface().resolve(DEFAULT_MAPS_ROOT)
+            converter_context.maps_directory = os.path.join(mapsRoot, self._cleanNameForUSD(filename))
+        converter_context.incremental = converter_context.incremental or self._incremental
+        converter_context.instancing = converter_context.instancing or self._instancing
+        if self._native:
+            converter_context.authoring_mode = AUTHORING_MODE_NATIVE
+        if converter_context.layout == LAYOUT_FLAT:
+            converter_context.layout = self._layout
+        return converter_context
+
+    def _prepare(self, content, converter_context, summary: ImportSummary,
+                 progress: ImportProgress) -> _PreparedDocument:
+        # Runs in a worker thread: only hashing and parsing, the stage is never touched here.
+        prepared = _PreparedDocument()
+        prepared.summary = summary
+        progress.check()
+        if converter_context.authoring_mode == AUTHORING_MODE_NATIVE:
+            # The native plugin reads the file itself, the content is only kept for the Python fallback.
+            prepared.content = content
+            return prepared
+        with collect(summary):
+            if self._cache is not None and converter_context.use_cache:
+                prepared.content_hash = hash_buffer(content)
+                key = self._cache.make_key(prepared.content_hash, converter_context.options())
+                if self._cache.contains(key):
+                    # Parsing is skipped, the content is kept in case the entry gets evicted before authoring.
+                    prepared.content = content
+                    return prepared
+
+            source = _open_content(content)
+            prepared.document = parse_document(source)
+            if isinstance(source, MPCDIArchive):
+                prepared.package = source
+        return prepared
+
+    def _convert_xml_to_usd(self, absolute_path_xml, usd_path, converter_context=None, prepared=None, summary=None,
+                            progress=None):
+        # Runs in a worker thread: the document is authored in a layer of its own, never in the open stage, and saved
+        # as binary crate at usd_path. Returns the MPCDIConversionResult, None on failure. Raises ImportCancelled when
+        # `progress` is cancelled, nothing is written then.
+        package = None
+        if summary is None:
+            summary = ImportSummary(absolute_path_xml)
+        if progress is None:
+            progress = ImportProgress(os.path.basename(absolute_path_xml))
 
-                for buffer in display:
-                    bufferId = buffer.attrib['id']
-                    bufferPath = mpcdiId + '/' + self._cleanNameForUSD(bufferId)
-                    stage.DefinePrim(bufferPath, "Scope")
-
-                    # A region is a projector
-                    for region in buffer:
-                        # GetCoordFrams
-                        coordinateFrame = region.find('coordinateFrame')
-
-                        # Get Position
-                        posX = float(coordinateFrame.find('posx').text) * 10
-                        posY = float(coordinateFrame.find('posy').text) * 10
-                        posZ = float(coordinateFrame.find('posz').text) * 10
-
-                        # Get Axis up
-                        upX = float(coordinateFrame.find('yawx').text)
-                        upY = float(coordinateFrame.find('yawy').text)
-                        upZ = float(coordinateFrame.find('yawz').text)
-
-                        # Get Axis right
-                        rightX = float(coordinateFrame.find('pitchx').text)
-                        rightY = float(coordinateFrame.find('pitchy').text)
-                        rightZ = float(coordinateFrame.find('pitchz').text)
-
-                        # Get Axis down
-                        forwardX = float(coordinateFrame.find('rollx').text)
-                        forwardY = float(coordinateFrame.find('rolly').text)
-                        forwardZ = float(coordinateFrame.find('rollz').text)
-
-                        # The "coordinateFrame" provided in the MPCDI comes with three vectors to solve any coordinate
-                        # system ambiguity we meed to convert the position from the "source" coordinate system to the
-                        # standard MPCDI system And then convert from the standard to the Omniverse system
-                        sourceToStandard = Gf.Matrix3f(
-                            rightX, rightY, rightZ,
-                            upX, upY, upZ,
-                            forwardX, forwardY, forwardZ)
-
-                        # Omniverse uses the same axis for Roll/Pitch/Yaw than the standard, so we have a diagonal matrix
-                        # BUT the Y and Z axis are pointing to the opposite direction, so we need to invert them
-                        # in the matrix. Here we'll avoid a second matrix product and simply invert Y and Z of the
-                        # vector instead.
-                        newPos = sourceToStandard * Gf.Vec3f(posX, posY, posZ)
-                        newPos[1] = newPos[1] * -1.0
-                        newPos[2] = newPos[2] * -1.0
-
-                        frustum = region.find('frustum')
-                        yaw = float(frustum.find('yaw').text) * -1
-                        pitch = float(frustum.find('pitch').text)
-                        roll = float(frustum.find('roll').text)
-
-                        # For the moment we do not support lens shifting, so we simply add the two angles and assume
-                        # They are the same on both sides of the angle.
-                        fovRight = float(frustum.find('rightAngle').text)
-                        fovLeft = float(frustum.find('leftAngle').text)
-                        fovTop = float(frustum.find('upAngle').text)
-                        fovBottom = float(frustum.find('downAngle').text)
-
-                        focalLength = 10  # We chose a fixed focal length.
-                        tanRight = math.tan(math.radians(fovRight))
-                        tanLeft = math.tan(math.radians(fovLeft))
-                        tanUp = math.tan(math.radians(fovTop))
-                        tanDown = math.tan(math.radians(fovBottom))
-                        apertureH = (abs(tanRight) + abs(tanLeft)) * focalLength
-                        apertureV = (abs(tanUp) + abs(tanDown)) * focalLength
-                        lightWidth = abs(tanRight) + abs(tanLeft)
-                        lightHeight = abs(tanUp) + abs(tanDown)
-
-                        horizLensShiftAmount = (tanLeft + tanRight) / (tanLeft - tanRight)
-                        vertLensShiftAmount = (tanUp + tanDown) / (tanUp - tanDown)
-                        horizApertureOffset = horizLensShiftAmount * apertureH / 2.0
-                        vertApertureOffset = vertLensShiftAmount * apertureV / 2.0
-
-                        if fovRight != fovLeft or fovTop != fovBottom:
-                            hasLensShifting = True
-
-                        regionId = region.attrib['id']
-                        primPath = bufferPath + '/' + self._cleanNameForUSD(regionId)
-
-                        prim = stage.DefinePrim(primPath, "Camera")
-                        prim.GetAttribute('focalLength').Set(focalLength)
-                        prim.GetAttribute('focusDistance').Set(2000.0)
-
-                        prim.GetAttribute('horizontalAperture').Set(apertureH)
-                        prim.GetAttribute('horizontalApertureOffset').Set(horizApertureOffset)
-                        prim.GetAttribute('verticalAperture').Set(apertureV)
-                        prim.GetAttribute('verticalApertureOffset').Set(vertApertureOffset)
-
-                        primXform = UsdGeom.Xformable(prim)
-
-                        # This prevents from trying to add another Operation if overwritting nodes.
-                        primXform.ClearXformOpOrder()
-
-                        primXform.AddTranslateOp().Set(value=(newPos * 10.0))
-                        primXform.AddRotateYOp().Set(value=yaw)
-                        primXform.AddRotateXOp().Set(value=pitch)
-                        primXform.AddRotateZOp().Set(value=roll)
-
-                        # Create rectLight node
-                        rectLightpath = primPath + '/ProjectLight'
-                        rectLight = stage.DefinePrim(rectLightpath, 'RectLight')
-
-                        # We need to create those attributes as they are not standard in USD and they are omniverse
-                        # Specific. At this point in time Omniverse hasn't added their own attributes.
-                        # We simply do it ourselves.
-                        rectLight.CreateAttribute('isProjector', Sdf.ValueTypeNames.Bool).Set(True)
-                        rectLight.CreateAttribute('intensity', Sdf.ValueTypeNames.Float).Set(15000)
-                        rectLight.CreateAttribute('exposure', Sdf.ValueTypeNames.Float).Set(5)
-                        rectLight.GetAttribute('inputs:width').Set(lightWidth)
-                        rectLight.GetAttribute('inputs:height').Set(lightHeight)
-
-                        # Creating projector box mesh to simulate the space a projector takes in the space
-                        projectorBoxPath = primPath + '/ProjectorBox'
-                        projector = stage.DefinePrim(projectorBoxPath, 'Cube')
-                        projectorXform = UsdGeom.Xformable(projector)
-
-                        projectorXform.ClearXformOpOrder()
-                        projectorXform.AddTranslateOp().Set(value=(0, 0, 42.0))
-                        projectorXform.AddScaleOp().Set(value=(50.0, 15, 40.0))
+        try:
+            with collect(summary):
+                if converter_context is None:
+                    converter_context = MPCDIConverterContext()
+                converter_context = self._file_context(converter_context, absolute_path_xml, usd_path)
+                native = _uses_native(converter_context, absolute_path_xml)
+                useCache = self._cache is not None and converter_context.use_cache and not native
+
+                if native:
+                    batches = None
+                elif prepared is not None:
+                    if prepared.document is not None:
+                        batches = track_batches(prepared.document, progress)
+                        package = prepared.package
+                    else:
+                        source = _open_content(prepared.content)
+                        package = source if isinstance(source, MPCDIArchive) else None
+                        batches = track_batches(source, progress)
+                    contentHash = prepared.content_hash
+                    if contentHash is None and useCache:
+                        # Native mode fallback, the content was not hashed by _prepare.
+                        contentHash = hash_buffer(prepared.content)
+                elif os.path.isfile(absolute_path_xml):
+                    # Local files are streamed straight from disk, archive members are memory-mapped.
+                    add_bytes_read(os.path.getsize(absolute_path_xml))
+                    package = open_package(absolute_path_xml)
+                    batches = track_batches(package, progress)
+                    contentHash = hash_file(absolute_path_xml) if useCache else None
+                else:
+                    with span("read"):
+                        readResult, _, content = omni.client.read_file(absolute_path_xml)
+                    if readResult != omni.client.Result.OK:
+                        raise IOError(f"Cannot read {absolute_path_xml}, error code: {readResult}.")
+                    # The buffer of omni.client is parsed and hashed in place, the document is never copied.
+                    content = memoryview(content)
+                    add_bytes_read(len(content))
+                    source = _open_content(content)
+                    package = source if isinstance(source, MPCDIArchive) else None
+                    batches = track_batches(source, progress)
+                    contentHash = hash_buffer(content) if useCache else None
+
+                layer = _open_output_layer(usd_path, converter_context.incremental)
+                payloads = converter_context.layout == LAYOUT_PAYLOADS
+                # With the payloads layout the regions are converted to a staging layer, split into buffer layers.
+                authoredLayer = Sdf.Layer.CreateAnonymous(OUTPUT_FILE_EXTENSION) if payloads else layer
+                with span("author"):
+                    if native:
+                        conversion = author_native(absolute_path_xml, authoredLayer, converter_context)
+                    elif converter_context.authoring_mode == AUTHORING_MODE_STAGE:
+                        conversion = author_to_stage(batches, Usd.Stage.Open(authoredLayer), package,
+                                                     converter_context)
+                    elif useCache:
+                        conversion = convert_to_layer_cached(batches, authoredLayer, self._cache, contentHash,
+                                                             converter_context, package)
+                    else:
+                        conversion = author_to_layer(batches, authoredLayer, package, converter_context)
+                progress.check()
+                if payloads:
+                    conversion.changes = MPCDIChangeReport() if converter_context.incremental else None
+                    conversion.payload_paths = write_buffer_payloads(authoredLayer, layer, usd_path,
+                                                                     conversion.changes)
+                layer.defaultPrim = MPCDI_ROOT_PATH[1:]
+                with span("save"):
+                    if not layer.Export(usd_path):
+                        raise IOError(f"Cannot write {usd_path}.")
+                if useCache:
+                    logging.getLogger(__name__).info(f"MPCDI conversion cache: {self._cache.stats()}")
+                summary.region_count = conversion.region_count
+        except ImportCancelled:
+            raise
         except Exception as e:
             logger = logging.getLogger(__name__)
             logger.error(f"Failed to parse MPCDI file. Make sure it is not corrupt. {e}")
-            return -1
+            return None
+        finally:
+            if package is not None:
+                package.close()
+
+        return conversion
 
-        if hasLensShifting:
+    def _report_conversion(self, absolute_path_xml, conversion):
+        if conversion.changes is not None:
+            message = f"MPCDI re-import of {os.path.basename(absolute_path_xml)}: {conversion.changes}."
+            logging.getLogger(__name__).info(message)
+            nm.post_notification(message)
+
+        if conversion.has_lens_shifting:
             message = "Lens shifting detected in MPCDI. Lens shifting is not supported."
             logger = logging.getLogger(__name__)
             logger.warn(message)
             nm.post_notification(message, status=NotificationStatus.WARNING)
 
-        return result
-
-    def _create_import_task(self, absolute_path, relative_path, export_folder, _):
+    def _output_path(self, absolute_path, relative_path, export_folder) -> str:
         stage = omni.usd.get_context().get_stage()
-        usd_path = ""
-
-        # If the stage is not saved save the imported USD next to the original asset.
-        if not stage or stage.GetRootLayer().anonymous:
+        if export_folder:
+            # If user makes a selection for the output folder use it.
+            out_dir = export_folder.rstrip("/")
+        elif absolute_path in self._outputs:
+            return self._outputs[absolute_path]
+        elif not stage or stage.GetRootLayer().anonymous:
+            # If the stage is not saved save the imported USD next to the original asset.
             now = time.localtime()
             ext = time.strftime("_%H%M%S", now)
             basename = relative_path[:relative_path.rfind(".")]
-            no_folder_name = absolute_path[:absolute_path.find("/" + relative_path)]
-            host_dir = os.path.join(no_folder_name, "convertedAssets", basename + ext).replace("\\", "/")
-
-        # Save the imported USD next to the saved stage.
-        path_out = omni.usd.get_context().get_stage_url()
-
-        # If user makes a selection for the output folder use it.
-        if export_folder is not None:
-            path_out = export_folder
-
-        path_out_index = path_out.rfind("/")
+            no_folder_name = os.path.dirname(absolute_path.replace("\\", "/"))
+            out_dir = "/".join((no_folder_name, "convertedAssets", basename + ext))
+        else:
+            # Save the imported USD next to the saved stage.
+            path_out = omni.usd.get_context().get_stage_url()
+            out_dir = path_out[:path_out.rfind("/")]
 
-        success = self._convert_xml_to_usd(absolute_path)  # self._hi.convert_cad_file_to_usd(absolute_path, path_out[:path_out_index])
         ext_index = relative_path.rfind(".")
-        relative_path = self._cleanNameForUSD(relative_path[:ext_index]) + ".usd"
-        usd_path = os.path.join(path_out[:path_out_index], relative_path).replace("\\", "/")
-
+        return out_dir + "/" + self._cleanNameForUSD(relative_path[:ext_index]) + OUTPUT_FILE_EXTENSION
+
+    async def _create_import_task(self, absolute_path, relative_path, export_folder, converter_context, prepared=None,
+                                  progress=None, usd_path=None):
+        if usd_path is None:
+            usd_path = self._output_path(absolute_path, relative_path, export_folder)
+        summary = prepared.summary if prepared is not None and prepared.summary is not None else \
+            ImportSummary(absolute_path)
         logger = logging.getLogger(__name__)
-        if success == 0:
-            message = "Import succesful"
-            logger.info(message)
-            nm.post_notification(message)
-            return usd_path
-        elif success == -10002:
-            # TODO this is when we have problem reading the file from OV, might need to download it locally
-            logger.info("NOT IMPLEMENTED: Failure to load model form omniverse server, please select a file from local disk.")
-            nm.post_notification(
-                        f"Failed to convert file {os.path.basename(absolute_path)}.\n"
-                        "Please check console for more details.",
-                        status=nm.NotificationStatus.WARNING,
-                    )
+        # Authoring and saving happen off the main thread, the UI stays responsive on large documents.
+        try:
+            conversion = await asyncio.get_event_loop().run_in_executor(None, self._convert_xml_to_usd, absolute_path,
+                                                                         usd_path, converter_context, prepared, summary,
+                                                                         progress)
+        except ImportCancelled as e:
+            self._record_summary(summary, "cancelled")
+            logger.info(str(e))
             return None
-        else:
+        self._record_summary(summary, "ok" if conversion is not None else "failed")
+
+        if conversion is None:
             logger.info("IMPORT FAILED")
-            nm.post_notification(
-                        f"Failed to convert file {os.path.basename(absolute_path)}.\n"
-                        "Please check console for more details.",
-                        status=nm.NotificationStatus.WARNING,
-                    )
+            self._notify_failure(absolute_path)
             return None
 
+        # Stages already referencing a previous import of the file pick up the new content.
+        for path in [usd_path] + conversion.payload_paths:
+            layer = Sdf.Layer.Find(path)
+            if layer is not None:
+                layer.Reload()
+
+        self._outputs[absolute_path] = usd_path
+        self._report_conversion(absolute_path, conversion)
+        message = "Import succesful"
+        logger.info(message)
+        nm.post_notification(message)
+        return usd_path
+
+    def _notify_failure(self, absolute_path):
+        nm.post_notification(
+                    f"Failed to convert file {os.path.basename(absolute_path)}.\n"
+                    "Please check console for more details.",
+                    status=nm.NotificationStatus.WARNING,
+                )
+
     async def create_import_task(self, absolute_paths, relative_paths, export_folder, hoops_context):
+        if hoops_context is None:
+            hoops_context = MPCDIConverterContext()
+
+        loop = asyncio.get_event_loop()
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_READS)
+        name = os.path.basename(absolute_paths[0]) if len(absolute_paths) == 1 else \
+            f"{len(absolute_paths)} MPCDI files"
+        progress = ImportProgress(name)
+        notification = _ProgressNotification(progress, loop)
+        progress.on_progress = notification.on_progress
+
+        async def prepare(index):
+            summary = ImportSummary(absolute_paths[index])
+            # Computed once, the path of unsaved stages is timestamped.
+            usd_path = self._output_path(absolute_paths[index], relative_paths[index], export_folder)
+            async with semaphore:
+                if progress.cancelled:
+                    return index, None, summary, usd_path
+                with collect(summary):
+                    content = await OmniClientWrapper.read(absolute_paths[index])
+            if content is None:
+                return index, None, summary, usd_path
+
+            # Parsing overlaps with the reads of the other files. The context is the one _convert_xml_to_usd uses, so
+            # both compute the same cache key.
+            try:
+                prepared = await loop.run_in_executor(None, self._prepare, content,
+                                                      self._file_context(hoops_context, absolute_paths[index],
+                                                                         usd_path),
+                                                      summary, progress)
+            except ImportCancelled:
+                return index, None, summary, usd_path
+            except Exception as e:
+                logger = logging.getLogger(__name__)
+                logger.error(f"Failed to parse MPCDI file. Make sure it is not corrupt. {e}")
+                return index, None, summary, usd_path
+
+            return index, prepared, summary, usd_path
+
+        # Files are converted in the order they are read and parsed, a slow read does not hold the others.
         converted_assets = {}
-        for i in range(len(absolute_paths)):
-            converted_assets[absolute_paths[i]] = self._create_import_task(absolute_paths[i], relative_paths[i],
-                export_folder, hoops_context)
+        try:
+            for task in asyncio.as_completed([prepare(i) for i in range(len(absolute_paths))]):
+                index, prepared, summary, usd_path = await task
+                if prepared is None:
+                    self._record_summary(summary, "cancelled" if progress.cancelled else "failed")
+                    if not progress.cancelled:
+                        self._notify_failure(absolute_paths[index])
+                    converted_assets[absolute_paths[index]] = None
+                    continue
+
+                converted_assets[absolute_paths[index]] = await self._create_import_task(absolute_paths[index],
+                    relative_paths[index], export_folder, hoops_context, prepared, progress, usd_path)
+        finally:
+            notification.close()
+
+        if progress.cancelled:
+            nm.post_notification(f"Import of {name} cancelled.", status=NotificationStatus.WARNING)
         return converted_assets
 
 class MPCDIConverterOptions:
@@ -373,6 +578,9 @@ class MPCDIConverterDelegate(ai.AbstractImporterDelegate):
         self._name = name
         self._filters = filters
         self._descriptions = descriptions
+        # Set by the extension when the watch mode is enabled, and the import options of the watched files.
+        self.watcher = None
+        self._watched = {}
 
     def destroy(self):
         if self._hoops_converter:
@@ -413,8 +621,24 @@ class MPCDIConverterDelegate(ai.AbstractImporterDelegate):
              absolute_paths, relative_paths, context.export_folder, hoops_context
          )
 
+        if self.watcher is not None:
+            for absolute_path, usd_path in converted_assets.items():
+                if usd_path is not None:
+                    self._watched[absolute_path] = (context.export_folder, hoops_context)
+                    self.watcher.watch(absolute_path)
+
         return converted_assets
 
+    async def reimport(self, absolute_path):
+        # Called by the watcher: the file is converted again to the same layer, the stages referencing it reload it.
+        # Watched files are re-imported incrementally whatever the incremental setting.
+        export_folder, hoops_context = self._watched[absolute_path]
+        hoops_context = copy.copy(hoops_context) if hoops_context is not None else MPCDIConverterContext()
+        hoops_context.incremental = True
+        await self._hoops_converter.create_import_task(
+            [absolute_path], [os.path.basename(absolute_path)], export_folder, hoops_context
+        )
+
 
 _global_instance = None
 
@@ -433,15 +657,28 @@ class MfMpcdiConverterExtension(omni.ext.IExt):
         self.delegate_mpcdi = MPCDIConverterDelegate(
             self._usd_context,
             "MPCDI Converter",
-            ["(.*\\.mpcdi\\.xml$)"],
-            ["mpcdi XML Files (*.mpdci.xml)"]
+            ["(.*\\.mpcdi\\.xml$)", "(.*\\.mpcdi$)"],
+            ["mpcdi XML Files (*.mpdci.xml)", "mpcdi Archives (*.mpcdi)"]
         )
 
         ai.register_importer(self.delegate_mpcdi)
 
+        # Opt-in watch mode: imported files are converted again whenever they change.
+        self._watcher = None
+        settings = carb.settings.get_settings()
+        if settings.get(SETTINGS_PATH + "/watch/enabled"):
+            self._watcher = MPCDIWatcher(self.delegate_mpcdi.reimport,
+                                         float(settings.get(SETTINGS_PATH + "/watch/debounceSeconds")),
+                                         float(settings.get(SETTINGS_PATH + "/watch/pollIntervalSeconds")))
+            self.delegate_mpcdi.watcher = self._watcher
+
     def on_shutdown(self):
         global _global_instance
         _global_instance = None
 
+        if self._watcher is not None:
+            self._watcher.destroy()
+            self._watcher = None
+
         ai.remove_importer(self.delegate_mpcdi)
         self.delegate_mpcdi = None
@@ -3,6 +3,7 @@ import traceback
 import asyncio
 import carb
 import omni.client
+from .profiling import add_bytes_read, span
 
 
 def _encode_content(content):
@@ -41,7 +42,8 @@ class OmniClientWrapper:
     async def write(path: str, content):
         carb.log_info(f"Writing {path}...")
         try:
-            result = await omni.client.write_file_async(path, _encode_content(content))
+            with span("save", profiler=False):
+                result = await omni.client.write_file_async(path, _encode_content(content))
             if result != omni.client.Result.OK:
                 carb.log_error(f"Cannot write {path}, error code: {result}.")
                 return False
@@ -58,8 +60,9 @@ class OmniClientWrapper:
     async def copy(src_path: str, dest_path: str):
         carb.log_info(f"Coping from {src_path} to {dest_path}...")
         try:
-            await omni.client.delete_async(dest_path)
-            result = await omni.client.copy_async(src_path, dest_path)
+            with span("save", profiler=False):
+                await omni.client.delete_async(dest_path)
+                result = await omni.client.copy_async(src_path, dest_path)
             if result != omni.client.Result.OK:
                 carb.log_error(f"Cannot copy from {src_path} to {dest_path}, error code: {result}.")
                 return False
@@ -75,9 +78,13 @@ class OmniClientWrapper:
     async def read(src_path: str):
         carb.log_info(f"Reading {src_path}...")
         try:
-            result, version, content = await omni.client.read_file_async(src_path)
+            with span("read", profiler=False):
+                result, version, content = await omni.client.read_file_async(src_path)
             if result == omni.client.Result.OK:
-                return memoryview(content).tobytes()
+                # A view of the buffer of omni.client, _open_content wraps it without copying.
+                content = memoryview(content)
+                add_bytes_read(len(content))
+                return content
             else:
                 carb.log_error(f"Cannot read {src_path}, error code: {result}.")
         except Exception as e:
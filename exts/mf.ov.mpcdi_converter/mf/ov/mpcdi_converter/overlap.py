@@ -0,0 +1,274 @@
+"""Overlapping projector frustums of an MPCDI document, where edge blending is needed.
+
+    python -m mf.ov.mpcdi_converter.overlap <document.mpcdi.xml|.mpcdi> [--throw-distance 5000] [--json overlaps.json]
+        [--layer converted.usd]
+
+Frustums are pyramids from the projector to its image at `throw_distance`. Candidate pairs come from a sweep and prune
+of their bounding boxes and are confirmed with a separating axis test. With --layer, the cameras of a converted layer
+get an `mpcdi:overlaps` relationship targeting the cameras they overlap.
+
+Only pxr and numpy are needed.
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+from pxr import Sdf
+
+from .archive import open_package
+from .compute import camera_matrices
+from .converter import MPCDI_ROOT_PATH, clean_name_for_usd, parse_document
+from .document import MPCDIDocument
+from .parser import FRUSTUM_TAGS
+
+
+# Stage units, the converted positions are in centimeters.
+DEFAULT_THROW_DISTANCE = 5000.0
+OVERLAPS_RELATIONSHIP = "mpcdi:overlaps"
+# Candidate pairs tested at once, bounds the memory of the separating axis test.
+PAIR_CHUNK = 8192
+
+_EPSILON = 1e-9
+
+_RIGHT_ANGLE, _LEFT_ANGLE, _UP_ANGLE, _DOWN_ANGLE = (FRUSTUM_TAGS.index(tag) for tag in
+                                                     ("rightAngle", "leftAngle", "upAngle", "downAngle"))
+
+
+def frustum_vertices(document: MPCDIDocument, throw_distance: float = DEFAULT_THROW_DISTANCE) -> np.ndarray:
+    """(N, 5, 3) stage space vertices of the frustums: the projector, then the corners of the image at
+    `throw_distance`, clockwise from the top left one.
+    """
+    tangents = np.tan(np.radians(document.frustums[:, [_LEFT_ANGLE, _RIGHT_ANGLE, _UP_ANGLE, _DOWN_ANGLE]]))
+    left, right, up, down = tangents.T
+    local = np.zeros((len(document), 5, 4))
+    local[:, 1:, 0] = np.stack((left, right, right, left), axis=1) * throw_distance
+    local[:, 1:, 1] = np.stack((up, up, down, down), axis=1) * throw_distance
+    # Cameras look down -Z.
+    local[:, 1:, 2] = -throw_distance
+    local[:, :, 3] = 1.0
+    return (local @ camera_matrices(document.compute()))[:, :, :3]
+
+
+def _separating_axes(vertices: np.ndarray):
+    # Face normals and edge directions of each pyramid, (N, 5, 3) and (N, 6, 3).
+    apex = vertices[:, :1]
+    lateral = vertices[:, 1:] - apex
+    sides = np.cross(lateral, np.roll(lateral, -1, axis=1))
+    base = np.cross(vertices[:, 2] - vertices[:, 1], vertices[:, 4] - vertices[:, 1])
+    faces = np.concatenate((sides, base[:, None]), axis=1)
+    edges = np.concatenate((lateral, (vertices[:, 2] - vertices[:, 1])[:, None],
+                            (vertices[:, 4] - vertices[:, 1])[:, None]), axis=1)
+    return faces, edges
+
+
+def _largest_gaps(axes, firstVertices, secondVertices):
+    # Largest gap between the projections of the pyramid pairs on their (P, A, 3) axes, -inf when all overlap.
+    # Parallel edges give null axes, they are left out of the test.
+    lengths = np.linalg.norm(axes, axis=2)
+    valid = lengths > 1e-9
+    axes = np.divide(axes, lengths[:, :, None], out=np.zeros_like(axes), where=valid[:, :, None])
+    axes = axes.transpose(0, 2, 1)
+    firstProjections = firstVertices @ axes
+    secondProjections = secondVertices @ axes
+    gaps = np.maximum(secondProjections.min(axis=1) - firstProjections.max(axis=1),
+                      firstProjections.min(axis=1) - secondProjections.max(axis=1))
+    gaps[~valid] = -np.inf
+    return gaps.max(axis=1)
+
+
+def _narrow_phase(vertices, faces, edges, first, second, tolerance):
+    # Separating axis test of the pyramid pairs, returns whether they overlap and their penetration depth. The face
+    # normals separate most pairs, the cross products of the edges are only tested for the remaining ones.
+    firstVertices = vertices[first]
+    secondVertices = vertices[second]
+    largestGap = _largest_gaps(np.concatenate((faces[first], faces[second]), axis=1), firstVertices, secondVertices)
+    remaining = np.flatnonzero(largestGap <= tolerance)
+    crossed = np.cross(edges[first[remaining]][:, :, None], edges[second[remaining]][:, None, :])
+    largestGap[remaining] = np.maximum(largestGap[remaining], _largest_gaps(
+        crossed.reshape(len(remaining), edges.shape[1] ** 2, 3), firstVertices[remaining], secondVertices[remaining]))
+    # The overlap along an axis is minus its gap, the smallest one is the penetration depth.
+    return largestGap <= tolerance, -largestGap
+
+
+def _sweep_and_prune(low: np.ndarray, high: np.ndarray):
+    # Yield chunks of candidate pairs whose boxes overlap. The boxes are swept along the axis their centers spread the
+    # most on, within the columns of a grid over the two other axes, sized after the average box. A box is in every
+    # column it crosses and is paired with the following boxes of the column starting before it ends. A pair is only
+    # kept in the column holding the corner where its boxes start to overlap, so it is reported once.
+    axis = int(np.argmax((low + high).var(axis=0)))
+    others = [other for other in range(3) if other != axis]
+    origin = low[:, others].min(axis=0)
+    cellSize = np.maximum((high - low)[:, others].mean(axis=0), _EPSILON)
+    firstCells = ((low[:, others] - origin) // cellSize).astype(np.int64)
+    cellCounts = ((high[:, others] - origin) // cellSize).astype(np.int64) - firstCells + 1
+
+    entryCounts = cellCounts.prod(axis=1)
+    boxes = np.repeat(np.arange(len(low)), entryCounts)
+    offsets = np.arange(len(boxes)) - np.repeat(np.cumsum(entryCounts) - entryCounts, entryCounts)
+    cells = firstCells[boxes] + np.stack((offsets // cellCounts[boxes, 1], offsets % cellCounts[boxes, 1]), axis=1)
+    columns = cells[:, 0] * (cells[:, 1].max() + 1) + cells[:, 1]
+
+    # Sweep keys, the columns are laid end to end so that a box never reaches into the next column.
+    start = low[:, axis].min()
+    span = high[:, axis].max() - start + 1.0
+    keys = columns * span + (low[boxes, axis] - start)
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    boxes = boxes[order]
+    cells = cells[order]
+    ends = np.searchsorted(keys, columns[order] * span + (high[boxes, axis] - start), side="right")
+    counts = np.maximum(ends - np.arange(len(boxes)) - 1, 0)
+    totals = np.cumsum(counts)
+
+    entry = 0
+    while entry < len(boxes):
+        stop = max(int(np.searchsorted(totals, (totals[entry - 1] if entry else 0) + PAIR_CHUNK, side="right")),
+                   entry + 1)
+        rowCounts = counts[entry:stop]
+        firstEntries = np.repeat(np.arange(entry, stop), rowCounts)
+        secondEntries = firstEntries + 1 + np.arange(len(firstEntries)) - \
+            np.repeat(np.cumsum(rowCounts) - rowCounts, rowCounts)
+        first = boxes[firstEntries]
+        second = boxes[secondEntries]
+        corner = (np.maximum(low[first], low[second])[:, others] - origin) // cellSize
+        keep = ((low[first] <= high[second]) & (low[second] <= high[first])).all(axis=1) & \
+            (corner == cells[firstEntries]).all(axis=1)
+        yield first[keep], second[keep]
+        entry = stop
+
+
+class OverlapGraph:
+    """Pairs of document rows whose frustums overlap, with the first row of each pair lower than the second."""
+
+    def __init__(self, document: MPCDIDocument, pairs: np.ndarray, depths: np.ndarray, throw_distance: float):
+        self.document = document
+        self.pairs = pairs
+        # Penetration depth of each pair, the distance one frustum should move to stop overlapping the other.
+        self.depths = depths
+        self.throw_distance = throw_distance
+        self.candidates = 0
+        self.seconds = 0.0
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def neighbors(self, row: int) -> np.ndarray:
+        """Rows overlapping `row`."""
+        first, second = self.pairs.T
+        return np.sort(np.concatenate((second[first == row], first[second == row])))
+
+    def camera_path(self, row: int) -> str:
+        region = self.document[row]
+        return f"{MPCDI_ROOT_PATH}/{clean_name_for_usd(region.buffer_id)}/{clean_name_for_usd(region.region_id)}"
+
+    def to_dict(self) -> dict:
+        def describe(row):
+            region = self.document[row]
+            return {"buffer": region.buffer_id, "region": region.region_id, "path": self.camera_path(row)}
+
+        return {
+            "throw_distance": self.throw_distance,
+            "regions": len(self.document),
+            "candidates": self.candidates,
+            "seconds": round(self.seconds, 3),
+            "overlaps": [{"a": describe(int(a)), "b": describe(int(b)), "depth": float(depth)}
+                         for (a, b), depth in zip(self.pairs, self.depths)],
+        }
+
+    def author_relationships(self, layer: Sdf.Layer):
+        """Set the `mpcdi:overlaps` relationship of every camera of `layer` to the cameras it overlaps, cameras
+        overlapping nothing lose theirs.
+        """
+        neighbors = {}
+        for a, b in self.pairs.tolist():
+            neighbors.setdefault(a, []).append(self.camera_path(b))
+            neighbors.setdefault(b, []).append(self.camera_path(a))
+
+        with Sdf.ChangeBlock():
+            for row in range(len(self.document)):
+                path = Sdf.Path(self.camera_path(row))
+                targets = neighbors.get(row)
+                if targets is None:
+                    primSpec = layer.GetPrimAtPath(path)
+                    if primSpec is not None and OVERLAPS_RELATIONSHIP in primSpec.relationships:
+                        primSpec.RemoveProperty(primSpec.relationships[OVERLAPS_RELATIONSHIP])
+                    continue
+
+                primSpec = Sdf.CreatePrimInLayer(layer, path)
+                relationshipSpec = primSpec.relationships.get(OVERLAPS_RELATIONSHIP)
+                if relationshipSpec is None:
+                    relationshipSpec = Sdf.RelationshipSpec(primSpec, OVERLAPS_RELATIONSHIP, custom=True)
+                relationshipSpec.targetPathList.explicitItems = [Sdf.Path(target) for target in sorted(targets)]
+
+
+def find_overlaps(document: MPCDIDocument, throw_distance: float = DEFAULT_THROW_DISTANCE) -> OverlapGraph:
+    """Pairs of regions of `document` whose frustums, truncated at `throw_distance`, overlap."""
+    start = time.perf_counter()
+    if len(document) < 2:
+        # Nothing to pair, the sweep sizes its grid after the boxes.
+        graph = OverlapGraph(document, np.empty((0, 2), dtype=np.int64), np.empty(0), throw_distance)
+        graph.seconds = time.perf_counter() - start
+        return graph
+
+    vertices = frustum_vertices(document, throw_distance)
+    faces, edges = _separating_axes(vertices)
+    # Frustums only touching along a face or an edge do not overlap.
+    tolerance = -1e-6 * throw_distance
+
+    pairs = []
+    depths = []
+    candidates = 0
+    for first, second in _sweep_and_prune(vertices.min(axis=1), vertices.max(axis=1)):
+        candidates += len(first)
+        if len(first) == 0:
+            continue
+        overlap, depth = _narrow_phase(vertices, faces, edges, first, second, tolerance)
+        pairs.append(np.sort(np.stack((first[overlap], second[overlap]), axis=1), axis=1))
+        depths.append(depth[overlap])
+
+    pairs = np.concatenate(pairs) if pairs else np.empty((0, 2), dtype=np.int64)
+    depths = np.concatenate(depths) if depths else np.empty(0)
+    order = np.lexsort((pairs[:, 1], pairs[:, 0]))
+    graph = OverlapGraph(document, pairs[order], depths[order], throw_distance)
+    graph.candidates = candidates
+    graph.seconds = time.perf_counter() - start
+    return graph
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m mf.ov.mpcdi_converter.overlap",
+        description="Find the projectors of an MPCDI document whose frustums overlap.",
+    )
+    parser.add_argument("document", help="MPCDI document, .mpcdi.xml or .mpcdi archive.")
+    parser.add_argument("--throw-distance", type=float, default=DEFAULT_THROW_DISTANCE,
+                        help="Distance from the projectors at which the frustums are cut, in stage units.")
+    parser.add_argument("--json", default=None, help="Write the overlapping pairs to this JSON file.")
+    parser.add_argument("--layer", default=None,
+                        help="Converted layer of the document, its cameras get mpcdi:overlaps relationships.")
+    args = parser.parse_args(argv)
+
+    with open_package(args.document) as package:
+        document = parse_document(package)
+    graph = find_overlaps(document, args.throw_distance)
+    print(f"{len(graph)} overlapping pair(s) out of {graph.candidates} candidate(s) among {len(document)} region(s) "
+          f"in {graph.seconds * 1000.0:.1f} ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(graph.to_dict(), f, indent=2)
+    if args.layer:
+        layer = Sdf.Layer.FindOrOpen(args.layer)
+        if layer is None:
+            print(f"Cannot open {args.layer}")
+            return 1
+        graph.author_relationships(layer)
+        layer.Save()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
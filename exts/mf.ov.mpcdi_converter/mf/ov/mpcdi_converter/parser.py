@@ -0,0 +1,147 @@
+import xml.etree.ElementTree as ET
+
+
+FRUSTUM_TAGS = ("yaw", "pitch", "roll", "rightAngle", "leftAngle", "upAngle", "downAngle")
+COORDINATE_FRAME_TAGS = (
+    "posx", "posy", "posz",
+    "yawx", "yawy", "yawz",
+    "pitchx", "pitchy", "pitchz",
+    "rollx", "rolly", "rollz",
+)
+
+# Per region payload files of the <files> section
+FILESET_TAGS = ("geometryWarpFile", "alphaMap", "betaMap", "distortionMap")
+
+# Depth of the elements in the document: <MPCDI><display><buffer><region> and <MPCDI><files><fileset>
+_DISPLAY_DEPTH = 1
+_BUFFER_DEPTH = 2
+_REGION_DEPTH = 3
+_FILESET_DEPTH = 2
+
+
+class MPCDIRegion:
+    """A region (projector) of an MPCDI document, detached from the XML tree it was read from."""
+    __slots__ = ("buffer_id", "region_id", "x_resolution", "y_resolution", "frustum", "coordinate_frame")
+
+    def __init__(self, buffer_id: str, region_id: str, x_resolution: int, y_resolution: int, frustum: dict,
+                 coordinate_frame: dict):
+        self.buffer_id = buffer_id
+        self.region_id = region_id
+        self.x_resolution = x_resolution
+        self.y_resolution = y_resolution
+        self.frustum = frustum
+        self.coordinate_frame = coordinate_frame
+
+
+class MPCDIFileset:
+    """Payload files of a region, each entry maps the element children (path, bitDepth, ...) to their text."""
+    __slots__ = ("region_id", "files")
+
+    def __init__(self, region_id: str, files: dict):
+        self.region_id = region_id
+        self.files = files
+
+    def path(self, tag: str):
+        entry = self.files.get(tag)
+        return entry.get("path") if entry is not None else None
+
+
+class _BufferReader:
+    # Minimal file-like object over an in-memory buffer, iterparse only needs read(). Slices are copied chunk by
+    # chunk so the whole document is never duplicated.
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast("B")
+        self._position = 0
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = len(self._view) - self._position
+        chunk = self._view[self._position:self._position + size].tobytes()
+        self._position += len(chunk)
+        return chunk
+
+
+def open_buffer(buffer):
+    return _BufferReader(buffer)
+
+
+def _read_floats(region: ET.Element, regionId: str, tag: str, keys) -> dict:
+    node = region.find(tag)
+    if node is None:
+        raise ValueError(f"Region '{regionId}' has no <{tag}> element.")
+
+    values = {}
+    for key in keys:
+        child = node.find(key)
+        if child is None or child.text is None:
+            raise ValueError(f"Region '{regionId}' is missing <{tag}><{key}>.")
+        values[key] = float(child.text)
+
+    return values
+
+
+def _region_from_element(bufferId: str, region: ET.Element) -> MPCDIRegion:
+    regionId = region.attrib['id']
+    return MPCDIRegion(
+        bufferId,
+        regionId,
+        int(region.attrib.get('xResolution', 0)),
+        int(region.attrib.get('yResolution', 0)),
+        _read_floats(region, regionId, 'frustum', FRUSTUM_TAGS),
+        _read_floats(region, regionId, 'coordinateFrame', COORDINATE_FRAME_TAGS),
+    )
+
+
+def _fileset_from_element(fileset: ET.Element) -> MPCDIFileset:
+    files = {}
+    for child in fileset:
+        if child.tag in FILESET_TAGS:
+            files[child.tag] = {entry.tag: (entry.text or "").strip() for entry in child}
+    return MPCDIFileset(fileset.attrib.get('region', ''), files)
+
+
+def iter_regions(source, filesets: dict = None):
+    """Yield the regions of an MPCDI document one at a time.
+
+    `source` is a file path or a binary file object (see open_buffer for in-memory content). Elements are dropped
+    from the tree as soon as their region has been yielded, so memory stays flat regardless of the document size.
+    When `filesets` is given, the MPCDIFileset of each region is stored in it by region id. The <files> section
+    comes after the regions, so it is only complete once the iteration is over.
+    """
+    stack = []
+    bufferId = None
+
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            stack.append(elem)
+            depth = len(stack) - 1
+            if depth == _BUFFER_DEPTH and stack[_DISPLAY_DEPTH].tag == 'display':
+                bufferId = elem.attrib['id']
+            continue
+
+        stack.pop()
+        depth = len(stack)
+        inFiles = depth >= _FILESET_DEPTH and stack[_DISPLAY_DEPTH].tag == 'files'
+        region = None
+        if inFiles:
+            if depth > _FILESET_DEPTH:
+                # Children of a fileset are needed until the fileset itself is complete.
+                continue
+            if filesets is not None:
+                fileset = _fileset_from_element(elem)
+                filesets[fileset.region_id] = fileset
+        elif depth == _REGION_DEPTH and bufferId is not None:
+            region = _region_from_element(bufferId, elem)
+        elif depth == _BUFFER_DEPTH:
+            bufferId = None
+        elif depth > _REGION_DEPTH:
+            # Children of a region are needed until the region itself is complete.
+            continue
+
+        # Detach the finished element from its parent so it can be garbage collected.
+        if stack:
+            stack[-1].remove(elem)
+        elem.clear()
+
+        if region is not None:
+            yield region
@@ -0,0 +1,110 @@
+import contextlib
+import contextvars
+import time
+
+try:
+    import carb.profiler as _carbProfiler
+except ImportError:
+    # Outside of Kit the spans are only timed.
+    _carbProfiler = None
+
+
+# Phases of an import, in the order they happen.
+PHASES = ("read", "parse", "compute", "author", "save")
+_PROFILER_MASK = 1
+_PROFILER_PREFIX = "MPCDI "
+
+_activeSummary = contextvars.ContextVar("mpcdi_import_summary", default=None)
+
+
+class ImportSummary:
+    """Structured record of one imported file: bytes read, regions and milliseconds spent in each phase.
+
+    Phase times are exclusive, the parsing done while authoring pulls the next batch counts as parse, not author.
+    """
+
+    def __init__(self, path: str = ""):
+        self.path = path
+        self.status = "ok"
+        self.bytes_read = 0
+        self.region_count = 0
+        # True or False when the conversion cache was used, None otherwise.
+        self.cache_hit = None
+        self.phases_ms = dict.fromkeys(PHASES, 0.0)
+        self.total_ms = 0.0
+        self._start = time.perf_counter()
+        self._stack = []
+
+    def finish(self, status: str = None):
+        if status is not None:
+            self.status = status
+        self.total_ms = (time.perf_counter() - self._start) * 1000.0
+
+    def _enter(self):
+        self._stack.append(0.0)
+
+    def _exit(self, phase: str, seconds: float):
+        childSeconds = self._stack.pop()
+        self.phases_ms[phase] = self.phases_ms.get(phase, 0.0) + (seconds - childSeconds) * 1000.0
+        if self._stack:
+            self._stack[-1] += seconds
+
+    def to_dict(self) -> dict:
+        return {
+            "path": self.path,
+            "status": self.status,
+            "bytes_read": self.bytes_read,
+            "region_count": self.region_count,
+            "cache_hit": self.cache_hit,
+            "phases_ms": dict(self.phases_ms),
+            "total_ms": self.total_ms,
+        }
+
+    def __str__(self):
+        phases = ", ".join(f"{phase} {milliseconds:.1f}" for phase, milliseconds in self.phases_ms.items())
+        cache = "" if self.cache_hit is None else (", cache hit" if self.cache_hit else ", cache miss")
+        return (f"{self.path}: {self.status}, {self.region_count} regions, {self.bytes_read} bytes read{cache}, "
+                f"{self.total_ms:.1f} ms ({phases} ms)")
+
+
+@contextlib.contextmanager
+def collect(summary: ImportSummary):
+    """Record the spans of the current thread or task into `summary`."""
+    token = _activeSummary.set(summary)
+    try:
+        yield summary
+    finally:
+        _activeSummary.reset(token)
+
+
+def current_summary() -> ImportSummary:
+    return _activeSummary.get()
+
+
+def add_bytes_read(count: int):
+    summary = _activeSummary.get()
+    if summary is not None:
+        summary.bytes_read += count
+
+
+@contextlib.contextmanager
+def span(phase: str, profiler: bool = True):
+    """Time a phase of the import, as a zone of the Kit profiler when it is available.
+
+    Profiler zones must nest on a thread, spans around an await pass `profiler=False` and are only timed.
+    """
+    summary = _activeSummary.get()
+    useProfiler = profiler and _carbProfiler is not None
+    if useProfiler:
+        _carbProfiler.begin(_PROFILER_MASK, _PROFILER_PREFIX + phase)
+    if summary is not None:
+        summary._enter()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if summary is not None:
+            summary._exit(phase, elapsed)
+        if useProfiler:
+            _carbProfiler.end(_PROFILER_MASK)
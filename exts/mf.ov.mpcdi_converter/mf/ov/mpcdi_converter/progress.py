@@ -0,0 +1,74 @@
+import threading
+from .converter import parse_batches
+from .document import MPCDIDocument
+
+
+# Regions authored between two progress reports and cancellation checks.
+DEFAULT_CHUNK_SIZE = 1024
+
+
+class ImportCancelled(Exception):
+    """Raised in the conversion thread once the import was cancelled, before the output layer is written."""
+
+
+class ImportProgress:
+    """Progress of an import, shared by the conversion threads of its files and the main thread.
+
+    `on_progress(progress)` is called from the conversion threads each time another `step` fraction of the expected
+    regions was authored. `cancel` can be called from any thread, the conversions stop at the next chunk.
+    """
+
+    def __init__(self, name: str, on_progress=None, step: float = 0.1):
+        self.name = name
+        self.total = 0
+        self.done = 0
+        self.on_progress = on_progress
+        self._step = step
+        self._reported = 0
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def check(self):
+        if self.cancelled:
+            raise ImportCancelled(f"Import of {self.name} cancelled.")
+
+    def expect(self, count: int):
+        with self._lock:
+            self.total += count
+
+    def advance(self, count: int):
+        with self._lock:
+            self.done += count
+            report = self.done - self._reported >= self._step * self.total
+            if report:
+                self._reported = self.done
+        if report and self.on_progress is not None:
+            self.on_progress(self)
+
+    def __str__(self):
+        return f"{self.done}/{self.total} regions"
+
+
+def track_batches(source, progress: ImportProgress, size: int = DEFAULT_CHUNK_SIZE):
+    """Same as converter.parse_batches, in chunks of `size` regions: `progress` advances after each chunk and
+    ImportCancelled is raised before the next one once it is cancelled.
+
+    The regions of a streamed source are only expected once their chunk is parsed.
+    """
+    progress.check()
+    streamed = not isinstance(source, MPCDIDocument)
+    if not streamed:
+        progress.expect(len(source))
+    for regions, parameters in parse_batches(source, size):
+        progress.check()
+        if streamed:
+            progress.expect(len(regions))
+        yield regions, parameters
+        progress.advance(len(regions))
@@ -0,0 +1,219 @@
+"""Import of a sequence of MPCDI calibration passes as time samples on a single /MPCDI hierarchy.
+
+    python -m mf.ov.mpcdi_converter.sequence <output.usd> <pass.mpcdi.xml|.mpcdi>... [--start 0] [--fps 24]
+
+Passes are given in time order, pass i is sampled at time code start + i. Regions are matched across the passes by
+buffer and region id. The hierarchy holds every region of every pass, with the values of its first pass as defaults.
+Camera transforms, apertures and light sizes get time samples where they move, samples equal to both their neighbours
+are dropped so the layer grows with the motion and not with the number of passes. Regions missing from some passes are
+invisible at those times. Warp meshes and blend maps are not imported.
+
+Only pxr and numpy are needed.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+from pxr import Gf, Sdf
+
+from .archive import open_package
+from .converter import MPCDI_ROOT_PATH, MPCDIConverterContext, author_to_layer, clean_name_for_usd, parse_document
+from .document import MPCDIDocument
+from .profiling import span
+
+
+# Animated attributes: prim path relative to the camera, attribute name, ProjectorParameters field and conversion of a
+# float32 sample to the authored value.
+ANIMATED_ATTRIBUTES = (
+    ("", "xformOp:translate", "translate", lambda value: Gf.Vec3d(*value.tolist())),
+    ("", "xformOp:rotateY", "yaw", float),
+    ("", "xformOp:rotateX", "pitch", float),
+    ("", "xformOp:rotateZ", "roll", float),
+    ("", "horizontalAperture", "horizontal_aperture", float),
+    ("", "horizontalApertureOffset", "horizontal_aperture_offset", float),
+    ("", "verticalAperture", "vertical_aperture", float),
+    ("", "verticalApertureOffset", "vertical_aperture_offset", float),
+    ("/ProjectLight", "inputs:width", "light_width", float),
+    ("/ProjectLight", "inputs:height", "light_height", float),
+)
+
+
+class MPCDISequenceResult:
+    def __init__(self, conversion):
+        # MPCDIConversionResult of the hierarchy, with the lens shifting of all the passes.
+        self.conversion = conversion
+        self.passes = 0
+        # Time samples written, and dropped because they matched both neighbours.
+        self.samples = 0
+        self.dropped = 0
+
+    def __str__(self):
+        return (f"{self.conversion.region_count} region(s) over {self.passes} pass(es), {self.samples} time sample(s) "
+                f"written, {self.dropped} unchanged dropped")
+
+
+def _region_keys(document: MPCDIDocument):
+    return list(zip(document.buffer_ids[document.buffer_indices].tolist(), document.region_ids.tolist()))
+
+
+def _union_document(documents):
+    # Every region of the passes, in order of first appearance, and the union row of each row of each pass.
+    rows = {}
+    sources = []
+    passRows = []
+    for passIndex, document in enumerate(documents):
+        indices = np.empty(len(document), dtype=np.int64)
+        for row, key in enumerate(_region_keys(document)):
+            union = rows.get(key)
+            if union is None:
+                union = rows[key] = len(sources)
+                sources.append((passIndex, row))
+            indices[row] = union
+        passRows.append(indices)
+
+    bufferIds = {}
+    bufferIndices = [bufferIds.setdefault(bufferId, len(bufferIds)) for bufferId, _ in rows]
+
+    def gather(column):
+        return [getattr(documents[passIndex], column)[row] for passIndex, row in sources]
+
+    union = MPCDIDocument(list(bufferIds), [regionId for _, regionId in rows], bufferIndices, gather("resolutions"),
+                          gather("frustums"), gather("coordinate_frames"))
+    return union, passRows
+
+
+def _kept_samples(values: np.ndarray, present: np.ndarray) -> np.ndarray:
+    """(T, U) mask of the samples to write from (T, U, ...) `values`, sampled where `present`.
+
+    A sample is kept when it differs from the previous or the next present sample of its region, so that held and
+    interpolated values are unchanged. The first sample is always needed, the last one holds the previous value when
+    they are equal. Regions whose present samples are all equal keep none, their default holds.
+    """
+    passCount = len(values)
+    flat = values.reshape(passCount, values.shape[1], -1)
+    times = np.arange(passCount)[:, None]
+    previous = np.maximum.accumulate(np.where(present, times, -1), axis=0)
+    previous = np.concatenate((np.full((1, values.shape[1]), -1), previous[:-1]))
+    following = np.minimum.accumulate(np.where(present, times, passCount)[::-1], axis=0)[::-1]
+    following = np.concatenate((following[1:], np.full((1, values.shape[1]), passCount)))
+
+    columns = np.arange(values.shape[1])
+    padded = np.concatenate((flat, np.full((1,) + flat.shape[1:], np.nan, dtype=flat.dtype)))
+
+    def differs(neighbours):
+        # NaN padding never equals a value.
+        return (padded[neighbours, columns] != flat).any(axis=2)
+
+    kept = present & (differs(previous) | (differs(following) & (following < passCount)))
+    moving = (present & (previous >= 0) & ~(padded[previous, columns] == flat).all(axis=2)).any(axis=0)
+    return kept & moving
+
+
+def author_sequence(documents, layer: Sdf.Layer, times=None,
+                    context: MPCDIConverterContext = None) -> MPCDISequenceResult:
+    """Write the regions of `documents`, a list of MPCDIDocument in time order, under /MPCDI in `layer` with time
+    samples at `times` (0, 1, 2... by default).
+
+    Samples are set at the Sdf level in a single Sdf.ChangeBlock, attribute by attribute, so stages using the layer
+    recompose once.
+    """
+    if context is None:
+        context = MPCDIConverterContext()
+    times = [float(t) for t in (times if times is not None else range(len(documents)))]
+    if len(times) != len(documents):
+        raise ValueError(f"{len(documents)} passes but {len(times)} times.")
+
+    union, passRows = _union_document(documents)
+    regionCount = len(union)
+    present = np.zeros((len(documents), regionCount), dtype=bool)
+    values = {}
+    with span("compute"):
+        for passIndex, (document, rows) in enumerate(zip(documents, passRows)):
+            parameters = document.compute()
+            present[passIndex, rows] = True
+            for _, _, field, _ in ANIMATED_ATTRIBUTES:
+                column = getattr(parameters, field)
+                if field not in values:
+                    values[field] = np.full((len(documents),) + (regionCount,) + column.shape[1:], np.nan,
+                                            dtype=np.float32)
+                values[field][passIndex, rows] = column
+
+    with Sdf.ChangeBlock(), span("author"):
+        result = MPCDISequenceResult(author_to_layer(union.batches(), layer, None, context))
+        result.passes = len(documents)
+        result.conversion.has_lens_shifting = result.conversion.has_lens_shifting or any(
+            bool(np.any(values[field][present] != 0.0))
+            for field in ("horizontal_aperture_offset", "vertical_aperture_offset"))
+
+        cameraPaths = [MPCDI_ROOT_PATH + '/' + clean_name_for_usd(region.buffer_id) + '/' +
+                       clean_name_for_usd(region.region_id) for region in union]
+        for relativePath, name, field, convert in ANIMATED_ATTRIBUTES:
+            kept = _kept_samples(values[field], present)
+            result.samples += int(kept.sum())
+            result.dropped += int(present.sum() - kept.sum())
+            for region in np.flatnonzero(kept.any(axis=0)):
+                path = Sdf.Path(cameraPaths[region] + relativePath).AppendProperty(name)
+                for passIndex in np.flatnonzero(kept[:, region]):
+                    layer.SetTimeSample(path, times[passIndex], convert(values[field][passIndex, region]))
+
+        # Regions missing from a pass are hidden until they come back.
+        for region in np.flatnonzero(~present.all(axis=0)):
+            primSpec = layer.GetPrimAtPath(cameraPaths[region])
+            visibility = Sdf.AttributeSpec(primSpec, "visibility", Sdf.ValueTypeNames.Token)
+            changes = np.flatnonzero(np.diff(present[:, region].astype(np.int8), prepend=-1))
+            for passIndex in changes:
+                layer.SetTimeSample(visibility.path, times[passIndex],
+                                    "inherited" if present[passIndex, region] else "invisible")
+            result.samples += len(changes)
+
+        if times:
+            layer.startTimeCode = times[0]
+            layer.endTimeCode = times[-1]
+
+    return result
+
+
+def convert_sequence(input_paths, output_path: str, start: float = 0.0, fps: float = None,
+                     context: MPCDIConverterContext = None) -> MPCDISequenceResult:
+    """Convert local .mpcdi archives or .mpcdi.xml files, in time order, to a new USD layer written at `output_path`."""
+    documents = []
+    for path in input_paths:
+        with open_package(path) as package:
+            documents.append(parse_document(package))
+
+    layer = Sdf.Layer.CreateNew(output_path)
+    result = author_sequence(documents, layer, [start + index for index in range(len(documents))], context)
+    if fps:
+        layer.timeCodesPerSecond = fps
+    layer.defaultPrim = MPCDI_ROOT_PATH[1:]
+    with span("save"):
+        layer.Save()
+
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m mf.ov.mpcdi_converter.sequence",
+        description="Convert a sequence of MPCDI calibration passes to a single time-sampled USD layer.",
+    )
+    parser.add_argument("output", help="USD layer to write.")
+    parser.add_argument("inputs", nargs="+", help="MPCDI documents, .mpcdi.xml or .mpcdi archives, in time order.")
+    parser.add_argument("--start", type=float, default=0.0, help="Time code of the first pass.")
+    parser.add_argument("--fps", type=float, default=None, help="Time codes per second of the layer.")
+    parser.add_argument("--instancing", action="store_true",
+                        help="Share the projector light settings and boxes through a class prim and instancing.")
+    args = parser.parse_args(argv)
+
+    startTime = time.perf_counter()
+    context = MPCDIConverterContext()
+    context.instancing = args.instancing
+    result = convert_sequence(args.inputs, args.output, args.start, args.fps, context)
+    print(f"{result} in {time.perf_counter() - startTime:.2f} s")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""Synthetic MPCDI documents for benchmarks and manual testing.
+
+    python -m mf.ov.mpcdi_converter.synthetic <output.mpcdi|output.mpcdi.xml> [--buffers 1] [--regions 6]
+        [--warp 64x36] [--blend 512x288]
+
+A .mpcdi output is a zip package, a .mpcdi.xml output gets its payload files written next to it.
+"""
+import argparse
+import os
+import sys
+import zipfile
+
+import numpy as np
+
+from .archive import DOCUMENT_NAME, is_archive_path
+from .blend import encode_png
+
+
+_REGION_TEMPLATE = """
+            <region id="{region_id}" xResolution="1920" yResolution="1080" x="0.0" y="0.0" xsize="1.0" ysize="1.0">
+                <frustum>
+                    <yaw>{yaw:.6f}</yaw>
+                    <pitch>-0.000000</pitch>
+                    <roll>-0.000000</roll>
+                    <rightAngle>21.801409</rightAngle>
+                    <leftAngle>-21.801409</leftAngle>
+                    <upAngle>12.680382</upAngle>
+                    <downAngle>-12.680382</downAngle>
+                </frustum>
+                <coordinateFrame>
+                    <posx>{posx:.6f}</posx>
+                    <posy>{posy:.6f}</posy>
+                    <posz>3.000000</posz>
+                    <yawx>0.0</yawx>
+                    <yawy>-1.0</yawy>
+                    <yawz>0.0</yawz>
+                    <pitchx>1.0</pitchx>
+                    <pitchy>0.0</pitchy>
+                    <pitchz>0.0</pitchz>
+                    <rollx>0.0</rollx>
+                    <rolly>0.0</rolly>
+                    <rollz>-1.0</rollz>
+                </coordinateFrame>
+            </region>"""
+
+_WARP_TEMPLATE = """
+            <geometryWarpFile>
+                <path>{path}</path>
+                <interpolation>linear</interpolation>
+                <componentDepth>3</componentDepth>
+                <bitDepth>32</bitDepth>
+                <xSize>{width}</xSize>
+                <ySize>{height}</ySize>
+            </geometryWarpFile>"""
+
+_MAP_TEMPLATE = """
+            <{tag}>
+                <path>{path}</path>
+                <componentDepth>1</componentDepth>
+                <bitDepth>8</bitDepth>
+                <gammaEmbedded>2.2</gammaEmbedded>
+            </{tag}>"""
+
+
+def region_id(index: int) -> str:
+    return f"Projector_{index}"
+
+
+def _payload_paths(regionId: str) -> dict:
+    return {
+        "geometryWarpFile": f"{regionId}_warp.pfm",
+        "alphaMap": f"{regionId}_alpha.png",
+        "betaMap": f"{regionId}_beta.png",
+    }
+
+
+def generate_document(buffers: int = 1, regions_per_buffer: int = 6, warp_size=None, blend_size=None) -> bytes:
+    """Return an MPCDI document of `buffers` x `regions_per_buffer` regions.
+
+    Regions are spread along X and rotate around Y so no two of them are identical. When `warp_size` or `blend_size`
+    ((width, height) tuples) are given, every region gets a fileset referencing its payload files.
+    """
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8" ?>\n'
+        '<MPCDI profile="3d" geometry="2" color="1" version="2.0">\n'
+        '    <display>'
+    ]
+    index = 0
+    for buffer in range(buffers):
+        parts.append(f'\n        <buffer id="{buffer}">')
+        for _ in range(regions_per_buffer):
+            parts.append(_REGION_TEMPLATE.format(region_id=region_id(index), yaw=(index * 7.5) % 360.0 - 180.0,
+                                                 posx=index * 0.25, posy=buffer * 0.5))
+            index += 1
+        parts.append('\n        </buffer>')
+    parts.append('\n    </display>')
+
+    if warp_size is not None or blend_size is not None:
+        parts.append('\n    <files>')
+        for index in range(buffers * regions_per_buffer):
+            paths = _payload_paths(region_id(index))
+            parts.append(f'\n        <fileset region="{region_id(index)}">')
+            if warp_size is not None:
+                parts.append(_WARP_TEMPLATE.format(path=paths["geometryWarpFile"], width=warp_size[0],
+                                                   height=warp_size[1]))
+            if blend_size is not None:
+                for tag in ("alphaMap", "betaMap"):
+                    parts.append(_MAP_TEMPLATE.format(tag=tag, path=paths[tag]))
+            parts.append('\n        </fileset>')
+        parts.append('\n    </files>')
+
+    parts.append('\n</MPCDI>\n')
+    return "".join(parts).encode("utf-8")
+
+
+def generate_warp(width: int, height: int) -> bytes:
+    """PFM warp grid of a slightly curved screen 3 units in front of the projector."""
+    u, v = np.meshgrid(np.linspace(-1.0, 1.0, width), np.linspace(-0.5625, 0.5625, height))
+    grid = np.stack((u, v, -3.0 + 0.1 * u * u), axis=-1).astype("<f4")
+    # Rows are stored bottom to top, a negative scale means little endian.
+    return f"PF\n{width} {height}\n-1.0\n".encode("ascii") + grid[::-1].tobytes()
+
+
+def generate_blend(width: int, height: int, beta: bool = False) -> bytes:
+    """PNG alpha map fading out on the left and right edges, or a flat beta (black level) map."""
+    if beta:
+        return encode_png(np.full((height, width, 1), 4, dtype=np.uint8))
+    ramp = np.clip(np.minimum(np.linspace(0.0, 1.0, width), np.linspace(1.0, 0.0, width)) * 5.0, 0.0, 1.0)
+    return encode_png(np.broadcast_to((ramp * 255.0).astype(np.uint8)[None, :, None], (height, width, 1)))
+
+
+def _iter_payloads(region_count: int, warp_size, blend_size):
+    # The payloads of all the regions share the same content, only generated once.
+    contents = {}
+    if warp_size is not None:
+        contents["geometryWarpFile"] = generate_warp(*warp_size)
+    if blend_size is not None:
+        contents["alphaMap"] = generate_blend(*blend_size)
+        contents["betaMap"] = generate_blend(*blend_size, beta=True)
+
+    for index in range(region_count):
+        paths = _payload_paths(region_id(index))
+        for tag, content in contents.items():
+            yield paths[tag], content
+
+
+def write_synthetic(path: str, buffers: int = 1, regions_per_buffer: int = 6, warp_size=None, blend_size=None):
+    """Write a synthetic document to `path`, see generate_document."""
+    document = generate_document(buffers, regions_per_buffer, warp_size, blend_size)
+    payloads = _iter_payloads(buffers * regions_per_buffer, warp_size, blend_size)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    if is_archive_path(path):
+        with zipfile.ZipFile(path, "w") as archive:
+            archive.writestr(DOCUMENT_NAME, document, zipfile.ZIP_DEFLATED)
+            for name, content in payloads:
+                # Warp grids are stored so they can be memory-mapped, PNG files are already compressed.
+                archive.writestr(name, content, zipfile.ZIP_STORED)
+        return
+
+    with open(path, "wb") as f:
+        f.write(document)
+    directory = os.path.dirname(os.path.abspath(path))
+    for name, content in payloads:
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(content)
+
+
+def parse_size(value: str):
+    width, _, height = value.lower().partition("x")
+    return int(width), int(height or width)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m mf.ov.mpcdi_converter.synthetic",
+                                     description="Write a synthetic MPCDI document.")
+    parser.add_argument("output", help="Output .mpcdi archive or .mpcdi.xml document.")
+    parser.add_argument("--buffers", type=int, default=1, help="Number of buffers.")
+    parser.add_argument("--regions", type=int, default=6, help="Number of regions per buffer.")
+    parser.add_argument("--warp", type=parse_size, default=None, help="Size of the PFM warp grids, e.g. 64x36.")
+    parser.add_argument("--blend", type=parse_size, default=None, help="Size of the PNG blend maps, e.g. 512x288.")
+    args = parser.parse_args(argv)
+
+    write_synthetic(args.output, args.buffers, args.regions, args.warp, args.blend)
+    print(f"Wrote {args.buffers * args.regions} region(s) to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
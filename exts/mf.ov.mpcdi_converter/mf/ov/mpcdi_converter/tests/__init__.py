@@ -0,0 +1,11 @@
+from .test_archive import *  # noqa: F401,F403
+from .test_blend import *  # noqa: F401,F403
+from .test_cache import *  # noqa: F401,F403
+from .test_compute import *  # noqa: F401,F403
+from .test_coverage import *  # noqa: F401,F403
+from .test_document import *  # noqa: F401,F403
+from .test_incremental import *  # noqa: F401,F403
+from .test_native import *  # noqa: F401,F403
+from .test_overlap import *  # noqa: F401,F403
+from .test_sequence import *  # noqa: F401,F403
+from .test_warp import *  # noqa: F401,F403
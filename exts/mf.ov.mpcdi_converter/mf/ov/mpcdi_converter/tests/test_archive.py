@@ -0,0 +1,135 @@
+import mmap
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+
+from ..archive import DOCUMENT_NAME, MPCDIArchive, MPCDIFolder, open_package, read_pfm
+from ..converter import parse_document
+from ..synthetic import generate_blend, generate_document, write_synthetic
+
+try:
+    from omni.kit.test import AsyncTestCase as TestCase
+except ImportError:
+    from unittest import TestCase
+
+
+def _pfm(pixels: np.ndarray, littleEndian: bool, header: str = "{magic}\n{width} {height}\n{scale}\n") -> bytes:
+    # `pixels` is (height, width, channels) top row first, PFM stores the bottom row first.
+    height, width, channels = pixels.shape
+    magic = "PF" if channels == 3 else "Pf"
+    scale = -1.0 if littleEndian else 1.0
+    data = pixels[::-1].astype("<f4" if littleEndian else ">f4").tobytes()
+    return header.format(magic=magic, width=width, height=height, scale=scale).encode("ascii") + data
+
+
+class TestPFM(TestCase):
+    def setUp(self):
+        self.pixels = np.arange(4 * 5 * 3, dtype=np.float32).reshape(4, 5, 3) * 0.25 - 3.0
+
+    def test_byte_orders(self):
+        for littleEndian in (True, False):
+            pixels = read_pfm(_pfm(self.pixels, littleEndian))
+            self.assertEqual(pixels.shape, (4, 5, 3))
+            self.assertEqual(pixels.dtype, np.dtype("<f4" if littleEndian else ">f4"))
+            np.testing.assert_array_equal(pixels, self.pixels)
+            # Top row first.
+            self.assertEqual(pixels[0, 0].tolist(), [-3.0, -2.75, -2.5])
+
+    def test_grayscale_and_header_layouts(self):
+        gray = self.pixels[:, :, :1]
+        for header in ("{magic}\n{width} {height}\n{scale}\n", "{magic} {width} {height} {scale}\n",
+                       "{magic}\n{width}\n{height}\n{scale}\n"):
+            np.testing.assert_array_equal(read_pfm(_pfm(gray, False, header)), gray)
+
+    def test_pixels_are_a_view(self):
+        content = bytearray(_pfm(self.pixels, True))
+        pixels = read_pfm(content)
+        self.assertFalse(pixels.flags.owndata)
+        content[-4:] = np.float32(42.0).tobytes()
+        # The last value of the file is the last pixel of the bottom row, stored first.
+        self.assertEqual(pixels[0, -1, -1], 42.0)
+
+    def test_invalid(self):
+        content = _pfm(self.pixels, True)
+        with self.assertRaises(ValueError):
+            read_pfm(content[:-1])
+        with self.assertRaises(ValueError):
+            read_pfm(b"P6" + content[2:])
+        with self.assertRaises(ValueError):
+            read_pfm(b"PF 5 4")
+
+
+class TestPackages(TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.warp = np.linspace(-1.0, 1.0, 3 * 4 * 3, dtype=np.float32).reshape(3, 4, 3)
+        self.blend = generate_blend(8, 6)
+        document = generate_document(regions_per_buffer=2, warp_size=(4, 3), blend_size=(8, 6))
+        # The second region finds its files in a sub folder, written with Windows separators.
+        document = document.replace(b"<path>Projector_1_", b"<path>maps\\Projector_1_")
+        self.archive_path = os.path.join(self._directory.name, "input.mpcdi")
+        with zipfile.ZipFile(self.archive_path, "w") as archive:
+            archive.writestr(DOCUMENT_NAME, document, zipfile.ZIP_DEFLATED)
+            for prefix in ("", "maps/"):
+                regionId = "Projector_1" if prefix else "Projector_0"
+                # Warp grids are stored, blend maps compressed.
+                archive.writestr(f"{prefix}{regionId}_warp.pfm", _pfm(self.warp, True), zipfile.ZIP_STORED)
+                archive.writestr(f"{prefix}{regionId}_alpha.png", self.blend, zipfile.ZIP_DEFLATED)
+                archive.writestr(f"{prefix}{regionId}_beta.png", self.blend, zipfile.ZIP_DEFLATED)
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def _check_members(self, package):
+        parse_document(package)
+        self.assertEqual(sorted(package.filesets), ["Projector_0", "Projector_1"])
+        for regionId in package.filesets:
+            members = package.region_members(regionId)
+            self.assertEqual(sorted(members), ["alphaMap", "betaMap", "geometryWarpFile"])
+            warp = read_pfm(members["geometryWarpFile"].buffer())
+            np.testing.assert_array_equal(warp, self.warp)
+            self.assertEqual(bytes(members["alphaMap"].buffer()), self.blend)
+            del warp
+            for member in members.values():
+                member.release()
+        # Lookups are relative to the document, whatever the separator.
+        self.assertIs(package.member("./maps/Projector_1_warp.pfm"), package.member("maps\\Projector_1_warp.pfm"))
+        with self.assertRaises(ValueError):
+            package.member("missing.pfm")
+
+    def test_archive(self):
+        with open_package(self.archive_path) as archive:
+            self.assertIsInstance(archive, MPCDIArchive)
+            self._check_members(archive)
+            # Stored members are views of the memory-mapped archive, compressed ones are read.
+            self.assertIsInstance(archive.member("Projector_0_warp.pfm").buffer().obj, mmap.mmap)
+            self.assertNotIsInstance(archive.member("Projector_0_alpha.png").buffer().obj, mmap.mmap)
+
+    def test_archive_in_memory(self):
+        with open(self.archive_path, "rb") as f:
+            content = f.read()
+        with MPCDIArchive(content) as archive:
+            self._check_members(archive)
+
+    def test_archive_without_document(self):
+        path = os.path.join(self._directory.name, "empty.mpcdi")
+        with zipfile.ZipFile(path, "w") as archive:
+            archive.writestr("readme.txt", b"")
+        with self.assertRaises(ValueError):
+            MPCDIArchive(path)
+
+    def test_folder(self):
+        path = os.path.join(self._directory.name, "folder", "input.mpcdi.xml")
+        write_synthetic(path, regions_per_buffer=2, warp_size=(4, 3), blend_size=(8, 6))
+        with open_package(path) as folder:
+            self.assertIsInstance(folder, MPCDIFolder)
+            parse_document(folder)
+            member = folder.member("Projector_1_warp.pfm")
+            self.assertEqual(member.path, os.path.join(os.path.dirname(path), "Projector_1_warp.pfm"))
+            self.assertEqual(read_pfm(member.buffer()).shape, (3, 4, 3))
+            self.assertIsInstance(member.buffer().obj, mmap.mmap)
+            member.release()
+            with self.assertRaises(ValueError):
+                folder.member("missing.pfm")
@@ -0,0 +1,192 @@
+import os
+import struct
+import tempfile
+import zipfile
+import zlib
+from unittest import mock
+
+import numpy as np
+
+from .. import blend
+from ..archive import FileMember, MPCDIArchive
+from ..blend import BlendMapCache, decode_png, encode_png, iter_png_bands, read_png_info, write_blend_map
+from ..synthetic import generate_blend
+
+try:
+    from omni.kit.test import AsyncTestCase as TestCase
+except ImportError:
+    from unittest import TestCase
+
+
+# Channels of the PNG color types, see blend._CHANNELS.
+COLOR_TYPES = {1: 0, 2: 4, 3: 2, 4: 6}
+FILTER_NAMES = ("None", "Sub", "Up", "Average", "Paeth")
+# Signature and IHDR chunk.
+HEADER_SIZE = 8 + 12 + 13
+
+
+def _png_chunk(chunkType: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + chunkType + data + struct.pack(">I", zlib.crc32(chunkType + data))
+
+
+def _filter_row(filterType: int, raw: np.ndarray, prior: np.ndarray, pixelBytes: int) -> np.ndarray:
+    # Encoder side of the PNG filters (PNG specification, section 9), on the raw bytes of a scanline.
+    raw = raw.astype(np.int32)
+    prior = prior.astype(np.int32)
+    left = np.concatenate((np.zeros(pixelBytes, dtype=np.int32), raw[:-pixelBytes]))
+    upperLeft = np.concatenate((np.zeros(pixelBytes, dtype=np.int32), prior[:-pixelBytes]))
+    if filterType == 0:
+        predictor = np.zeros_like(raw)
+    elif filterType == 1:
+        predictor = left
+    elif filterType == 2:
+        predictor = prior
+    elif filterType == 3:
+        predictor = (left + prior) // 2
+    else:
+        estimate = left + prior - upperLeft
+        distances = np.stack((np.abs(estimate - left), np.abs(estimate - prior), np.abs(estimate - upperLeft)))
+        # Ties go to left, then up.
+        predictor = np.choose(np.argmin(distances, axis=0), (left, prior, upperLeft))
+    return ((raw - predictor) % 256).astype(np.uint8)
+
+
+def _encode(pixels: np.ndarray, filterTypes, idatSize: int = 0) -> bytes:
+    # PNG of `pixels` with the filter type of each row, the compressed stream is split in IDAT chunks of `idatSize`.
+    png = encode_png(pixels)
+    info = read_png_info(png)
+    rows = pixels.astype(info.dtype).reshape(info.height, -1).view(np.uint8)
+    prior = np.zeros(info.row_bytes, dtype=np.uint8)
+    scanlines = []
+    for row, filterType in zip(rows, filterTypes):
+        scanlines.append(bytes([filterType]) + _filter_row(filterType, row, prior, info.pixel_bytes).tobytes())
+        prior = row
+    stream = zlib.compress(b"".join(scanlines), 1)
+    idatSize = idatSize or len(stream)
+    chunks = [_png_chunk(b"IDAT", stream[start:start + idatSize]) for start in range(0, len(stream), idatSize)]
+    # Same signature and IHDR as encode_png.
+    return png[:HEADER_SIZE] + b"".join(chunks) + _png_chunk(b"IEND", b"")
+
+
+def _random_pixels(generator: np.random.Generator, height: int, width: int, channels: int, bitDepth: int):
+    dtype = np.uint8 if bitDepth == 8 else np.uint16
+    # Smooth gradients with noise, so that every filter sees small and large differences.
+    ramp = np.add.outer(np.arange(height), np.arange(width))[:, :, None] * np.arange(1, channels + 1)
+    noise = generator.integers(0, 16, size=(height, width, channels))
+    return ((ramp * 7 + noise) % np.iinfo(dtype).max).astype(dtype)
+
+
+def _box_filter(pixels: np.ndarray, factor: int) -> np.ndarray:
+    # Mean of each factor x factor block, partial blocks on the right and bottom edges, brute force.
+    height, width, channels = pixels.shape
+    out = np.empty((-(-height // factor), -(-width // factor), channels), dtype=pixels.dtype)
+    for row in range(out.shape[0]):
+        for column in range(out.shape[1]):
+            block = pixels[row * factor:(row + 1) * factor, column * factor:(column + 1) * factor]
+            out[row, column] = np.rint(block.reshape(-1, channels).astype(np.float64).mean(axis=0))
+    return out
+
+
+class TestPNG(TestCase):
+    def test_filters(self):
+        generator = np.random.default_rng(9)
+        for bitDepth in (8, 16):
+            for channels in (1, 2, 3, 4):
+                pixels = _random_pixels(generator, 13, 29, channels, bitDepth)
+                mixed = generator.integers(0, 5, size=len(pixels)).tolist()
+                for filterTypes, name in [([filterType] * len(pixels), FILTER_NAMES[filterType])
+                                          for filterType in range(5)] + [(mixed, "mixed")]:
+                    message = f"{bitDepth} bits, {channels} channels, {name}"
+                    png = _encode(pixels, filterTypes, idatSize=97)
+                    info = read_png_info(png)
+                    self.assertEqual((info.width, info.height, info.bit_depth, info.color_type),
+                                     (29, 13, bitDepth, COLOR_TYPES[channels]), message)
+                    decoded = decode_png(png)
+                    self.assertEqual(decoded.dtype, pixels.dtype, message)
+                    np.testing.assert_array_equal(decoded, pixels, message)
+                    # Bands unfiltered separately need the last row of the previous band.
+                    np.testing.assert_array_equal(np.concatenate(list(iter_png_bands(png, 4))), pixels, message)
+
+    def test_wavefront(self):
+        # Large enough for the Average and Paeth rows to be unfiltered along anti-diagonals, see blend._unfilter_band.
+        generator = np.random.default_rng(3)
+        mixed = [4, 3, 4, 0, 3, 1, 4, 2] * 8
+        for bitDepth, channels, size, filterTypes in ((8, 3, 128, [3] * 128), (8, 3, 128, [4] * 128),
+                                                      (16, 4, 64, [4, 3] * 32), (16, 4, 64, mixed)):
+            pixels = _random_pixels(generator, size, size, channels, bitDepth)
+            with mock.patch.object(blend, "_unfilter_wavefront", wraps=blend._unfilter_wavefront) as wavefront:
+                decoded = decode_png(_encode(pixels, filterTypes))
+            self.assertEqual(wavefront.call_count, 1)
+            np.testing.assert_array_equal(decoded, pixels, f"{bitDepth} bits, {channels} channels")
+
+    def test_encode_png(self):
+        for dtype in (np.uint8, np.uint16):
+            pixels = _random_pixels(np.random.default_rng(1), 7, 5, 2, 8 * np.dtype(dtype).itemsize)
+            np.testing.assert_array_equal(decode_png(encode_png(pixels)), pixels)
+
+    def test_invalid(self):
+        png = encode_png(np.zeros((4, 4, 1), dtype=np.uint8))
+        with self.assertRaises(ValueError):
+            read_png_info(b"GIF89a" + png[6:])
+        with self.assertRaises(ValueError):
+            decode_png(_encode(np.zeros((4, 4, 1), dtype=np.uint8), [0] * 3))
+
+    def test_downsampling(self):
+        generator = np.random.default_rng(5)
+        for bitDepth, channels in ((8, 1), (16, 4)):
+            pixels = _random_pixels(generator, 31, 47, channels, bitDepth)
+            png = _encode(pixels, generator.integers(0, 5, size=31).tolist())
+            for maxSize, factor in ((47, 1), (24, 2), (16, 3), (5, 10)):
+                decoded = decode_png(png, maxSize)
+                self.assertLessEqual(max(decoded.shape[:2]), maxSize)
+                np.testing.assert_array_equal(decoded, _box_filter(pixels, factor), f"{bitDepth} bits, {maxSize}")
+
+
+class TestWriteBlendMap(TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.maps_directory = os.path.join(self._directory.name, "maps")
+        self.blend = generate_blend(40, 30)
+        self.blend_path = os.path.join(self._directory.name, "alpha.png")
+        with open(self.blend_path, "wb") as f:
+            f.write(self.blend)
+        self.archive_path = os.path.join(self._directory.name, "input.mpcdi")
+        with zipfile.ZipFile(self.archive_path, "w") as archive:
+            archive.writestr("mpcdi.xml", b"<MPCDI/>")
+            archive.writestr("alpha.png", self.blend, zipfile.ZIP_DEFLATED)
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def _read(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def test_small_maps_are_used_in_place(self):
+        member = FileMember(self.blend_path)
+        self.assertEqual(write_blend_map(member, self.maps_directory, "Region_alphaMap", 40), self.blend_path)
+        member.release()
+        self.assertFalse(os.path.exists(self.maps_directory))
+
+        with MPCDIArchive(self.archive_path) as archive:
+            # Archive members cannot be referenced, they are copied as is.
+            texturePath = write_blend_map(archive.member("alpha.png"), self.maps_directory, "Region_alphaMap", 0)
+            self.assertEqual(texturePath, os.path.join(self.maps_directory, "Region_alphaMap.png"))
+            self.assertEqual(self._read(texturePath), self.blend)
+            self.assertIsNone(write_blend_map(archive.member("alpha.png"), "", "Region_alphaMap"))
+
+    def test_large_maps_are_downsampled(self):
+        cache = BlendMapCache()
+        expected = _box_filter(decode_png(self.blend), 3)
+        with MPCDIArchive(self.archive_path) as archive:
+            for name, member in (("Loose", FileMember(self.blend_path)), ("Member", archive.member("alpha.png"))):
+                texturePath = write_blend_map(member, self.maps_directory, name, 16, cache)
+                self.assertEqual(texturePath, os.path.join(self.maps_directory, name + ".png"))
+                np.testing.assert_array_equal(decode_png(self._read(texturePath)), expected, name)
+                member.release()
+        # Decoded maps are cached by member and size.
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+        member = FileMember(self.blend_path)
+        write_blend_map(member, self.maps_directory, "Loose", 16, cache)
+        member.release()
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
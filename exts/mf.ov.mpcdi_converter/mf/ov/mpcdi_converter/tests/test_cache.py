@@ -0,0 +1,135 @@
+import os
+import tempfile
+import time
+
+from pxr import Sdf
+
+from ..archive import open_package
+from ..cache import CACHE_FILE_EXTENSION, ConversionCache, hash_buffer, hash_file
+from ..converter import MPCDIConverterContext, convert_to_layer_cached, parse_batches
+from ..synthetic import write_synthetic
+
+try:
+    from omni.kit.test import AsyncTestCase as TestCase
+except ImportError:
+    from unittest import TestCase
+
+
+ALPHA_MAP_PATH = "/MPCDI/_0/Projector_0/ProjectLight.inputs:texture:file"
+
+
+def _unparsed_batches():
+    raise AssertionError("The document was parsed on a cache hit.")
+    yield
+
+
+class TestCache(TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.input_path = os.path.join(self._directory.name, "input.mpcdi")
+        write_synthetic(self.input_path, regions_per_buffer=2, warp_size=(4, 3), blend_size=(8, 6))
+        self.content_hash = hash_file(self.input_path)
+        self.cache = ConversionCache(os.path.join(self._directory.name, "cache"), version="test")
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def _context(self, folder):
+        # Output location as set by MPCDIConverterHelper._file_context.
+        context = MPCDIConverterContext()
+        context.layer_path = os.path.join(self._directory.name, folder, "input.usdc")
+        return context
+
+    def _convert(self, context, batches=None):
+        layer = Sdf.Layer.CreateAnonymous(".usdc")
+        with open_package(self.input_path) as package:
+            result = convert_to_layer_cached(batches if batches is not None else parse_batches(package), layer,
+                                             self.cache, self.content_hash, context, package)
+        return layer, result
+
+    def _store(self, key, regionCount=1):
+        layer = Sdf.Layer.CreateAnonymous(CACHE_FILE_EXTENSION)
+        layer.customLayerData = {"regions": regionCount}
+        return self.cache.store(key, layer)
+
+    def test_key_stability(self):
+        options = MPCDIConverterContext().options()
+        key = self.cache.make_key(self.content_hash, options)
+        self.assertEqual(key, self.cache.make_key(self.content_hash, dict(reversed(list(options.items())))))
+        self.assertEqual(key, ConversionCache(self.cache.directory, version="test").make_key(self.content_hash,
+                                                                                            options))
+        self.assertNotEqual(key, ConversionCache(self.cache.directory, version="other").make_key(self.content_hash,
+                                                                                                options))
+        self.assertNotEqual(key, self.cache.make_key(hash_buffer(b"other content"), options))
+        with open(self.input_path, "rb") as f:
+            self.assertEqual(hash_buffer(f.read()), self.content_hash)
+
+    def test_lookup_and_store(self):
+        key = self.cache.make_key(self.content_hash, {})
+        self.assertFalse(self.cache.contains(key))
+        self.assertIsNone(self.cache.lookup(key))
+        path = self._store(key, 3)
+        self.assertTrue(self.cache.contains(key))
+        self.assertEqual(self.cache.lookup(key), path)
+        self.assertEqual(Sdf.Layer.OpenAsAnonymous(path).customLayerData, {"regions": 3})
+        # contains does not count.
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 1, 1))
+        self.assertEqual(stats["size_bytes"], os.path.getsize(path))
+        self.assertEqual([name for name in os.listdir(self.cache.directory) if ".tmp" in name], [])
+
+    def test_least_recently_used_are_evicted(self):
+        keys = [self.cache.make_key(str(index), {}) for index in range(3)]
+        paths = [self._store(key) for key in keys]
+        for index, path in enumerate(paths):
+            os.utime(path, (time.time() - 100 + index, time.time() - 100 + index))
+        # Using the oldest entry makes the second one the least recently used.
+        self.cache.lookup(keys[0])
+        os.makedirs(self.cache.maps_directory(keys[1]))
+        self.cache.max_bytes = sum(os.path.getsize(path) for path in paths) - 1
+
+        self.cache.evict()
+        self.assertEqual([self.cache.contains(key) for key in keys], [True, False, True])
+        self.assertFalse(os.path.exists(self.cache.maps_directory(keys[1])))
+        self.assertEqual(self.cache.evictions, 1)
+
+        self.cache.max_bytes = 0
+        self._store(self.cache.make_key("3", {}))
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    def test_second_conversion_hits(self):
+        context = self._context("a")
+        _, first = self._convert(context)
+        _, second = self._convert(context, _unparsed_batches())
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        self.assertEqual((second.region_count, second.has_lens_shifting), (first.region_count,
+                                                                            first.has_lens_shifting))
+
+    def test_other_options_miss(self):
+        self._convert(self._context("a"))
+        for name, value in (("warp_decimation", 2), ("blend_map_max_size", 4), ("instancing", True)):
+            context = self._context("a")
+            setattr(context, name, value)
+            misses = self.cache.misses
+            self._convert(context)
+            self.assertEqual(self.cache.misses, misses + 1, name)
+        self.assertEqual(self.cache.hits, 0)
+        self.assertEqual(self.cache.stats()["entries"], 4)
+
+    def test_second_import_to_another_folder_parses_nothing(self):
+        first, _ = self._convert(self._context("convertedAssets/input_101500"))
+        # Unsaved stages import to a new timestamped folder each time.
+        context = self._context("convertedAssets/input_101512")
+        second, result = self._convert(context, _unparsed_batches())
+
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        self.assertEqual(result.region_count, 2)
+        alphaMap = second.GetAttributeAtPath(ALPHA_MAP_PATH).default.path
+        self.assertEqual(alphaMap, "./input_maps/Projector_0_alphaMap.png")
+        # The textures are copied next to each written layer, they do not depend on the cache entry.
+        texturePath = os.path.join(os.path.dirname(context.layer_path), alphaMap)
+        self.assertTrue(os.path.isfile(texturePath))
+        self.cache.clear()
+        self.assertTrue(os.path.isfile(texturePath))
+        self.assertEqual(first.GetAttributeAtPath(ALPHA_MAP_PATH).default.path, alphaMap)
@@ -0,0 +1,107 @@
+import os
+import random
+
+import numpy as np
+from pxr import Sdf
+
+from ..compute import compute_projector, compute_projectors, gather_regions
+from ..converter import convert_to_layer
+from ..parser import COORDINATE_FRAME_TAGS, MPCDIRegion, iter_regions
+
+try:
+    from omni.kit.test import AsyncTestCase as TestCase
+except ImportError:
+    # Outside of Kit the tests run with `python -m unittest mf.ov.mpcdi_converter.tests`.
+    from unittest import TestCase
+
+
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), "..", "sample", "Cube-mapping.mpcdi.xml")
+
+# ProjectorParameters field and compute_projector key of the values authored as float attributes.
+FIELDS = (
+    ("horizontal_aperture", "horizontalAperture"),
+    ("horizontal_aperture_offset", "horizontalApertureOffset"),
+    ("vertical_aperture", "verticalAperture"),
+    ("vertical_aperture_offset", "verticalApertureOffset"),
+    ("yaw", "yaw"),
+    ("pitch", "pitch"),
+    ("roll", "roll"),
+    ("light_width", "lightWidth"),
+    ("light_height", "lightHeight"),
+)
+
+# Values authored for the sample before the conversion was vectorized: region, translate, rotateY, rotateX.
+# Every region has 8 x 4.4999995 apertures without offsets and a 0.79999995 x 0.44999996 light.
+SAMPLE_CAMERAS = (
+    ("Rear", (0.0, 50.0, 300.0), 0.0, 0.0),
+    ("Front", (0.0, 50.0, -300.0), 180.0, 0.0),
+    ("Left", (300.0, 50.0, 0.0), 90.000008, 0.0),
+    ("Right", (-300.0, 50.0, 0.0), -90.000008, 0.0),
+    ("Top", (0.0, 300.0, 0.0), 180.0, -90.0),
+    ("Bottom", (0.0, -300.0, 0.0), 180.0, 90.0),
+)
+
+
+def _random_region(generator: random.Random, index: int) -> MPCDIRegion:
+    right = generator.uniform(-80.0, 80.0)
+    up = generator.uniform(-80.0, 80.0)
+    frustum = {
+        "yaw": generator.uniform(-180.0, 180.0),
+        "pitch": generator.uniform(-90.0, 90.0),
+        "roll": generator.uniform(-180.0, 180.0),
+        "rightAngle": right,
+        "leftAngle": generator.choice((-right, generator.uniform(-80.0, right - 1.0))),
+        "upAngle": up,
+        "downAngle": generator.choice((-up, generator.uniform(-80.0, up - 1.0))),
+    }
+    coordinateFrame = {tag: generator.uniform(-1.0, 1.0) for tag in COORDINATE_FRAME_TAGS}
+    return MPCDIRegion("0", f"Region_{index}", 1920, 1080, frustum, coordinateFrame)
+
+
+class TestCompute(TestCase):
+    def _assert_same_projectors(self, regions):
+        parameters = compute_projectors(*gather_regions(regions))
+        self.assertEqual(parameters.count, len(regions))
+        for index, region in enumerate(regions):
+            expected = compute_projector(region)
+            # Both are stored as float attributes.
+            for field, key in FIELDS:
+                self.assertEqual(np.float32(getattr(parameters, field)[index]), np.float32(expected[key]),
+                                 f"{field} of {region.region_id}")
+            self.assertEqual(parameters.translate[index].tolist(), list(expected["translate"]),
+                             f"translate of {region.region_id}")
+            self.assertEqual(bool(parameters.lens_shifting[index]), expected["lensShifting"],
+                             f"lens shifting of {region.region_id}")
+
+    def test_sample_matches_scalar_reference(self):
+        regions = list(iter_regions(SAMPLE_PATH))
+        self.assertEqual(len(regions), len(SAMPLE_CAMERAS))
+        self._assert_same_projectors(regions)
+
+    def test_random_regions_match_scalar_reference(self):
+        generator = random.Random(4)
+        self._assert_same_projectors([_random_region(generator, index) for index in range(2000)])
+
+    def test_sample_conversion(self):
+        layer = Sdf.Layer.CreateAnonymous(".usda")
+        result = convert_to_layer(SAMPLE_PATH, layer)
+        self.assertEqual(result.region_count, len(SAMPLE_CAMERAS))
+
+        def value(path):
+            return layer.GetAttributeAtPath(path).default
+
+        for region, translate, rotateY, rotateX in SAMPLE_CAMERAS:
+            cameraPath = f"/MPCDI/_0/{region}"
+            self.assertEqual(tuple(value(cameraPath + ".xformOp:translate")), translate, region)
+            self.assertAlmostEqual(value(cameraPath + ".xformOp:rotateY"), rotateY, places=4, msg=region)
+            self.assertEqual(value(cameraPath + ".xformOp:rotateX"), rotateX, region)
+            self.assertEqual(value(cameraPath + ".xformOp:rotateZ"), 0.0, region)
+            self.assertEqual(value(cameraPath + ".focalLength"), 10.0, region)
+            self.assertEqual(np.float32(value(cameraPath + ".horizontalAperture")), np.float32(8.0), region)
+            self.assertEqual(np.float32(value(cameraPath + ".verticalAperture")), np.float32(4.4999995), region)
+            self.assertEqual(value(cameraPath + ".horizontalApertureOffset"), 0.0, region)
+            self.assertEqual(value(cameraPath + ".verticalApertureOffset"), 0.0, region)
+            self.assertEqual(np.float32(value(cameraPath + "/ProjectLight.inputs:width")), np.float32(0.79999995),
+                             region)
+            self.assertEqual(np.float32(value(cameraPath + "/ProjectLight.inputs:height")), np.float32(0.44999996),
+                             region)
@@ -0,0 +1,140 @@
+import numpy as np
+from pxr import Gf, Sdf, Usd, UsdGeom
+
+from ..coverage import HIT_COUNT_PRIMVAR, TriangleBVH, analyze_coverage, gather_meshes, projector_rays
+from ..document import MPCDIDocument
+
+try:
+    from omni.kit.test import AsyncTestCase as TestCase
+except ImportError:
+    from unittest import TestCase
+
+
+# Right is X, up is Y and forward is Z, projectors at the origin.
+FRAME = (0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0)
+# Half size of the box venue, its sides are split in 2 x 2 quads.
+HALF_SIZE = 300.0
+BOX_PATH = "/Venue/Box"
+
+
+def _brute_force(triangles: np.ndarray, origins: np.ndarray, directions: np.ndarray):
+    # Moller-Trumbore of every ray against every triangle, nearest distance and triangle, inf and -1 on a miss.
+    v0 = triangles[:, 0]
+    e1 = (triangles[:, 1] - triangles[:, 0]).astype(np.float64)
+    e2 = (triangles[:, 2] - triangles[:, 0]).astype(np.float64)
+    distances = np.full(len(origins), np.inf)
+    hits = np.full(len(origins), -1, dtype=np.int64)
+    for ray, (origin, direction) in enumerate(zip(origins, directions)):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            p = np.cross(direction, e2)
+            determinant = (e1 * p).sum(axis=1)
+            s = origin - v0
+            u = (s * p).sum(axis=1) / determinant
+            q = np.cross(s, e1)
+            v = (q @ direction) / determinant
+            t = (e2 * q).sum(axis=1) / determinant
+        t = np.where((np.abs(determinant) > 1e-9) & (u >= 0.0) & (v >= 0.0) & (u + v <= 1.0) & (t > 1e-9), t, np.inf)
+        if np.isfinite(t).any():
+            hits[ray] = np.argmin(t)
+            distances[ray] = t[hits[ray]]
+    return distances, hits
+
+
+def _box_sides():
+    # (axis, sign, cell along the first other axis, cell along the second), in face order.
+    return [(axis, sign, first, second) for axis in range(3) for sign in (-1, 1) for first in (0, 1) for second in (0, 1)]
+
+
+def _author_box(stage: Usd.Stage):
+    # Closed box centered on the origin, authored off center under a translated parent.
+    offset = np.array([0.0, 0.0, -1000.0])
+    points = []
+    for axis, sign, first, second in _box_sides():
+        a, b = (axis + 1) % 3, (axis + 2) % 3
+        for cornerA, cornerB in ((0, 0), (1, 0), (1, 1), (0, 1)):
+            point = np.zeros(3)
+            point[axis] = sign * HALF_SIZE
+            point[a] = (first + cornerA - 1) * HALF_SIZE
+            point[b] = (second + cornerB - 1) * HALF_SIZE
+            points.append(point + offset)
+    UsdGeom.Xform.Define(stage, "/Venue").AddTranslateOp().Set(Gf.Vec3d(*-offset))
+    mesh = UsdGeom.Mesh.Define(stage, BOX_PATH)
+    mesh.CreatePointsAttr([Gf.Vec3f(*point) for point in points])
+    mesh.CreateFaceVertexCountsAttr([4] * (len(points) // 4))
+    mesh.CreateFaceVertexIndicesAttr(list(range(len(points))))
+
+
+def _box_face(direction: np.ndarray) -> int:
+    # Face of the box hit by a ray from its center.
+    axis = int(np.argmax(np.abs(direction)))
+    point = direction * HALF_SIZE / abs(direction[axis])
+    a, b = (axis + 1) % 3, (axis + 2) % 3
+    return _box_sides().index((axis, 1 if direction[axis] > 0 else -1, int(point[a] > 0), int(point[b] > 0)))
+
+
+class TestTriangleBVH(TestCase):
+    def test_against_brute_force(self):
+        generator = np.random.default_rng(23)
+        for triangleCount, leafSize in ((203, 1), (203, 3), (203, 8), (37, 5), (5, 8), (64, 8)):
+            message = f"{triangleCount} triangles, {leafSize} per leaf"
+            centers = generator.uniform(0.0, 1.0, size=(triangleCount, 1, 3))
+            triangles = (centers + generator.uniform(-0.1, 0.1, size=(triangleCount, 3, 3))).astype(np.float32)
+            bvh = TriangleBVH(triangles, leafSize)
+            self.assertEqual(len(bvh), triangleCount)
+
+            # Half of the rays aim at a triangle, the others go anywhere.
+            origins = generator.uniform(-1.0, 2.0, size=(400, 3))
+            targets = np.concatenate((triangles[generator.integers(0, triangleCount, 200)].mean(axis=1),
+                                      generator.uniform(-1.0, 2.0, size=(200, 3))))
+            directions = targets - origins
+            distances, hits = bvh.intersect(origins, directions)
+            expectedDistances, expectedHits = _brute_force(triangles, origins, directions)
+            self.assertGreater((expectedHits >= 0).sum(), 200, message)
+            np.testing.assert_array_equal(hits, expectedHits, message)
+            np.testing.assert_allclose(distances, expectedDistances, rtol=1e-9, err_msg=message)
+
+    def test_empty(self):
+        bvh = TriangleBVH(np.empty((0, 3, 3), dtype=np.float32))
+        distances, hits = bvh.intersect(np.zeros((2, 3)), np.ones((2, 3)))
+        self.assertEqual(hits.tolist(), [-1, -1])
+        self.assertTrue(np.isinf(distances).all())
+
+
+class TestCoverage(TestCase):
+    def setUp(self):
+        self.stage = Usd.Stage.CreateInMemory()
+        _author_box(self.stage)
+        # Asymmetric frustums, the first one facing forward, the second one turned and tilted, so that rays spread
+        # over several sides of the box without grazing its edges.
+        frustums = [(0.0, 0.0, 0.0, 50.0, -40.0, 35.0, -30.0), (70.0, 20.0, 0.0, 55.0, -35.0, 40.0, -25.0)]
+        self.document = MPCDIDocument(["0"], ["Front", "Turned"], [0, 0], [(1920, 1080), (1024, 768)], frustums,
+                                      [FRAME, FRAME])
+
+    def test_box_face_hits(self):
+        density = 16
+        report = analyze_coverage(self.document, self.stage, density)
+        self.assertEqual(report.mesh_paths, [BOX_PATH])
+        self.assertEqual(report.triangle_count, 48)
+
+        expected = np.zeros(24, dtype=np.int64)
+        for row, projector in enumerate(report.projectors):
+            origin, directions = projector_rays(self.document, row, density)
+            np.testing.assert_allclose(origin, 0.0, atol=1e-9)
+            # The box is closed around the projectors, every ray hits it.
+            self.assertEqual((projector.rays, projector.hits, projector.coverage), (len(directions),) * 2 + (1.0,))
+            self.assertEqual(projector.meshes, {BOX_PATH: len(directions)})
+            expected += np.bincount([_box_face(direction) for direction in directions], minlength=24)
+        np.testing.assert_array_equal(report.face_hits, expected)
+        self.assertGreater((expected > 0).sum(), 4)
+
+        layer = Sdf.Layer.CreateAnonymous(".usda")
+        report.author_hit_counts(layer)
+        attribute = layer.GetAttributeAtPath(Sdf.Path(BOX_PATH).AppendProperty(HIT_COUNT_PRIMVAR))
+        self.assertEqual(list(attribute.default), expected.tolist())
+        self.assertEqual(attribute.GetInfo("interpolation"), UsdGeom.Tokens.uniform)
+
+    def test_hidden_meshes_are_ignored(self):
+        UsdGeom.Imageable(self.stage.GetPrimAtPath(BOX_PATH)).MakeInvisible()
+        self.assertEqual(gather_meshes(self.stage).paths, [])
+        report = analyze_coverage(self.document, self.stage, 8)
+        self.assertEqual([projector.hits for projector in report.projectors], [0, 0])
@@ -0,0 +1,82 @@
+import io
+import os
+import tempfile
+
+import numpy as np
+
+from ..archive import open_package
+from ..compute import compute_projector
+from ..converter import parse_document
+from ..document import MPCDIDocument
+from ..synthetic import write_synthetic
+
+try:
+    from omni.kit.test import AsyncTestCase as TestCase
+except ImportError:
+    from unittest import TestCase
+
+
+COLUMNS = ("buffer_ids", "region_ids", "buffer_indices", "resolutions", "frustums", "coordinate_frames")
+
+
+class TestDocument(TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        path = os.path.join(self._directory.name, "input.mpcdi.xml")
+        # Projectors every 25 units along X, at a height of 0, 50 and 100 per buffer, with a warp and blend maps each.
+        write_synthetic(path, buffers=3, regions_per_buffer=7, warp_size=(4, 3), blend_size=(8, 6))
+        with open_package(path) as package:
+            self.document = parse_document(package)
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_save_and_load(self):
+        self.assertEqual(len(self.document.filesets), 21)
+        for target in (os.path.join(self._directory.name, "document.npz"), io.BytesIO()):
+            self.document.save(target)
+            if isinstance(target, io.BytesIO):
+                target.seek(0)
+            loaded = MPCDIDocument.load(target)
+
+            for name in COLUMNS:
+                expected = getattr(self.document, name)
+                actual = getattr(loaded, name)
+                self.assertEqual(actual.dtype, expected.dtype, name)
+                np.testing.assert_array_equal(actual, expected, name)
+            self.assertEqual(list(loaded.region_ids), [f"Projector_{index}" for index in range(21)])
+            self.assertEqual(sorted(loaded.filesets), sorted(self.document.filesets))
+            for regionId, fileset in self.document.filesets.items():
+                self.assertEqual(loaded.filesets[regionId].region_id, regionId)
+                self.assertEqual(loaded.filesets[regionId].files, fileset.files)
+            self.assertEqual(loaded.filesets["Projector_4"].path("alphaMap"), "Projector_4_alpha.png")
+
+    def test_load_rejects_other_versions(self):
+        buffer = io.BytesIO()
+        self.document.save(buffer)
+        buffer.seek(0)
+        with np.load(buffer) as data:
+            arrays = dict(data)
+        arrays["version"] = np.int32(0)
+        buffer = io.BytesIO()
+        np.savez(buffer, **arrays)
+        buffer.seek(0)
+        with self.assertRaises(ValueError):
+            MPCDIDocument.load(buffer)
+
+    def test_regions_in_bounds(self):
+        positions = [compute_projector(region)["translate"] for region in self.document]
+        # Bounds are inclusive, the first two boxes have projectors on their faces.
+        for minimum, maximum in (((0.0, -1.0, 299.0), (100.0, 1.0, 301.0)),
+                                 ((150.0, 40.0, 300.0), (250.0, 100.0, 300.0)),
+                                 ((-1e6, -1e6, -1e6), (1e6, 1e6, 1e6)),
+                                 ((100.0, 100.0, 100.0), (200.0, 200.0, 200.0))):
+            expected = [row for row, position in enumerate(positions)
+                        if all(low <= value <= high for low, value, high in zip(minimum, position, maximum))]
+            self.assertEqual(self.document.regions_in_bounds(minimum, maximum).tolist(), expected,
+                             f"{minimum} {maximum}")
+
+    def test_buffer_regions(self):
+        for bufferId in ("0", "1", "2", "missing"):
+            expected = [row for row, region in enumerate(self.document) if region.buffer_id == bufferId]
+            self.assertEqual(self.document.buffer_regions(bufferId).tolist(), expected, bufferId)
@@ -0,0 +1,85 @@
+import os
+import re
+import tempfile
+
+from pxr import Sdf
+
+from ..archive import open_package
+from ..converter import MPCDIChangeReport, MPCDIConverterContext, convert_to_layer, copy_mpcdi_hierarchy, \
+    write_buffer_payloads
+from ..synthetic import write_synthetic
+
+try:
+    from omni.kit.test import AsyncTestCase as TestCase
+except ImportError:
+    from unittest import TestCase
+
+
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), "..", "sample", "Cube-mapping.mpcdi.xml")
+SAMPLE_REGIONS = ["Rear", "Front", "Left", "Right", "Top", "Bottom"]
+
+
+class TestIncremental(TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        with open(SAMPLE_PATH) as f:
+            sample = f.read()
+        # Turn the third region, Left.
+        parts = sample.split("<yaw>")
+        parts[3] = "12.5" + re.sub(r"^[^<]*", "", parts[3])
+        self.changed_path = os.path.join(self._directory.name, "changed.mpcdi.xml")
+        with open(self.changed_path, "w") as f:
+            f.write("<yaw>".join(parts))
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def _convert(self, path, layer=None, instancing=False):
+        context = MPCDIConverterContext()
+        context.incremental = True
+        context.instancing = instancing
+        layer = layer if layer is not None else Sdf.Layer.CreateAnonymous(".usda")
+        return layer, convert_to_layer(path, layer, context)
+
+    def test_changed_region_is_authored_in_place(self):
+        for instancing in (False, True):
+            layer, _ = self._convert(SAMPLE_PATH, instancing=instancing)
+            _, result = self._convert(self.changed_path, layer, instancing)
+            fresh, _ = self._convert(self.changed_path, instancing=instancing)
+
+            self.assertEqual(result.changes.changed, ["/MPCDI/_0/Left"])
+            self.assertEqual(len(result.changes.unchanged), len(SAMPLE_REGIONS) - 1)
+            self.assertEqual(list(layer.GetPrimAtPath("/MPCDI/_0").nameChildren.keys()), SAMPLE_REGIONS)
+            self.assertEqual(layer.ExportToString(), fresh.ExportToString())
+
+    def test_copy_keeps_order(self):
+        for instancing in (False, True):
+            source, _ = self._convert(SAMPLE_PATH, instancing=instancing)
+            fresh, _ = self._convert(self.changed_path, instancing=instancing)
+            layer = Sdf.Layer.CreateAnonymous(".usda")
+            copy_mpcdi_hierarchy(source, layer)
+            changes = MPCDIChangeReport()
+            copy_mpcdi_hierarchy(fresh, layer, changes)
+
+            self.assertEqual(changes.changed, ["/MPCDI/_0/Left"])
+            self.assertEqual(layer.ExportToString(), fresh.ExportToString())
+
+    def test_buffer_payloads_keep_source_layer(self):
+        inputPath = os.path.join(self._directory.name, "input.mpcdi")
+        write_synthetic(inputPath, regions_per_buffer=2, blend_size=(8, 6))
+        outputPath = os.path.join(self._directory.name, "input.usda")
+        context = MPCDIConverterContext()
+        context.layer_path = outputPath
+        source = Sdf.Layer.CreateAnonymous(".usda")
+        with open_package(inputPath) as package:
+            convert_to_layer(package, source, context)
+        alphaMap = "/MPCDI/_0/Projector_1/ProjectLight.inputs:texture:file"
+        exported = source.ExportToString()
+
+        for changes in (None, MPCDIChangeReport(), MPCDIChangeReport()):
+            paths = write_buffer_payloads(source, Sdf.Layer.CreateAnonymous(".usda"), outputPath, changes)
+            self.assertEqual(source.ExportToString(), exported)
+            bufferLayer = Sdf.Layer.FindOrOpen(paths[0])
+            bufferLayer.Reload()
+            self.assertEqual(bufferLayer.GetAttributeAtPath(alphaMap).default.path,
+                             "../input_maps/Projector_1_alphaMap.png")
@@ -0,0 +1,64 @@
+import math
+import os
+import unittest
+
+from pxr import Gf, Sdf
+
+from ..converter import MPCDI_ROOT_PATH, convert_to_layer, native_format_available
+
+try:
+    from omni.kit.test import AsyncTestCase as TestCase
+except ImportError:
+    from unittest import TestCase
+
+
+SAMPLE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "sample", "Cube-mapping.mpcdi.xml"))
+# The plugin computes in single precision where the Python converter rounds double precision results.
+RELATIVE_TOLERANCE = 1e-5
+
+
+def _values(value):
+    if isinstance(value, (Gf.Vec3d, Gf.Vec3f)):
+        return list(value)
+    return [value]
+
+
+def _describe(layer: Sdf.Layer) -> dict:
+    # Type, specifier and attribute values of the prims under /MPCDI, the customData hashes are left out.
+    prims = {}
+
+    def visit(primSpec):
+        attributes = {attribute.name: (str(attribute.typeName), attribute.default) for attribute in primSpec.attributes}
+        prims[primSpec.path.pathString] = (primSpec.typeName, primSpec.specifier, attributes,
+                                           list(primSpec.nameChildren.keys()))
+        for child in primSpec.nameChildren:
+            visit(child)
+
+    visit(layer.GetPrimAtPath(MPCDI_ROOT_PATH))
+    return prims
+
+
+@unittest.skipUnless(native_format_available(), "The MpcdiFileFormat plugin is not built.")
+class TestNative(TestCase):
+    def test_same_hierarchy_as_python_converter(self):
+        native = Sdf.Layer.FindOrOpen(SAMPLE_PATH)
+        self.assertIsNotNone(native)
+        converted = Sdf.Layer.CreateAnonymous(".usda")
+        convert_to_layer(SAMPLE_PATH, converted)
+
+        nativePrims = _describe(native)
+        convertedPrims = _describe(converted)
+        self.assertEqual(list(nativePrims), list(convertedPrims))
+        for path, (typeName, specifier, attributes, children) in convertedPrims.items():
+            nativeTypeName, nativeSpecifier, nativeAttributes, nativeChildren = nativePrims[path]
+            self.assertEqual((nativeTypeName, nativeSpecifier, nativeChildren), (typeName, specifier, children), path)
+            self.assertEqual(sorted(nativeAttributes), sorted(attributes), path)
+            for name, (valueType, value) in attributes.items():
+                nativeValueType, nativeValue = nativeAttributes[name]
+                self.assertEqual(nativeValueType, valueType, f"{path}.{name}")
+                if isinstance(value, (float, Gf.Vec3d, Gf.Vec3f)):
+                    for expected, actual in zip(_values(value), _values(nativeValue)):
+                        self.assertTrue(math.isclose(actual, expected, rel_tol=RELATIVE_TOLERANCE, abs_tol=1e-6),
+                                        f"{path}.{name}: {nativeValue} != {value}")
+                else:
+                    self.assertEqual(nativeValue, value, f"{path}.{name}")
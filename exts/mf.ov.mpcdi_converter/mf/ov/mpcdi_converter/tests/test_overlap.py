@@ -0,0 +1,80 @@
+from unittest import mock
+
+import numpy as np
+from pxr import Sdf
+
+from .. import overlap
+from ..document import MPCDIDocument
+from ..overlap import OVERLAPS_RELATIONSHIP, _narrow_phase, _separating_axes, find_overlaps, frustum_vertices
+
+try:
+    from omni.kit.test import AsyncTestCase as TestCase
+except ImportError:
+    from unittest import TestCase
+
+
+# Right is X, up is Y and forward is Z.
+FRAME = (0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0)
+THROW_DISTANCE = 1000.0
+
+
+def _random_document(generator: np.random.Generator, count: int) -> MPCDIDocument:
+    # Projectors within 20 meters of each other, turned every way, with frustums of 20 to 80 degrees.
+    frames = np.tile(FRAME, (count, 1))
+    frames[:, :3] = generator.uniform(-10.0, 10.0, size=(count, 3))
+    frustums = np.zeros((count, 7))
+    frustums[:, :3] = generator.uniform(-180.0, 180.0, size=(count, 3))
+    frustums[:, 3] = generator.uniform(10.0, 40.0, size=count)
+    frustums[:, 4] = -generator.uniform(10.0, 40.0, size=count)
+    frustums[:, 5] = generator.uniform(10.0, 40.0, size=count)
+    frustums[:, 6] = -generator.uniform(10.0, 40.0, size=count)
+    regionIds = [f"Projector_{row}" for row in range(count)]
+    return MPCDIDocument(["0"], regionIds, [0] * count, [(1920, 1080)] * count, frustums, frames)
+
+
+def _all_pairs(document: MPCDIDocument, throwDistance: float):
+    # Separating axis test of every pair of frustums, without the broad phase.
+    vertices = frustum_vertices(document, throwDistance)
+    faces, edges = _separating_axes(vertices)
+    first, second = np.triu_indices(len(document), 1)
+    overlap, depth = _narrow_phase(vertices, faces, edges, first, second, -1e-6 * throwDistance)
+    return np.stack((first[overlap], second[overlap]), axis=1), depth[overlap]
+
+
+class TestOverlap(TestCase):
+    def test_against_all_pairs(self):
+        generator = np.random.default_rng(24)
+        for count, pairChunk in ((2, overlap.PAIR_CHUNK), (90, overlap.PAIR_CHUNK), (90, 7), (250, 64)):
+            document = _random_document(generator, count)
+            expectedPairs, expectedDepths = _all_pairs(document, THROW_DISTANCE)
+            with mock.patch.object(overlap, "PAIR_CHUNK", pairChunk):
+                graph = find_overlaps(document, THROW_DISTANCE)
+            message = f"{count} regions, chunks of {pairChunk}"
+            # Pairs are sorted and reported once.
+            np.testing.assert_array_equal(graph.pairs, expectedPairs.reshape(-1, 2), message)
+            np.testing.assert_allclose(graph.depths, expectedDepths, err_msg=message)
+            self.assertLessEqual(len(graph), graph.candidates, message)
+            if count > 2:
+                self.assertGreater(len(graph), count // 2, message)
+                # The broad phase prunes most of the pairs.
+                self.assertLess(graph.candidates, count * (count - 1) // 2, message)
+
+    def test_neighbors(self):
+        document = _random_document(np.random.default_rng(7), 40)
+        graph = find_overlaps(document, THROW_DISTANCE)
+        for row in range(len(document)):
+            expected = sorted({int(b) for a, b in graph.pairs if a == row} | {int(a) for a, b in graph.pairs if b == row})
+            self.assertEqual(graph.neighbors(row).tolist(), expected, row)
+
+        layer = Sdf.Layer.CreateAnonymous(".usda")
+        graph.author_relationships(layer)
+        a, b = graph.pairs[0]
+        relationship = layer.GetRelationshipAtPath(f"{graph.camera_path(a)}.{OVERLAPS_RELATIONSHIP}")
+        self.assertIn(Sdf.Path(graph.camera_path(b)), relationship.targetPathList.explicitItems)
+
+    def test_fewer_than_two_regions(self):
+        for count in (0, 1):
+            graph = find_overlaps(_random_document(np.random.default_rng(1), count), THROW_DISTANCE)
+            self.assertEqual((len(graph), graph.pairs.shape, graph.depths.shape, graph.candidates),
+                             (0, (0, 2), (0,), 0))
+            self.assertEqual(graph.to_dict()["overlaps"], [])
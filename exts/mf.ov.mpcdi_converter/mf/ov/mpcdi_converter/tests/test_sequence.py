@@ -0,0 +1,92 @@
+from pxr import Gf, Sdf
+
+from ..document import MPCDIDocument
+from ..sequence import ANIMATED_ATTRIBUTES, author_sequence
+
+try:
+    from omni.kit.test import AsyncTestCase as TestCase
+except ImportError:
+    from unittest import TestCase
+
+
+TIMES = [10.0, 11.0, 12.0, 13.0, 14.0, 15.0]
+# Right is X, up is Y and forward is Z, a projector at posx lands at 100 posx on the X axis.
+FRAME = (0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0)
+# posx and frustum yaw of each region in each pass, None when the region is missing from the pass.
+PASSES = {
+    # Moves once between the third and fourth passes.
+    "Moving": [(0.0, 0.0), (0.0, 0.0), (0.0, 0.0), (1.0, 0.0), (1.0, 0.0), (1.0, 0.0)],
+    # Missing from the third pass, turns in the fifth.
+    "Absent": [(3.0, 5.0), (3.0, 5.0), None, (3.0, 5.0), (3.0, 7.0), (3.0, 7.0)],
+    "Static": [(6.0, 0.0)] * 6,
+    # Only in the last two passes.
+    "Late": [None, None, None, None, (9.0, 0.0), (9.0, 0.0)],
+}
+
+
+def _document(passIndex: int) -> MPCDIDocument:
+    regionIds = [regionId for regionId, values in PASSES.items() if values[passIndex] is not None]
+    frustums = [(PASSES[regionId][passIndex][1], 0.0, 0.0, 20.0, -20.0, 10.0, -10.0) for regionId in regionIds]
+    frames = [(PASSES[regionId][passIndex][0],) + FRAME[1:] for regionId in regionIds]
+    return MPCDIDocument(["0"], regionIds, [0] * len(regionIds), [(1920, 1080)] * len(regionIds), frustums, frames)
+
+
+class TestSequence(TestCase):
+    def setUp(self):
+        self.documents = [_document(passIndex) for passIndex in range(len(TIMES))]
+        self.layer = Sdf.Layer.CreateAnonymous(".usda")
+        self.result = author_sequence(self.documents, self.layer, TIMES)
+
+    def _samples(self, regionId, name, relativePath=""):
+        path = Sdf.Path(f"/MPCDI/_0/{regionId}{relativePath}").AppendProperty(name)
+        return [(time, self.layer.QueryTimeSample(path, time)) for time in self.layer.ListTimeSamplesForPath(path)]
+
+    def _yaw(self, regionId, passIndex):
+        document = self.documents[passIndex]
+        row = document.region_ids.tolist().index(regionId)
+        return float(document.compute().yaw[row])
+
+    def test_hierarchy(self):
+        cameras = self.layer.GetPrimAtPath("/MPCDI/_0").nameChildren
+        # Regions in order of first appearance, with the values of their first pass as defaults.
+        self.assertEqual(list(cameras.keys()), ["Moving", "Absent", "Static", "Late"])
+        self.assertEqual(self.layer.GetAttributeAtPath("/MPCDI/_0/Late.xformOp:translate").default,
+                         Gf.Vec3d(900.0, 0.0, 0.0))
+        self.assertEqual((self.layer.startTimeCode, self.layer.endTimeCode), (10.0, 15.0))
+        self.assertEqual(self.result.passes, 6)
+        self.assertEqual(self.result.conversion.region_count, 4)
+
+    def test_moving_region_is_thinned(self):
+        # The samples equal to both their neighbours are dropped, the value holds from 12 and changes at 13.
+        self.assertEqual(self._samples("Moving", "xformOp:translate"),
+                         [(10.0, Gf.Vec3d(0.0, 0.0, 0.0)), (12.0, Gf.Vec3d(0.0, 0.0, 0.0)),
+                          (13.0, Gf.Vec3d(100.0, 0.0, 0.0))])
+        for relativePath, name, _, _ in ANIMATED_ATTRIBUTES[1:]:
+            self.assertEqual(self._samples("Moving", name, relativePath), [], name)
+
+    def test_absent_region_is_hidden(self):
+        self.assertEqual(self._samples("Absent", "visibility"),
+                         [(10.0, "inherited"), (12.0, "invisible"), (13.0, "inherited")])
+        # The missing pass is skipped, 11 and 13 are compared with each other.
+        self.assertEqual(self._samples("Absent", "xformOp:rotateY"),
+                         [(10.0, self._yaw("Absent", 0)), (13.0, self._yaw("Absent", 3)),
+                          (14.0, self._yaw("Absent", 4))])
+        self.assertNotEqual(self._yaw("Absent", 3), self._yaw("Absent", 4))
+        self.assertEqual(self._samples("Absent", "xformOp:translate"), [])
+
+    def test_static_and_late_regions(self):
+        for relativePath, name, _, _ in ANIMATED_ATTRIBUTES:
+            self.assertEqual(self._samples("Static", name, relativePath), [], name)
+            self.assertEqual(self._samples("Late", name, relativePath), [], name)
+        self.assertIsNone(self.layer.GetAttributeAtPath("/MPCDI/_0/Static.visibility"))
+        self.assertEqual(self._samples("Late", "visibility"), [(10.0, "invisible"), (14.0, "inherited")])
+
+    def test_sample_counts(self):
+        # 3 translate and 3 rotateY samples, 3 + 2 visibility samples.
+        self.assertEqual(self.result.samples, 11)
+        presentSamples = sum(len(document) for document in self.documents)
+        self.assertEqual(self.result.dropped, presentSamples * len(ANIMATED_ATTRIBUTES) - 6)
+
+    def test_times_must_match_passes(self):
+        with self.assertRaises(ValueError):
+            author_sequence(self.documents, Sdf.Layer.CreateAnonymous(".usda"), TIMES[:-1])
@@ -0,0 +1,75 @@
+import numpy as np
+
+from ..parser import COORDINATE_FRAME_TAGS
+from ..warp import build_warp_mesh
+
+try:
+    from omni.kit.test import AsyncTestCase as TestCase
+except ImportError:
+    from unittest import TestCase
+
+
+# Right is X, up is Y and forward is Z: a sample (x, y, z) lands at (100 x, -100 y, -100 z) in stage space.
+IDENTITY_FRAME = dict(zip(COORDINATE_FRAME_TAGS, (0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0)))
+HEIGHT, WIDTH = 5, 6
+HOLES = ((1, 1), (4, 5))
+
+
+def _stage(row: int, column: int):
+    return [100.0 * column, -100.0 * row, -100.0 * row * column]
+
+
+def _expected_faces(rows, columns):
+    # Corner positions of the kept quads, in row-major order, brute force.
+    faces = []
+    for top, bottom in zip(rows[:-1], rows[1:]):
+        for left, right in zip(columns[:-1], columns[1:]):
+            corners = ((top, left), (bottom, left), (bottom, right), (top, right))
+            if not any(corner in HOLES for corner in corners):
+                faces.append([_stage(*corner) for corner in corners])
+    return faces
+
+
+class TestWarp(TestCase):
+    def setUp(self):
+        row, column = np.mgrid[0:HEIGHT, 0:WIDTH].astype(np.float32)
+        self.grid = np.stack((column, row, row * column), axis=-1)
+        for hole in HOLES:
+            self.grid[hole] = np.nan
+
+    def _check(self, decimation, rows, columns, faceCount, pointCount):
+        mesh = build_warp_mesh(self.grid, IDENTITY_FRAME, decimation)
+        self.assertEqual(len(mesh.face_vertex_counts), faceCount)
+        self.assertTrue((mesh.face_vertex_counts == 4).all())
+        self.assertEqual(len(mesh.face_vertex_indices), 4 * faceCount)
+        # Points no face references are dropped.
+        self.assertEqual(len(mesh.points), pointCount)
+        self.assertEqual(len(mesh.uvs), pointCount)
+        self.assertEqual(sorted(set(mesh.face_vertex_indices.tolist())), list(range(pointCount)))
+        self.assertTrue(np.isfinite(mesh.points).all())
+
+        faces = mesh.points[mesh.face_vertex_indices].reshape(-1, 4, 3)
+        np.testing.assert_allclose(faces, _expected_faces(rows, columns), atol=1e-4)
+        np.testing.assert_allclose(mesh.extent, [[0.0, -400.0, -1600.0], [500.0, 0.0, 0.0]], atol=1e-4)
+
+        # UVs span the full grid whatever the decimation, V up.
+        columnsAndRows = mesh.points[:, :2] * np.float32([0.01, -0.01])
+        np.testing.assert_allclose(mesh.uvs, columnsAndRows / [WIDTH - 1, -(HEIGHT - 1)] + [0.0, 1.0], atol=1e-6)
+
+    def test_full_resolution(self):
+        # 20 quads, 4 touch the hole at (1, 1) and 1 the bottom right corner. (0, 0), (0, 1) and (1, 0) are left
+        # without face.
+        self._check(1, list(range(HEIGHT)), list(range(WIDTH)), 15, 25)
+
+    def test_decimation(self):
+        # Rows 0, 2, 4 and columns 0, 2, 4, 5: the last ones are kept, (1, 1) is skipped and (4, 5) drops a quad.
+        self._check(2, [0, 2, 4], [0, 2, 4, 5], 5, 11)
+
+    def test_invalid_grids(self):
+        with self.assertRaises(ValueError):
+            build_warp_mesh(self.grid[:, :, :2], IDENTITY_FRAME)
+        with self.assertRaises(ValueError):
+            build_warp_mesh(self.grid[:1], IDENTITY_FRAME)
+        mesh = build_warp_mesh(np.full((3, 3, 3), np.nan, dtype=np.float32), IDENTITY_FRAME, 1)
+        self.assertEqual((len(mesh.points), len(mesh.face_vertex_indices)), (0, 0))
+        self.assertEqual(mesh.extent.tolist(), [[0.0, 0.0, 0.0], [0.0, 0.0, 0.0]])
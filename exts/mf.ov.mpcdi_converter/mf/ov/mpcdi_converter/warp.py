@@ -0,0 +1,84 @@
+import numpy as np
+from .compute import POSITION_SCALE
+from .parser import COORDINATE_FRAME_TAGS
+
+
+# Keep one warp sample every DEFAULT_WARP_DECIMATION rows and columns, 1 keeps the full resolution grid.
+DEFAULT_WARP_DECIMATION = 4
+WARP_MESH_NAME = "WarpMesh"
+
+
+class WarpMesh:
+    """Arrays of a warp grid mesh, ready to be written with single Vt array assignments."""
+
+    def __init__(self, points: np.ndarray, face_vertex_counts: np.ndarray, face_vertex_indices: np.ndarray,
+                 uvs: np.ndarray):
+        self.points = points
+        self.face_vertex_counts = face_vertex_counts
+        self.face_vertex_indices = face_vertex_indices
+        self.uvs = uvs
+
+    @property
+    def extent(self) -> np.ndarray:
+        if len(self.points) == 0:
+            return np.zeros((2, 3), dtype=np.float32)
+        return np.stack((self.points.min(axis=0), self.points.max(axis=0)))
+
+
+def _sample_indices(size: int, step: int) -> np.ndarray:
+    # The last row or column is always kept, the decimated mesh covers the same area.
+    indices = np.arange(0, size, step)
+    if indices[-1] != size - 1:
+        indices = np.append(indices, size - 1)
+    return indices
+
+
+def _to_stage_space(points: np.ndarray, coordinate_frame: dict) -> np.ndarray:
+    # Same conversion as the projector positions, see compute_projectors: source to standard matrix, Y and Z flipped,
+    # then scaled, in single precision.
+    frame = np.array([coordinate_frame[tag] for tag in COORDINATE_FRAME_TAGS], dtype=np.float32)
+    sourceToStandard = np.stack((frame[6:9], frame[3:6], frame[9:12]))
+    converted = (points * np.float32(10)) @ sourceToStandard.T
+    converted[:, 1:3] *= np.float32(-1.0)
+    return converted * np.float32(POSITION_SCALE)
+
+
+def build_warp_mesh(grid: np.ndarray, coordinate_frame: dict, decimation: int = DEFAULT_WARP_DECIMATION) -> WarpMesh:
+    """Build the quad mesh of a (height, width, 3) PFM warp grid, top row first (see archive.read_pfm).
+
+    Samples are 3D positions in the frame described by the region's coordinateFrame. Samples holding NaN are unused by
+    the projector: faces touching them are dropped, as well as the points no face references anymore.
+    """
+    if grid.ndim != 3 or grid.shape[2] != 3:
+        raise ValueError(f"Expected a 3 channel warp grid, got shape {grid.shape}.")
+    height, width = grid.shape[:2]
+    if height < 2 or width < 2:
+        raise ValueError(f"Warp grid of {width}x{height} samples has no face.")
+
+    rows = _sample_indices(height, max(1, int(decimation)))
+    columns = _sample_indices(width, max(1, int(decimation)))
+    samples = np.asarray(grid[rows[:, None], columns[None, :]], dtype=np.float32)
+    gridHeight, gridWidth = len(rows), len(columns)
+
+    # Quad corners, counter-clockwise as seen from the projector: top left, bottom left, bottom right, top right.
+    vertexIds = np.arange(gridHeight * gridWidth, dtype=np.int32).reshape(gridHeight, gridWidth)
+    quads = np.stack((vertexIds[:-1, :-1], vertexIds[1:, :-1], vertexIds[1:, 1:], vertexIds[:-1, 1:]), axis=-1)
+    quads = quads.reshape(-1, 4)
+
+    validPoints = np.isfinite(samples).all(axis=-1).ravel()
+    quads = quads[validPoints[quads].all(axis=1)]
+
+    usedPoints = np.zeros(gridHeight * gridWidth, dtype=bool)
+    usedPoints[quads.ravel()] = True
+    remap = np.cumsum(usedPoints, dtype=np.int32) - 1
+
+    uvs = np.empty((gridHeight, gridWidth, 2), dtype=np.float32)
+    uvs[:, :, 0] = (columns / (width - 1))[None, :]
+    uvs[:, :, 1] = (1.0 - rows / (height - 1))[:, None]
+
+    return WarpMesh(
+        _to_stage_space(samples.reshape(-1, 3)[usedPoints], coordinate_frame),
+        np.full(len(quads), 4, dtype=np.int32),
+        remap[quads].ravel(),
+        uvs.reshape(-1, 2)[usedPoints],
+    )
@@ -0,0 +1,119 @@
+import asyncio
+import functools
+import logging
+import os
+import omni.client
+
+
+# Seconds a modified file must stay untouched before it is re-imported.
+DEFAULT_DEBOUNCE = 1.0
+# Seconds between two checks of the watched local files.
+DEFAULT_POLL_INTERVAL = 2.0
+
+
+def _local_signature(path: str):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class MPCDIWatcher:
+    """Calls `on_change(path)` when a watched MPCDI file changes.
+
+    Nucleus paths are followed with omni.client stat subscriptions and cost nothing until the server reports a change.
+    Local files are polled with os.stat every `poll_interval` seconds, only while at least one is watched. A burst of
+    writes is merged into a single call made once the file was left untouched for `debounce` seconds. The calls for one
+    file never overlap, a change made during a call triggers another one.
+    """
+
+    def __init__(self, on_change, debounce: float = DEFAULT_DEBOUNCE, poll_interval: float = DEFAULT_POLL_INTERVAL):
+        self._on_change = on_change
+        self._debounce = debounce
+        self._poll_interval = poll_interval
+        self._loop = asyncio.get_event_loop()
+        # Local files by path, with their last seen modification time and size.
+        self._local = {}
+        # omni.client subscriptions of the Nucleus paths.
+        self._subscriptions = {}
+        # Debounce tasks of the changed files, and the loop time of their latest change.
+        self._pending = {}
+        self._changed_at = {}
+        self._poll_task = None
+
+    @property
+    def paths(self):
+        return sorted(list(self._local) + list(self._subscriptions))
+
+    def watch(self, path: str):
+        if path in self._local or path in self._subscriptions:
+            return
+        if os.path.isfile(path):
+            self._local[path] = _local_signature(path)
+            if self._poll_task is None:
+                self._poll_task = asyncio.ensure_future(self._poll())
+        else:
+            self._subscriptions[path] = omni.client.stat_subscribe_with_callback(
+                path, lambda result, entry: None, functools.partial(self._on_stat_event, path))
+        logging.getLogger(__name__).info(f"Watching {path} for changes.")
+
+    def unwatch(self, path: str):
+        self._local.pop(path, None)
+        subscription = self._subscriptions.pop(path, None)
+        if subscription is not None:
+            subscription.stop()
+        task = self._pending.pop(path, None)
+        if task is not None:
+            task.cancel()
+        self._changed_at.pop(path, None)
+
+    def destroy(self):
+        for path in self.paths:
+            self.unwatch(path)
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            self._poll_task = None
+
+    def _on_stat_event(self, path, result, event, entry):
+        # Called from an omni.client thread.
+        if result == omni.client.Result.OK and event in (omni.client.ListEvent.CREATED, omni.client.ListEvent.UPDATED):
+            self._loop.call_soon_threadsafe(self._touch, path)
+
+    async def _poll(self):
+        try:
+            while self._local:
+                await asyncio.sleep(self._poll_interval)
+                for path, signature in list(self._local.items()):
+                    current = _local_signature(path)
+                    # A file being replaced can be missing for a moment, it is checked again on the next poll.
+                    if current is not None and current != signature:
+                        self._local[path] = current
+                        self._touch(path)
+        finally:
+            self._poll_task = None
+
+    def _touch(self, path: str):
+        if path not in self._local and path not in self._subscriptions:
+            return
+        self._changed_at[path] = self._loop.time()
+        if path not in self._pending:
+            self._pending[path] = asyncio.ensure_future(self._settle(path))
+
+    async def _settle(self, path: str):
+        try:
+            remaining = self._debounce
+            while remaining > 0:
+                await asyncio.sleep(remaining)
+                remaining = self._changed_at[path] + self._debounce - self._loop.time()
+
+            started = self._loop.time()
+            try:
+                await self._on_change(path)
+            except Exception as e:
+                logging.getLogger(__name__).error(f"Failed to re-import {path} after a change. {e}")
+        finally:
+            self._pending.pop(path, None)
+
+        if self._changed_at.get(path, started) > started:
+            self._touch(path)
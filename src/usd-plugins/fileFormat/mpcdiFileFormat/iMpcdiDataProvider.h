@@ -43,8 +43,14 @@ public:
 	std::string dataProviderId;
 	std::unordered_map<std::string, std::string> providerArgs;
 
+	// name of the root prim the provider data is created under, "Data" when empty
+	std::string rootName;
+
 	// conversion functions to and from USD structures
 	static EdfDataParameters FromFileFormatArgs(const SdfFileFormat::FileFormatArguments& args);
+
+	// path of the root prim, falls back to "/Data" when rootName is empty or not a valid identifier
+	SdfPath GetRootPath() const;
 };
 
 ///
@@ -135,11 +141,15 @@ public:
 	/// from their back-end store all at once when the data is large.
 	///
 	/// \param primPath The path of the prim to create children for.
-	///                 This value is either "/Data", indicating the root
-	///					of the hierarchy, or the full path to a prim
+	///                 This value is either the root prim path (see
+	///                 EdfDataParameters::rootName), or the full path to a prim
 	///                 that was created by the data provider previously
 	///                 on a Read / ReadChildren call.
 	///
+	/// ReadChildren is called at most once per prim and calls are serialized
+	/// by EdfData, so providers do not need locking of their own. They must not
+	/// query the prim children of other prims from this call.
+	///
 	/// \param sourceData The source data interface which the data provider
 	///                   can use to create prims / attributes as needed when
 	///                   they read data from their back-end.
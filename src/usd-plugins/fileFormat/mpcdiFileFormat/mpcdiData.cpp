@@ -15,18 +15,18 @@
 #include <pxr/base/plug/plugin.h>
 #include <pxr/base/plug/registry.h>
 #include <pxr/base/tf/token.h>
+#include <pxr/base/tf/stl.h>
+#include <pxr/base/tf/stringUtils.h>
 #include <pxr/usd/sdf/schema.h>
 
 #include "mpcdiData.h"
 #include "mpcdiDataProviderFactory.h"
 #include "mpcdiPluginManager.h"
 
-#include <iostream>
-
 PXR_NAMESPACE_OPEN_SCOPE
 
 static const SdfPath ROOT_PATH("/");
-static const SdfPath DATA_ROOT_PATH("/Data");
+static const char* DEFAULT_ROOT_NAME = "Data";
 
 TF_DEFINE_PUBLIC_TOKENS(
 	EdfDataParametersTokens,
@@ -37,12 +37,23 @@ TF_DEFINE_PUBLIC_TOKENS(
 	// plugin metadata describing the arguments for the provider to use
 	// to load the layer
 	(providerArgs)
+
+	// name of the root prim of the layer
+	(rootName)
 );
 
 EdfDataParameters EdfDataParameters::FromFileFormatArgs(const SdfFileFormat::FileFormatArguments& args)
 {
 	EdfDataParameters parameters;
-	parameters.dataProviderId = *(TfMapLookupPtr(args, EdfDataParametersTokens->dataProviderId));
+	if (const std::string* dataProviderId = TfMapLookupPtr(args, EdfDataParametersTokens->dataProviderId))
+	{
+		parameters.dataProviderId = *dataProviderId;
+	}
+
+	if (const std::string* rootName = TfMapLookupPtr(args, EdfDataParametersTokens->rootName))
+	{
+		parameters.rootName = *rootName;
+	}
 	
 	// unpack the file format argument representation of the provider arguments
 	std::string prefix = EdfDataParametersTokens->providerArgs.GetString() + ":";
@@ -60,6 +71,12 @@ EdfDataParameters EdfDataParameters::FromFileFormatArgs(const SdfFileFormat::Fil
 	return parameters;
 }
 
+SdfPath EdfDataParameters::GetRootPath() const
+{
+	const bool useDefault = this->rootName.empty() || !TfIsValidIdentifier(this->rootName);
+	return SdfPath::AbsoluteRootPath().AppendChild(TfToken(useDefault ? DEFAULT_ROOT_NAME : this->rootName));
+}
+
 EdfSourceData::EdfSourceData(EdfData* data)
 {
 	this->_data = data;
@@ -116,24 +133,31 @@ bool EdfSourceData::HasAttribute(const SdfPath& attributePath, VtValue* defaultV
 	return false;
 }
 
-EdfData::EdfData(std::unique_ptr<IEdfDataProvider> dataProvider)
+EdfData::EdfData(std::unique_ptr<IEdfDataProvider> dataProvider, const SdfPath& rootPath)
 {
 	this->_dataProvider = std::move(dataProvider);
 	this->_sourceData = std::make_shared<EdfSourceData>(this);
+	this->_rootPath = rootPath;
 }
 
 EdfDataRefPtr EdfData::CreateFromParameters(const EdfDataParameters& parameters)
 {
+	if (!parameters.rootName.empty() && !TfIsValidIdentifier(parameters.rootName))
+	{
+		TF_WARN("Invalid root prim name '%s', using '%s'", parameters.rootName.c_str(), DEFAULT_ROOT_NAME);
+	}
+
+	const SdfPath rootPath = parameters.GetRootPath();
 	std::unique_ptr<IEdfDataProvider> dataProvider = MPCDIPluginManager::GetInstance().CreateDataProvider(parameters.dataProviderId, parameters);
 	if (dataProvider == nullptr)
 	{
 		// there was no provider responsible for this data or it didn't load properly,
 		// so the best we can do is provide an empty EdfData object with no backing provider
 		// this will load nothing except an empty default Root prim
-		return TfCreateRefPtr(new EdfData(nullptr));
+		return TfCreateRefPtr(new EdfData(nullptr, rootPath));
 	}
 
-	return TfCreateRefPtr(new EdfData(std::move(dataProvider)));
+	return TfCreateRefPtr(new EdfData(std::move(dataProvider), rootPath));
 }
 
 void EdfData::CreateSpec(const SdfPath& path, SdfSpecType specType)
@@ -216,6 +240,19 @@ SdfSpecType EdfData::GetSpecType(const SdfPath& path) const
 
 	accessor.release();
 
+	// the spec may belong to children that were not read yet, e.g. when
+	// a path is looked up directly instead of traversing the hierarchy
+	const SdfPath parentPath = path.GetParentPath();
+	if (this->_dataProvider != nullptr && !parentPath.IsEmpty() && parentPath != path &&
+		!this->_AreChildrenRead(parentPath) && this->GetSpecType(parentPath) != SdfSpecType::SdfSpecTypeUnknown)
+	{
+		this->_EnsureChildrenRead(parentPath);
+		if (_specData.find(accessor, path))
+		{
+			return accessor->second.specType;
+		}
+	}
+
 	return SdfSpecType::SdfSpecTypeUnknown;
 }
 
@@ -243,43 +280,15 @@ bool EdfData::Has(const SdfPath& path, const TfToken& fieldName, VtValue* value)
 	// in general, we can just get the value for whatever is being asked for
 	// from the hash (and know whether it was there or not)
 	// children are a special case, because those we want to ask the back-end
-	// provider to load - one tricky bit is understanding when we want the data provider
-	// to load and when we want to use the cached value
-	// as a general rule, if SdfChildrenKeys isn't present in the list of fields
-	// for the prim, but we have the prim, we need to ask the data provider to load
-	// for simplicity sake, this is a one-time load -> the data provider will use
-	// the callbacks to insert the children prims / attributes
-	// if we asked the data provider to load the children, and after that the field
-	// still isn't present, then we insert the field with an empty list since
-	// the provider never created any children (maybe the back-end query returned nothing)
-    std::cout << path.GetAsString() << " " << fieldName.GetString() << std::endl;
-	bool hasValue = this->_GetFieldValue(path, fieldName, value);
-	if (!hasValue && fieldName == SdfChildrenKeys->PrimChildren &&
-		this->_dataProvider != nullptr)
+	// provider to load - the first time the children of a prim are asked for,
+	// the data provider is asked to create them through the callbacks
+	// (see _EnsureChildrenRead), later calls use the cached value
+	if (fieldName == SdfChildrenKeys->PrimChildren && this->_dataProvider != nullptr)
 	{
-		// give the data provider an opportunity to load their children
-		this->_dataProvider->ReadChildren(path.GetAsString(), this->_sourceData);
-
-		// after the read call, we check again to see if it's present
-		hasValue = this->_GetFieldValue(path, fieldName, value);
-		if (!hasValue)
-		{
-			// if it still doesn't exist, we assume that there were no children
-			// and we cache that fact now
-			TfTokenVector primChildren;
-			VtValue primChildrenValue(primChildren);
-			this->_SetFieldValue(path, SdfChildrenKeys->PrimChildren, primChildrenValue);
-
-			if(value != nullptr)
-			{
-				*value = primChildrenValue;
-			}
-		
-			hasValue = true;
-		}
+		this->_EnsureChildrenRead(path);
 	}
 
-	return hasValue;
+	return this->_GetFieldValue(path, fieldName, value);
 }
 
 bool EdfData::HasSpec(const SdfPath& path) const
@@ -429,30 +438,66 @@ void EdfData::EraseTimeSample(const SdfPath& path, double time)
 
 void EdfData::_VisitSpecs(SdfAbstractDataSpecVisitor* visitor) const
 {
-	// not supported in this POC
+	// walk the hierarchy rather than the hash, the children that were
+	// not read yet are read on the way
+	std::vector<SdfPath> paths({SdfPath::AbsoluteRootPath()});
+	while (!paths.empty())
+	{
+		const SdfPath path = paths.back();
+		paths.pop_back();
+		if (!visitor->VisitSpec(*this, path))
+		{
+			return;
+		}
+
+		if (!path.IsAbsoluteRootOrPrimPath())
+		{
+			continue;
+		}
+
+		VtValue children;
+		if (this->Has(path, SdfChildrenKeys->PropertyChildren, &children) && children.IsHolding<TfTokenVector>())
+		{
+			for (const TfToken& name : children.UncheckedGet<TfTokenVector>())
+			{
+				paths.push_back(path.AppendProperty(name));
+			}
+		}
+
+		if (this->Has(path, SdfChildrenKeys->PrimChildren, &children) && children.IsHolding<TfTokenVector>())
+		{
+			const TfTokenVector& names = children.UncheckedGet<TfTokenVector>();
+			for (auto it = names.rbegin(); it != names.rend(); ++it)
+			{
+				paths.push_back(path.AppendChild(*it));
+			}
+		}
+	}
 }
 
 bool EdfData::Read()
 {
 	// on first read, create the specs for the absolute root path and
-	// for the /Data path where the provider will root their data
+	// for the root prim path where the provider will root their data
+	// the children of the pseudo root are known, only the root prim is there
 	SpecData::accessor accessor;
 	_specData.insert(accessor, SdfPath::AbsoluteRootPath());
     accessor->second.specType = SdfSpecType::SdfSpecTypePseudoRoot;
+	accessor->second.childrenRead = true;
 	accessor.release();
 
 	// insert known field names for the root path
 	// this includes at minimum:
 	// SdfFieldKeys->DefaultPrim
 	// SdfChildrenKeys->PrimChildren
-	TfTokenVector rootChildren({DATA_ROOT_PATH.GetNameToken()});
+	TfTokenVector rootChildren({this->_rootPath.GetNameToken()});
 	VtValue primChildrenValue(rootChildren);
-	VtValue defaultPrimValue(DATA_ROOT_PATH.GetNameToken());
+	VtValue defaultPrimValue(this->_rootPath.GetNameToken());
 	this->_SetFieldValue(ROOT_PATH, SdfChildrenKeys->PrimChildren, primChildrenValue);
 	this->_SetFieldValue(ROOT_PATH, SdfFieldKeys->DefaultPrim, defaultPrimValue);
 
 	// insert the data root path
-	_specData.insert(accessor, DATA_ROOT_PATH);
+	_specData.insert(accessor, this->_rootPath);
 	accessor->second.specType = SdfSpecType::SdfSpecTypePrim;
 	accessor.release();
 
@@ -466,11 +511,11 @@ bool EdfData::Read()
     // and non-deferred reads, so we don't set it here
 	TfTokenVector dataRootPropertyChildren;
 	VtValue specifierValue(SdfSpecifier::SdfSpecifierDef);
-    VtValue typeNameValue;
+    VtValue typeNameValue(TfToken{});
 	VtValue dataRootPropertyChildrenValue(dataRootPropertyChildren);
-	this->_SetFieldValue(DATA_ROOT_PATH, SdfFieldKeys->Specifier, specifierValue);
-	this->_SetFieldValue(DATA_ROOT_PATH, SdfFieldKeys->TypeName, typeNameValue);
-	this->_SetFieldValue(DATA_ROOT_PATH, SdfChildrenKeys->PropertyChildren, dataRootPropertyChildrenValue);
+	this->_SetFieldValue(this->_rootPath, SdfFieldKeys->Specifier, specifierValue);
+	this->_SetFieldValue(this->_rootPath, SdfFieldKeys->TypeName, typeNameValue);
+	this->_SetFieldValue(this->_rootPath, SdfChildrenKeys->PropertyChildren, dataRootPropertyChildrenValue);
 
 	// if we have a valid provider, ask it to read it's data based on what parameters
 	// it was initialized with, otherwise just return true because we only have an empty
@@ -487,29 +532,14 @@ bool EdfData::Read()
 void EdfData::_CreatePrim(const SdfPath& parentPath, const std::string& name, 
 	const SdfSpecifier& specifier, const TfToken& typeName)
 {
-	SdfPath primPath = SdfPath(parentPath.GetAsString() + "/" + name);
+	const TfToken nameToken(name);
+	SdfPath primPath = parentPath.AppendChild(nameToken);
 	this->_CreateSpec(primPath, SdfSpecType::SdfSpecTypePrim);
 	this->_SetFieldValue(primPath, SdfFieldKeys->TypeName, VtValue(typeName));
 	this->_SetFieldValue(primPath, SdfFieldKeys->Specifier, VtValue(specifier));
 
     // add this prim to the PrimChildren property of parentPath
-    VtValue existingPrimChildrenValue;
-    if (this->_GetFieldValue(parentPath, SdfChildrenKeys->PrimChildren, &existingPrimChildrenValue))
-    {
-        // there are already children present, so append to the list
-        TfTokenVector existingChildren = existingPrimChildrenValue.UncheckedGet<TfTokenVector>();
-        existingChildren.push_back(TfToken(name));
-
-        // set the value back
-        this->_SetFieldValue(parentPath, SdfChildrenKeys->PrimChildren, VtValue(existingChildren));
-    }
-    else
-    {
-        // no children present yet
-        TfTokenVector children;
-        children.push_back(TfToken(name));
-        this->_SetFieldValue(parentPath, SdfChildrenKeys->PrimChildren, VtValue(children));
-    }
+    this->_AppendChild(parentPath, SdfChildrenKeys->PrimChildren, nameToken);
 }
 
 void EdfData::_CreateAttribute(const SdfPath& primPath, const std::string& name,
@@ -520,30 +550,90 @@ void EdfData::_CreateAttribute(const SdfPath& primPath, const std::string& name,
 	// the type name field key of the attribute
 	// the variability field key of the attribute
 	// and a default field key holding its value
-	SdfPath attributePath = SdfPath(primPath.GetAsString() + "." + name);
+	// an empty value declares the attribute without a default
+	const TfToken nameToken(name);
+	SdfPath attributePath = primPath.AppendProperty(nameToken);
 	this->_CreateSpec(attributePath, SdfSpecType::SdfSpecTypeAttribute);
-	this->_SetFieldValue(attributePath, SdfFieldKeys->TypeName, VtValue(typeName));
+	this->_SetFieldValue(attributePath, SdfFieldKeys->TypeName, VtValue(typeName.GetAsToken()));
 	this->_SetFieldValue(attributePath, SdfFieldKeys->Variability, VtValue(variability));
-	this->_SetFieldValue(attributePath, SdfFieldKeys->Default, value);
+	if (!value.IsEmpty())
+	{
+		this->_SetFieldValue(attributePath, SdfFieldKeys->Default, value);
+	}
 
     // add this attribute to PropertyChildren of primPath
-    VtValue existingPropertyChildrenValue;
-    if (this->_GetFieldValue(primPath, SdfChildrenKeys->PropertyChildren, &existingPropertyChildrenValue))
-    {
-        // there are already children present, so append to the list
-        TfTokenVector existingChildren = existingPropertyChildrenValue.UncheckedGet<TfTokenVector>();
-        existingChildren.push_back(TfToken(name));
+    this->_AppendChild(primPath, SdfChildrenKeys->PropertyChildren, nameToken);
+}
 
-        // set the value back
-        this->_SetFieldValue(primPath, SdfChildrenKeys->PropertyChildren, VtValue(existingChildren));
-    }
-    else
-    {
-        // no children present yet
-        TfTokenVector children;
-        children.push_back(TfToken(name));
-        this->_SetFieldValue(primPath, SdfChildrenKeys->PropertyChildren, VtValue(children));
-    }
+void EdfData::_AppendChild(const SdfPath& path, const TfToken& childrenKey, const TfToken& name)
+{
+	// the list is grown in place, copying it for every child would make
+	// creating the N children of a prim quadratic
+	SpecData::accessor accessor;
+	if (!_specData.find(accessor, path))
+	{
+		return;
+	}
+
+	for (auto& f : accessor->second.fields)
+	{
+		if (f.first == childrenKey && f.second.IsHolding<TfTokenVector>())
+		{
+			TfTokenVector children;
+			f.second.UncheckedSwap(children);
+			children.push_back(name);
+			f.second.UncheckedSwap(children);
+
+			return;
+		}
+	}
+
+	accessor->second.fields.emplace_back(childrenKey, VtValue(TfTokenVector({name})));
+}
+
+bool EdfData::_AreChildrenRead(const SdfPath& primPath) const
+{
+	SpecData::const_accessor accessor;
+	return _specData.find(accessor, primPath) && accessor->second.childrenRead;
+}
+
+void EdfData::_EnsureChildrenRead(const SdfPath& primPath) const
+{
+	if (this->_AreChildrenRead(primPath))
+	{
+		return;
+	}
+
+	// checked again under the lock, another thread may have read them meanwhile
+	std::lock_guard<std::mutex> lock(this->_readChildrenMutex);
+	{
+		SpecData::const_accessor accessor;
+		if (!_specData.find(accessor, primPath) || accessor->second.childrenRead ||
+			accessor->second.specType != SdfSpecType::SdfSpecTypePrim)
+		{
+			return;
+		}
+	}
+
+	// give the data provider an opportunity to load the children
+	if (this->_dataProvider != nullptr)
+	{
+		this->_dataProvider->ReadChildren(primPath.GetAsString(), this->_sourceData);
+	}
+
+	// if the field still doesn't exist, we assume that there were no children
+	// and we cache that fact now
+	if (!this->_GetFieldValue(primPath, SdfChildrenKeys->PrimChildren, nullptr))
+	{
+		this->_SetFieldValue(primPath, SdfChildrenKeys->PrimChildren, VtValue(TfTokenVector()));
+	}
+
+	// children are only visible to readers once all of them are created
+	SpecData::accessor accessor;
+	if (_specData.find(accessor, primPath))
+	{
+		accessor->second.childrenRead = true;
+	}
 }
 
 void EdfData::_CreateSpec(const SdfPath& path, const SdfSpecType& specType)
@@ -590,7 +680,7 @@ bool EdfData::_GetSpecTypeAndFieldValue(const SdfPath& path,
                 // accessor
                 if (value != nullptr)
                 {
-                    *value = value;
+                    *value = f.second;
                 }
 
                 accessor.release();
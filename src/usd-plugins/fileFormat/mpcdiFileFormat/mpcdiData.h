@@ -17,6 +17,7 @@
 
 #include <string>
 #include <set>
+#include <mutex>
 
 #include <pxr/pxr.h>
 #include <pxr/base/tf/declarePtrs.h>
@@ -33,6 +34,7 @@ TF_DECLARE_PUBLIC_TOKENS(
 	EdfDataParametersTokens,
 	(dataProviderId)
 	(providerArgs)
+	(rootName)
 );
 
 TF_DECLARE_WEAK_AND_REF_PTRS(EdfData);
@@ -114,7 +116,7 @@ private:
 	friend class EdfSourceData;
 
 	// can only be constructed via CreateFromParameters
-	EdfData(std::unique_ptr<IEdfDataProvider> dataProvider);
+	EdfData(std::unique_ptr<IEdfDataProvider> dataProvider, const SdfPath& rootPath);
 
 	// helper methods for retrieving spec properties
 	// modeled after  SdfData
@@ -131,6 +133,11 @@ private:
 	void _SetFieldValue(const SdfPath& path, const TfToken& fieldName, const VtValue& value);
     void _SetFieldValue(const SdfPath& path, const TfToken& fieldName, const VtValue& value) const;
     void _CreateSpec(const SdfPath& path, const SdfSpecType& specType);
+    void _AppendChild(const SdfPath& path, const TfToken& childrenKey, const TfToken& name);
+
+    // lazy reads of prim children from the data provider
+    bool _AreChildrenRead(const SdfPath& primPath) const;
+    void _EnsureChildrenRead(const SdfPath& primPath) const;
 
 	// instance methods for callbacks on context
 	void _CreatePrim(const SdfPath& parentPath, const std::string& name,
@@ -148,6 +155,13 @@ private:
 	// used to callback on to create prims / attributes
 	std::shared_ptr<IEdfSourceData> _sourceData;
 
+	// path of the prim the provider roots its data under
+	SdfPath _rootPath;
+
+	// serializes the ReadChildren calls on the data provider, readers
+	// never see the children of a prim while they are being created
+	mutable std::mutex _readChildrenMutex;
+
     // mimic the storage structure of SdfData, just put it
     // in a concurrent_hash_map rather than a TfHashMap
     // the downside here is if we lock one field value for a write
@@ -157,10 +171,13 @@ private:
 	// the back-end object acquisition during prim indexing
     typedef std::pair<TfToken, VtValue> _FieldValuePair;
     struct _SpecData {
-        _SpecData() : specType(SdfSpecTypeUnknown) {}
+        _SpecData() : specType(SdfSpecTypeUnknown), childrenRead(false) {}
 
         SdfSpecType specType;
         std::vector<_FieldValuePair> fields;
+
+        // true once the data provider was asked for the children of the prim
+        bool childrenRead;
     };
 
     // Hash structure consistent with what TBB expects
@@ -0,0 +1,275 @@
+// Copyright 2023 NVIDIA CORPORATION
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//  http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "mpcdiDataProvider.h"
+#include "mpcdiDataProviderFactory.h"
+
+#include <pxr/base/tf/diagnostic.h>
+#include <pxr/base/tf/stl.h>
+#include <pxr/base/tf/stringUtils.h>
+#include <pxr/base/gf/matrix3f.h>
+#include <pxr/base/gf/vec3d.h>
+#include <pxr/base/gf/vec3f.h>
+#include <pxr/base/vt/array.h>
+#include <pxr/usd/sdf/schema.h>
+#include <pxr/usd/sdf/types.h>
+#include <pxr/usd/usdGeom/tokens.h>
+#include <pxr/usd/usdLux/tokens.h>
+
+#include <algorithm>
+#include <cmath>
+
+PXR_NAMESPACE_OPEN_SCOPE
+
+TF_DEFINE_PUBLIC_TOKENS(
+	MpcdiDataProviderTokens,
+	((Id, "mpcdi"))
+	(filePath)
+	(buffers)
+	(regions)
+	(camerasOnly)
+);
+
+TF_DEFINE_PRIVATE_TOKENS(
+	_tokens,
+	(Camera)
+	(Cube)
+	(RectLight)
+	(Scope)
+	(Xform)
+	(ProjectLight)
+	(ProjectorBox)
+	(isProjector)
+	(exposure)
+	(intensity)
+	((xformOpTranslate, "xformOp:translate"))
+	((xformOpRotateX, "xformOp:rotateX"))
+	((xformOpRotateY, "xformOp:rotateY"))
+	((xformOpRotateZ, "xformOp:rotateZ"))
+	((xformOpScale, "xformOp:scale"))
+);
+
+static void CreateXformOpOrder(const SdfPath& primPath, const TfTokenVector& ops, const std::shared_ptr<IEdfSourceData>& sourceData)
+{
+	sourceData->CreateAttribute(primPath, UsdGeomTokens->xformOpOrder, SdfValueTypeNames->TokenArray,
+		SdfVariabilityUniform, VtValue(VtTokenArray(ops.begin(), ops.end())));
+}
+
+static std::unordered_set<std::string> _SplitNames(const std::unordered_map<std::string, std::string>& args, const TfToken& key)
+{
+	std::unordered_set<std::string> names;
+	if (const std::string* value = TfMapLookupPtr(args, key))
+	{
+		for (const std::string& name : TfStringSplit(*value, ","))
+		{
+			const std::string strippedName = TfStringTrim(name);
+			if (!strippedName.empty())
+			{
+				names.insert(strippedName);
+			}
+		}
+	}
+
+	return names;
+}
+
+MpcdiDataProvider::MpcdiDataProvider(const EdfDataParameters& parameters) : IEdfDataProvider(parameters)
+{
+	this->_selectedBuffers = _SplitNames(parameters.providerArgs, MpcdiDataProviderTokens->buffers);
+	this->_selectedRegions = _SplitNames(parameters.providerArgs, MpcdiDataProviderTokens->regions);
+
+	const std::string* camerasOnly = TfMapLookupPtr(parameters.providerArgs, MpcdiDataProviderTokens->camerasOnly);
+	this->_camerasOnly = camerasOnly != nullptr && (*camerasOnly == "1" || *camerasOnly == "true");
+}
+
+MpcdiDataProvider::~MpcdiDataProvider()
+{
+}
+
+bool MpcdiDataProvider::Read(std::shared_ptr<IEdfSourceData> sourceData)
+{
+	const EdfDataParameters& parameters = this->GetParameters();
+	const std::string* filePath = TfMapLookupPtr(parameters.providerArgs, MpcdiDataProviderTokens->filePath);
+	if (filePath == nullptr)
+	{
+		TF_CODING_ERROR("Missing '%s' provider argument", MpcdiDataProviderTokens->filePath.GetText());
+		return false;
+	}
+
+	this->_document = MpcdiDocumentCache::GetInstance().Get(*filePath);
+	if (this->_document == nullptr)
+	{
+		return false;
+	}
+
+	const SdfPath rootPath = parameters.GetRootPath();
+	sourceData->SetField(rootPath, SdfFieldKeys->TypeName, VtValue(_tokens->Xform));
+	for (size_t i = 0; i < this->_document->buffers.size(); i++)
+	{
+		const MpcdiBufferRecord& buffer = this->_document->buffers[i];
+		const std::string& bufferName = buffer.name;
+		if (!this->_selectedBuffers.empty() && this->_selectedBuffers.count(bufferName) == 0)
+		{
+			continue;
+		}
+
+		// with a region selection, buffers without any selected region are left out
+		if (!this->_selectedRegions.empty() && std::none_of(buffer.regions.begin(), buffer.regions.end(),
+			[this](const MpcdiRegionRecord& region) { return this->_IsRegionSelected(region); }))
+		{
+			continue;
+		}
+
+		sourceData->CreatePrim(rootPath, bufferName, SdfSpecifier::SdfSpecifierDef, _tokens->Scope);
+		this->_pendingBuffers[rootPath.AppendChild(TfToken(bufferName)).GetString()] = i;
+	}
+
+	return true;
+}
+
+bool MpcdiDataProvider::ReadChildren(const std::string& primPath, std::shared_ptr<IEdfSourceData> sourceData)
+{
+	// only the buffer scopes have children left to create, the others were complete when created
+	auto it = this->_pendingBuffers.find(primPath);
+	if (it == this->_pendingBuffers.end())
+	{
+		return true;
+	}
+
+	const SdfPath bufferPath(primPath);
+	for (const MpcdiRegionRecord& region : this->_document->buffers[it->second].regions)
+	{
+		if (this->_IsRegionSelected(region))
+		{
+			this->_CreateRegion(bufferPath, region, sourceData);
+		}
+	}
+
+	// the document is not needed anymore once all the prims exist
+	this->_pendingBuffers.erase(it);
+	if (this->_pendingBuffers.empty())
+	{
+		this->_document.reset();
+	}
+
+	return true;
+}
+
+bool MpcdiDataProvider::IsDataCached() const
+{
+	return true;
+}
+
+bool MpcdiDataProvider::_IsRegionSelected(const MpcdiRegionRecord& region) const
+{
+	return this->_selectedRegions.empty() || this->_selectedRegions.count(region.name) != 0;
+}
+
+void MpcdiDataProvider::_CreateRegion(const SdfPath& bufferPath, const MpcdiRegionRecord& region, const std::shared_ptr<IEdfSourceData>& sourceData) const
+{
+	const SdfPath regionPath = bufferPath.AppendChild(TfToken(region.name));
+
+	// Frustum
+	const float frustumYaw = region.frustum[0] * -1.0f;
+	const float frustumPitch = region.frustum[1];
+	const float frustumRoll = region.frustum[2];
+	const float frustumRightAngle = region.frustum[3];
+	const float frustumLeftAngle = region.frustum[4];
+	const float frustumUpAngle = region.frustum[5];
+	const float frustumDownAngle = region.frustum[6];
+
+	constexpr const float toRad = 3.14159265358979323846 / 180.0;
+	constexpr const float focalLength = 10.0f;
+	constexpr const float focusDistance = 2000.0f;
+
+	const float tanRight = std::tan(frustumRightAngle * toRad);
+	const float tanLeft = std::tan(frustumLeftAngle * toRad);
+	const float tanUp = std::tan(frustumUpAngle * toRad);
+	const float tanDown = std::tan(frustumDownAngle * toRad);
+	const float apertureH = (std::abs(tanRight) + std::abs(tanLeft)) * focalLength;
+	const float apertureV = (std::abs(tanUp) + std::abs(tanDown)) * focalLength;
+	const float lightWidth = std::abs(tanRight) + std::abs(tanLeft);
+	const float lightHeight = std::abs(tanUp) + std::abs(tanDown);
+
+	const float lensShiftH = (tanLeft + tanRight) / (tanLeft - tanRight);
+	const float lensShiftV = (tanUp + tanDown) / (tanUp - tanDown);
+	const float apertureOffsetH = lensShiftH * apertureH / 2.0;
+	const float apertureOffsetV = lensShiftV * apertureV / 2.0;
+
+	// Coordinate frame
+	const float posScaling = 10.0f;
+	const float* frame = region.coordinateFrame;
+	const GfVec3f position(frame[0] * posScaling, frame[1] * posScaling, frame[2] * posScaling);
+
+	// rows are the pitch, yaw and roll axes
+	GfMatrix3f sourceToStandard = GfMatrix3f(frame[6], frame[7], frame[8], frame[3], frame[4], frame[5], frame[9], frame[10], frame[11]);
+	auto newPosition = sourceToStandard * position;
+	newPosition[1] = -newPosition[1];
+	newPosition[2] = -newPosition[2];
+
+	// Camera
+	sourceData->CreatePrim(bufferPath, region.name, SdfSpecifier::SdfSpecifierDef, _tokens->Camera);
+	sourceData->CreateAttribute(regionPath, _tokens->xformOpTranslate, SdfValueTypeNames->Double3,
+		SdfVariabilityVarying, VtValue(GfVec3d(newPosition * 10.0f)));
+	sourceData->CreateAttribute(regionPath, _tokens->xformOpRotateY, SdfValueTypeNames->Float, SdfVariabilityVarying, VtValue(frustumYaw));
+	sourceData->CreateAttribute(regionPath, _tokens->xformOpRotateX, SdfValueTypeNames->Float, SdfVariabilityVarying, VtValue(frustumPitch));
+	sourceData->CreateAttribute(regionPath, _tokens->xformOpRotateZ, SdfValueTypeNames->Float, SdfVariabilityVarying, VtValue(frustumRoll));
+	CreateXformOpOrder(regionPath, {_tokens->xformOpTranslate, _tokens->xformOpRotateY, _tokens->xformOpRotateX, _tokens->xformOpRotateZ}, sourceData);
+
+	// Camera attributes
+	sourceData->CreateAttribute(regionPath, UsdGeomTokens->focalLength, SdfValueTypeNames->Float, SdfVariabilityVarying, VtValue(focalLength));
+	sourceData->CreateAttribute(regionPath, UsdGeomTokens->focusDistance, SdfValueTypeNames->Float, SdfVariabilityVarying, VtValue(focusDistance));
+	sourceData->CreateAttribute(regionPath, UsdGeomTokens->horizontalAperture, SdfValueTypeNames->Float, SdfVariabilityVarying, VtValue(apertureH));
+	sourceData->CreateAttribute(regionPath, UsdGeomTokens->horizontalApertureOffset, SdfValueTypeNames->Float, SdfVariabilityVarying, VtValue(apertureOffsetH));
+	sourceData->CreateAttribute(regionPath, UsdGeomTokens->verticalAperture, SdfValueTypeNames->Float, SdfVariabilityVarying, VtValue(apertureV));
+	sourceData->CreateAttribute(regionPath, UsdGeomTokens->verticalApertureOffset, SdfValueTypeNames->Float, SdfVariabilityVarying, VtValue(apertureOffsetV));
+
+	if (this->_camerasOnly)
+	{
+		return;
+	}
+
+	// Light, named like the one of the Python converter
+	const SdfPath lightPath = regionPath.AppendChild(_tokens->ProjectLight);
+	sourceData->CreatePrim(regionPath, _tokens->ProjectLight, SdfSpecifier::SdfSpecifierDef, _tokens->RectLight);
+
+	const std::pair<TfToken, VtValue> customAttributes[] = {
+		{_tokens->isProjector, VtValue(true)},
+		{_tokens->exposure, VtValue(5.0f)},
+		{_tokens->intensity, VtValue(15000.0f)}
+	};
+	for (const auto& attribute : customAttributes)
+	{
+		const SdfValueTypeName typeName = attribute.second.IsHolding<bool>() ? SdfValueTypeNames->Bool : SdfValueTypeNames->Float;
+		sourceData->CreateAttribute(lightPath, attribute.first, typeName, SdfVariabilityVarying, attribute.second);
+		sourceData->SetField(lightPath.AppendProperty(attribute.first), SdfFieldKeys->Custom, VtValue(true));
+	}
+
+	sourceData->CreateAttribute(lightPath, UsdLuxTokens->inputsWidth, SdfValueTypeNames->Float, SdfVariabilityVarying, VtValue(lightWidth));
+	sourceData->CreateAttribute(lightPath, UsdLuxTokens->inputsHeight, SdfValueTypeNames->Float, SdfVariabilityVarying, VtValue(lightHeight));
+
+	// Projector box
+	const SdfPath cubePath = regionPath.AppendChild(_tokens->ProjectorBox);
+	sourceData->CreatePrim(regionPath, _tokens->ProjectorBox, SdfSpecifier::SdfSpecifierDef, _tokens->Cube);
+
+	const auto projectorBoxSize = GfVec3f(50, 15, 40);
+	const auto projectorBoxOffset = GfVec3d(0, 0, 42);
+	sourceData->CreateAttribute(cubePath, _tokens->xformOpTranslate, SdfValueTypeNames->Double3, SdfVariabilityVarying, VtValue(projectorBoxOffset));
+	sourceData->CreateAttribute(cubePath, _tokens->xformOpScale, SdfValueTypeNames->Float3, SdfVariabilityVarying, VtValue(projectorBoxSize));
+	CreateXformOpOrder(cubePath, {_tokens->xformOpTranslate, _tokens->xformOpScale}, sourceData);
+}
+
+EDF_DEFINE_DATAPROVIDER(MpcdiDataProvider, IEdfDataProvider);
+
+PXR_NAMESPACE_CLOSE_SCOPE
@@ -0,0 +1,79 @@
+// Copyright 2023 NVIDIA CORPORATION
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//  http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#ifndef OMNI_MPCDI_MPCDIDATAPROVIDER_H_
+#define OMNI_MPCDI_MPCDIDATAPROVIDER_H_
+
+#include <string>
+#include <unordered_map>
+#include <unordered_set>
+
+#include <pxr/pxr.h>
+#include <pxr/base/tf/staticTokens.h>
+
+#include "iMpcdiDataProvider.h"
+#include "mpcdiDocumentCache.h"
+
+PXR_NAMESPACE_OPEN_SCOPE
+
+TF_DECLARE_PUBLIC_TOKENS(
+	MpcdiDataProviderTokens,
+	// id of the provider, see plugInfo.json
+	((Id, "mpcdi"))
+	// provider argument holding the resolved path of the MPCDI document
+	(filePath)
+	// optional provider arguments selecting what is created, comma separated
+	// buffer and region prim names, and "1" to only create the cameras
+	(buffers)
+	(regions)
+	(camerasOnly)
+);
+
+/// \class MpcdiDataProvider
+///
+/// Reads an MPCDI document into the EdfData of a layer.
+/// The document is parsed on Read, or taken from MpcdiDocumentCache, and
+/// only the buffer scopes are created. The projectors of a buffer are created the first time its
+/// children are asked for.
+///
+class MpcdiDataProvider : public IEdfDataProvider
+{
+public:
+
+	MpcdiDataProvider(const EdfDataParameters& parameters);
+	virtual ~MpcdiDataProvider();
+
+	virtual bool Read(std::shared_ptr<IEdfSourceData> sourceData) override;
+	virtual bool ReadChildren(const std::string& primPath, std::shared_ptr<IEdfSourceData> sourceData) override;
+	virtual bool IsDataCached() const override;
+
+private:
+
+	bool _IsRegionSelected(const MpcdiRegionRecord& region) const;
+	void _CreateRegion(const SdfPath& bufferPath, const MpcdiRegionRecord& region, const std::shared_ptr<IEdfSourceData>& sourceData) const;
+
+	// shared with the other layers reading the same file, see MpcdiDocumentCache
+	std::shared_ptr<const MpcdiDocument> _document;
+	// buffers whose children were not read yet, index in _document by buffer prim path
+	std::unordered_map<std::string, size_t> _pendingBuffers;
+
+	// selection, everything is created when empty
+	std::unordered_set<std::string> _selectedBuffers;
+	std::unordered_set<std::string> _selectedRegions;
+	bool _camerasOnly;
+};
+
+PXR_NAMESPACE_CLOSE_SCOPE
+
+#endif
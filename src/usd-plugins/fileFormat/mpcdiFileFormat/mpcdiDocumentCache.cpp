@@ -0,0 +1,276 @@
+// Copyright 2023 NVIDIA CORPORATION
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//  http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "mpcdiDocumentCache.h"
+#include "tinyxml2.h"
+
+#include <pxr/base/arch/fileSystem.h>
+#include <pxr/base/tf/diagnostic.h>
+#include <pxr/base/tf/envSetting.h>
+#include <pxr/base/tf/instantiateSingleton.h>
+#include <pxr/base/tf/registryManager.h>
+#include <pxr/base/tf/stringUtils.h>
+
+#include <unordered_set>
+
+PXR_NAMESPACE_OPEN_SCOPE
+
+TF_INSTANTIATE_SINGLETON(MpcdiDocumentCache);
+
+TF_DEFINE_ENV_SETTING(MPCDI_DOCUMENT_CACHE_SIZE_MB, 64,
+	"Memory cap of the parsed MPCDI document cache in megabytes, 0 disables the cache.");
+
+TF_REGISTRY_FUNCTION(TfDebug)
+{
+	TF_DEBUG_ENVIRONMENT_SYMBOL(MPCDI_DOCUMENT_CACHE, "MPCDI parsed document cache hits, misses and evictions");
+}
+
+static const char* FRUSTUM_KEYS[] = {"yaw", "pitch", "roll", "rightAngle", "leftAngle", "upAngle", "downAngle"};
+static const char* COORDINATE_FRAME_KEYS[] = {
+	"posx", "posy", "posz",
+	"yawx", "yawy", "yawz",
+	"pitchx", "pitchy", "pitchz",
+	"rollx", "rolly", "rollz"
+};
+
+static std::string CleanNameForUSD(const std::string& name)
+{
+	std::string cleanedName = name;
+	if(cleanedName.size() == 0)
+	{
+		return "Default";
+	}
+
+	if(cleanedName.size() == 1 && !TfIsValidIdentifier(cleanedName))
+	{
+		// If we have an index as a name, we only need to add _ beforehand.
+		return CleanNameForUSD("_" + cleanedName);
+	}
+
+	return TfMakeValidIdentifier(cleanedName);
+}
+
+// reads the float text of the child elements named by keys, false if one is missing or malformed
+template <size_t N>
+static bool GetXMLFloats(const tinyxml2::XMLElement* node, const char* (&keys)[N], float (&values)[N])
+{
+	if (node == nullptr)
+	{
+		return false;
+	}
+
+	for (size_t i = 0; i < N; i++)
+	{
+		const tinyxml2::XMLElement* child = node->FirstChildElement(keys[i]);
+		if (child == nullptr || child->QueryFloatText(&values[i]) != tinyxml2::XML_SUCCESS)
+		{
+			return false;
+		}
+	}
+
+	return true;
+}
+
+std::shared_ptr<MpcdiDocument> MpcdiDocument::Load(const std::string& filePath)
+{
+	tinyxml2::XMLDocument doc;
+	if (doc.LoadFile(filePath.c_str()) != tinyxml2::XML_SUCCESS)
+	{
+		TF_CODING_ERROR("Failed to load xml file: " + filePath);
+		return nullptr;
+	}
+
+	const tinyxml2::XMLElement* rootNode = doc.RootElement();
+	const tinyxml2::XMLElement* displayNode = rootNode != nullptr ? rootNode->FirstChildElement("display") : nullptr;
+	if (displayNode == nullptr)
+	{
+		TF_CODING_ERROR("No display element in: " + filePath);
+		return nullptr;
+	}
+
+	std::shared_ptr<MpcdiDocument> document = std::make_shared<MpcdiDocument>();
+	std::unordered_map<std::string, size_t> bufferIndices;
+	std::vector<std::unordered_set<std::string>> regionNames;
+	for (const tinyxml2::XMLElement* buffer = displayNode->FirstChildElement("buffer"); buffer != nullptr; buffer = buffer->NextSiblingElement("buffer"))
+	{
+		const char* bufferId = buffer->Attribute("id");
+		const std::string bufferName = CleanNameForUSD(bufferId != nullptr ? bufferId : "");
+
+		// buffers sharing an id are merged into one record
+		auto inserted = bufferIndices.emplace(bufferName, document->buffers.size());
+		if (inserted.second)
+		{
+			document->buffers.push_back(MpcdiBufferRecord{bufferName, {}});
+			regionNames.emplace_back();
+		}
+
+		MpcdiBufferRecord& bufferRecord = document->buffers[inserted.first->second];
+		std::unordered_set<std::string>& bufferRegionNames = regionNames[inserted.first->second];
+		for (const tinyxml2::XMLElement* regionNode = buffer->FirstChildElement("region"); regionNode != nullptr; regionNode = regionNode->NextSiblingElement("region"))
+		{
+			const char* regionId = regionNode->Attribute("id");
+			MpcdiRegionRecord region;
+			region.name = CleanNameForUSD(regionId != nullptr ? regionId : "");
+			if (bufferRegionNames.count(region.name) != 0)
+			{
+				TF_WARN("Skipping duplicate region '%s' of buffer '%s' in %s", region.name.c_str(), bufferName.c_str(), filePath.c_str());
+				continue;
+			}
+
+			if (!GetXMLFloats(regionNode->FirstChildElement("frustum"), FRUSTUM_KEYS, region.frustum) ||
+				!GetXMLFloats(regionNode->FirstChildElement("coordinateFrame"), COORDINATE_FRAME_KEYS, region.coordinateFrame))
+			{
+				TF_WARN("Skipping region '%s' of buffer '%s' in %s, its frustum or coordinate frame is incomplete", region.name.c_str(), bufferName.c_str(), filePath.c_str());
+				continue;
+			}
+
+			bufferRegionNames.insert(region.name);
+			bufferRecord.regions.push_back(std::move(region));
+		}
+	}
+
+	return document;
+}
+
+size_t MpcdiDocument::GetMemorySize() const
+{
+	size_t size = sizeof(MpcdiDocument) + this->buffers.capacity() * sizeof(MpcdiBufferRecord);
+	for (const MpcdiBufferRecord& buffer : this->buffers)
+	{
+		size += buffer.name.capacity() + buffer.regions.capacity() * sizeof(MpcdiRegionRecord);
+		for (const MpcdiRegionRecord& region : buffer.regions)
+		{
+			size += region.name.capacity();
+		}
+	}
+
+	return size;
+}
+
+MpcdiDocumentCache& MpcdiDocumentCache::GetInstance()
+{
+	return TfSingleton<MpcdiDocumentCache>::GetInstance();
+}
+
+MpcdiDocumentCache::MpcdiDocumentCache()
+{
+	const int capacityMegabytes = TfGetEnvSetting(MPCDI_DOCUMENT_CACHE_SIZE_MB);
+	this->_stats.capacityBytes = capacityMegabytes > 0 ? static_cast<size_t>(capacityMegabytes) * 1024 * 1024 : 0;
+}
+
+MpcdiDocumentCache::~MpcdiDocumentCache()
+{
+}
+
+std::shared_ptr<const MpcdiDocument> MpcdiDocumentCache::Get(const std::string& resolvedPath)
+{
+	const int64_t fileSize = ArchGetFileLength(resolvedPath.c_str());
+	double modificationTime = 0.0;
+	if (fileSize < 0 || !ArchGetModificationTime(resolvedPath.c_str(), &modificationTime))
+	{
+		TF_CODING_ERROR("File doesn't exist with resolved path: " + resolvedPath);
+		return nullptr;
+	}
+
+	{
+		std::lock_guard<std::mutex> lock(this->_mutex);
+		auto it = this->_entries.find(resolvedPath);
+		if (it != this->_entries.end())
+		{
+			if (it->second.fileSize == fileSize && it->second.modificationTime == modificationTime)
+			{
+				this->_stats.hits++;
+				this->_lru.splice(this->_lru.begin(), this->_lru, it->second.lruPosition);
+				TF_DEBUG(MPCDI_DOCUMENT_CACHE).Msg("MPCDI document cache hit: %s (%zu hits, %zu misses)\n",
+					resolvedPath.c_str(), this->_stats.hits, this->_stats.misses);
+
+				return it->second.document;
+			}
+
+			this->_stats.invalidations++;
+			TF_DEBUG(MPCDI_DOCUMENT_CACHE).Msg("MPCDI document cache invalidated: %s\n", resolvedPath.c_str());
+			this->_Erase(it);
+		}
+
+		this->_stats.misses++;
+	}
+
+	// parsed without holding the lock, a file being parsed does not block the others
+	std::shared_ptr<const MpcdiDocument> document = MpcdiDocument::Load(resolvedPath);
+	if (document == nullptr)
+	{
+		return nullptr;
+	}
+
+	const size_t bytes = document->GetMemorySize();
+	std::lock_guard<std::mutex> lock(this->_mutex);
+	TF_DEBUG(MPCDI_DOCUMENT_CACHE).Msg("MPCDI document cache miss: %s, %zu bytes (%zu hits, %zu misses)\n",
+		resolvedPath.c_str(), bytes, this->_stats.hits, this->_stats.misses);
+	if (bytes > this->_stats.capacityBytes)
+	{
+		// larger than the whole cache, or the cache is disabled
+		return document;
+	}
+
+	// another thread may have stored the same file meanwhile
+	auto it = this->_entries.find(resolvedPath);
+	if (it != this->_entries.end())
+	{
+		this->_Erase(it);
+	}
+
+	this->_lru.push_front(resolvedPath);
+	this->_entries[resolvedPath] = _Entry{fileSize, modificationTime, bytes, document, this->_lru.begin()};
+	this->_stats.entries++;
+	this->_stats.bytes += bytes;
+	this->_Evict();
+
+	return document;
+}
+
+MpcdiDocumentCacheStats MpcdiDocumentCache::GetStats() const
+{
+	std::lock_guard<std::mutex> lock(this->_mutex);
+	return this->_stats;
+}
+
+void MpcdiDocumentCache::Clear()
+{
+	std::lock_guard<std::mutex> lock(this->_mutex);
+	this->_entries.clear();
+	this->_lru.clear();
+	this->_stats.entries = 0;
+	this->_stats.bytes = 0;
+}
+
+void MpcdiDocumentCache::_Erase(std::unordered_map<std::string, _Entry>::iterator it)
+{
+	this->_stats.entries--;
+	this->_stats.bytes -= it->second.bytes;
+	this->_lru.erase(it->second.lruPosition);
+	this->_entries.erase(it);
+}
+
+void MpcdiDocumentCache::_Evict()
+{
+	while (this->_stats.bytes > this->_stats.capacityBytes && !this->_lru.empty())
+	{
+		auto it = this->_entries.find(this->_lru.back());
+		TF_DEBUG(MPCDI_DOCUMENT_CACHE).Msg("MPCDI document cache evicted: %s\n", it->first.c_str());
+		this->_stats.evictions++;
+		this->_Erase(it);
+	}
+}
+
+PXR_NAMESPACE_CLOSE_SCOPE
@@ -0,0 +1,148 @@
+// Copyright 2023 NVIDIA CORPORATION
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//  http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#ifndef OMNI_MPCDI_MPCDIDOCUMENTCACHE_H_
+#define OMNI_MPCDI_MPCDIDOCUMENTCACHE_H_
+
+#include <cstdint>
+#include <list>
+#include <memory>
+#include <mutex>
+#include <string>
+#include <unordered_map>
+#include <vector>
+
+#include <pxr/pxr.h>
+#include <pxr/base/tf/debug.h>
+#include <pxr/base/tf/singleton.h>
+
+#include "api.h"
+
+PXR_NAMESPACE_OPEN_SCOPE
+
+TF_DEBUG_CODES(
+	MPCDI_DOCUMENT_CACHE
+);
+
+/// \struct MpcdiRegionRecord
+///
+/// Values read from a <region> element.
+///
+struct MpcdiRegionRecord
+{
+	// valid USD identifier made from the region id
+	std::string name;
+	// yaw, pitch, roll, rightAngle, leftAngle, upAngle, downAngle
+	float frustum[7];
+	// posx, posy, posz, yawx, yawy, yawz, pitchx, pitchy, pitchz, rollx, rolly, rollz
+	float coordinateFrame[12];
+};
+
+/// \struct MpcdiBufferRecord
+///
+/// The regions of a <buffer> element, buffers sharing an id are merged.
+///
+struct MpcdiBufferRecord
+{
+	// valid USD identifier made from the buffer id
+	std::string name;
+	std::vector<MpcdiRegionRecord> regions;
+};
+
+/// \struct MpcdiDocument
+///
+/// Projector records of a parsed MPCDI document, in document order.
+///
+struct MpcdiDocument
+{
+	std::vector<MpcdiBufferRecord> buffers;
+
+	/// Parses the document at the given path, returns null on failure.
+	MPCDI_API static std::shared_ptr<MpcdiDocument> Load(const std::string& filePath);
+
+	/// Approximate number of bytes held by the records.
+	MPCDI_API size_t GetMemorySize() const;
+};
+
+/// \struct MpcdiDocumentCacheStats
+///
+struct MpcdiDocumentCacheStats
+{
+	size_t hits = 0;
+	size_t misses = 0;
+	// entries dropped to stay under the memory cap
+	size_t evictions = 0;
+	// entries dropped because their file changed
+	size_t invalidations = 0;
+	size_t entries = 0;
+	size_t bytes = 0;
+	size_t capacityBytes = 0;
+};
+
+/// \class MpcdiDocumentCache
+///
+/// Process-wide cache of parsed MPCDI documents, so that a document
+/// referenced from many layers is only parsed once.
+/// Entries are keyed by resolved path and are valid as long as the size
+/// and modification time of the file do not change. The least recently
+/// used entries are evicted above MPCDI_DOCUMENT_CACHE_SIZE_MB.
+///
+class MpcdiDocumentCache
+{
+public:
+	MPCDI_API static MpcdiDocumentCache& GetInstance();
+
+	// prevent copying and assignment
+	MpcdiDocumentCache(const MpcdiDocumentCache&) = delete;
+	MpcdiDocumentCache& operator=(const MpcdiDocumentCache&) = delete;
+
+	/// Returns the parsed document at the given path, parsing it on a miss.
+	/// Returns null when the document cannot be read.
+	MPCDI_API std::shared_ptr<const MpcdiDocument> Get(const std::string& resolvedPath);
+
+	MPCDI_API MpcdiDocumentCacheStats GetStats() const;
+	MPCDI_API void Clear();
+
+private:
+
+	MpcdiDocumentCache();
+	~MpcdiDocumentCache();
+
+	struct _Entry
+	{
+		int64_t fileSize;
+		double modificationTime;
+		size_t bytes;
+		std::shared_ptr<const MpcdiDocument> document;
+		// position in _lru
+		std::list<std::string>::iterator lruPosition;
+	};
+
+	void _Erase(std::unordered_map<std::string, _Entry>::iterator it);
+	void _Evict();
+
+	friend class TfSingleton<MpcdiDocumentCache>;
+
+private:
+
+	mutable std::mutex _mutex;
+	std::unordered_map<std::string, _Entry> _entries;
+	// most recently used first
+	std::list<std::string> _lru;
+	MpcdiDocumentCacheStats _stats;
+};
+
+PXR_NAMESPACE_CLOSE_SCOPE
+
+#endif
@@ -13,32 +13,17 @@
 // limitations under the License.
 
 #include "mpcdiFileFormat.h"
-#include "tinyxml2.h"
+#include "mpcdiData.h"
+#include "mpcdiDataProvider.h"
 
 #include <pxr/pxr.h>
 
 #include <pxr/base/tf/diagnostic.h>
+#include <pxr/base/tf/stl.h>
 #include <pxr/base/tf/stringUtils.h>
 #include <pxr/base/tf/token.h>
-
-#include <pxr/usd/usd/prim.h>
-#include <pxr/usd/usd/stage.h>
-#include <pxr/usd/usd/usdaFileFormat.h>
-
-#include <pxr/usd/usdGeom/mesh.h>
-#include <pxr/usd/usdGeom/scope.h>
-#include <pxr/usd/usdGeom/camera.h>
-#include <pxr/usd/usdGeom/cube.h>
-#include <pxr/usd/usdGeom/xformable.h>
-#include <pxr/usd/usdGeom/xform.h>
-
-#include <pxr/usd/usdLux/rectLight.h>
-
-#include <pxr/base/gf/matrix3f.h>
-#include <pxr/base/gf/vec3f.h>
-
-#include <fstream>
-#include <cmath>
+#include <pxr/base/vt/array.h>
+#include <pxr/base/vt/types.h>
 
 PXR_NAMESPACE_OPEN_SCOPE
 
@@ -54,247 +39,49 @@ MpcdiFileFormat::~MpcdiFileFormat()
 {
 }
 
-static const double defaultSideLengthValue = 1.0;
-
-
-static double _ExtractSideLengthFromContext(const PcpDynamicFileFormatContext& context)
-{
-    // Default sideLength.
-    double sideLength = defaultSideLengthValue;
-
-    VtValue value;
-    if (!context.ComposeValue(MpcdiFileFormatTokens->SideLength,
-                              &value) ||
-        value.IsEmpty()) {
-        return sideLength;
-    }
-
-    if (!value.IsHolding<double>()) {
-       
-        return sideLength;
-    }
-
-    return value.UncheckedGet<double>();
-}
-
-static double
-_ExtractSideLengthFromArgs(const SdfFileFormat::FileFormatArguments& args)
-{
-    // Default sideLength.
-    double sideLength = defaultSideLengthValue;
-
-    // Find "sideLength" file format argument.
-    auto it = args.find(MpcdiFileFormatTokens->SideLength);
-    if (it == args.end()) {
-        return sideLength;
-    }
-
-    // Try to convert the string value to the actual output value type.
-    double extractVal;
-    bool success = true;
-    extractVal = TfUnstringify<double>(it->second, &success);
-    if (!success) {
-        
-        return sideLength;
-    }
-
-    sideLength = extractVal;
-    return sideLength;
-}
+// same root as the Python converter, see converter.MPCDI_ROOT_PATH
+static const char* DEFAULT_ROOT_NAME = "MPCDI";
 
 bool MpcdiFileFormat::CanRead(const std::string& filePath) const
 {
 	return true;
 }
 
-static float GetXMLFloat(tinyxml2::XMLElement* node, const std::string key)
-{
-	return std::stof(node->FirstChildElement(key.c_str())->GetText());
-}
-
-static std::string CleanNameForUSD(const std::string& name)
+bool MpcdiFileFormat::Read(SdfLayer* layer, const std::string& resolvedPath, bool metadataOnly) const
 {
-	std::string cleanedName = name;
-	if(cleanedName.size() == 0)
+	// the layer data is backed by a data provider, which creates the buffer
+	// scopes on Read and their projectors when they are first traversed
+	EdfDataParameters parameters = EdfDataParameters::FromFileFormatArgs(layer->GetFileFormatArguments());
+	if (parameters.dataProviderId.empty())
 	{
-		return "Default";
+		parameters.dataProviderId = MpcdiDataProviderTokens->Id;
 	}
 
-	if(cleanedName.size() == 1 && !TfIsValidIdentifier(cleanedName))
+	if (parameters.rootName.empty())
 	{
-		// If we have an index as a name, we only need to add _ beforehand.
-		return CleanNameForUSD("_" + cleanedName);
+		parameters.rootName = DEFAULT_ROOT_NAME;
 	}
 
-	return TfMakeValidIdentifier(cleanedName);
-}
-
-bool MpcdiFileFormat::Read(SdfLayer* layer, const std::string& resolvedPath, bool metadataOnly) const
-{
-	// these macros emit methods defined in the Pixar namespace
-	// but not properly scoped, so we have to use the namespace
-	// locally here - note this isn't strictly true since we had to open
-	// the namespace scope anyway because the macros won't allow non-Pixar namespaces
-	// to be used because of some auto-generated content
+	parameters.providerArgs[MpcdiDataProviderTokens->filePath] = resolvedPath;
 
-	// Read file, file exists?
-	const std::ifstream filePath(resolvedPath);
-	if(!filePath.good())
+	// the selection composed by ComposeFieldsForFileFormatArguments is applied by the provider
+	const FileFormatArguments& args = layer->GetFileFormatArguments();
+	for (const TfToken& argument : {MpcdiDataProviderTokens->buffers, MpcdiDataProviderTokens->regions, MpcdiDataProviderTokens->camerasOnly})
 	{
-		TF_CODING_ERROR("File doesn't exist with resolved path: " + resolvedPath);
-		return false;
-	}
-	
-	// Read XML file
-	tinyxml2::XMLDocument doc;
-	const tinyxml2::XMLError xmlReadSuccess = doc.LoadFile(resolvedPath.c_str());
-	if(xmlReadSuccess != 0)
-	{
-		TF_CODING_ERROR("Failed to load xml file: " + resolvedPath);
-		return false;
+		if (const std::string* value = TfMapLookupPtr(args, argument))
+		{
+			parameters.providerArgs[argument] = *value;
+		}
 	}
 
-	// Parsing of MPCDI data
-	tinyxml2::XMLElement* rootNode = doc.RootElement();
-	if(rootNode == nullptr)
+	EdfDataRefPtr data = EdfData::CreateFromParameters(parameters);
+	if (!data->Read())
 	{
-		TF_CODING_ERROR("XML Root node is null: " + resolvedPath);
 		return false;
 	}
-	
-	// Create a new anonymous layer and wrap a stage around it.
-	SdfLayerRefPtr newLayer = SdfLayer::CreateAnonymous(".usd");
-	UsdStageRefPtr stage = UsdStage::Open(newLayer);
-
-	const auto& xformPath = SdfPath("/mpcdi_payload");
-	auto mpdiScope = UsdGeomXform::Define(stage, xformPath);
-	stage->SetDefaultPrim(mpdiScope.GetPrim());
-
-	auto displayNode = rootNode->FirstChildElement("display");
-	for(auto* buffer = displayNode->FirstChildElement("buffer"); buffer != nullptr; buffer = buffer->NextSiblingElement("buffer"))
-	{
-		const std::string bufferId = std::string(buffer->Attribute("id"));
-
-		std::string bufferIdentifier = CleanNameForUSD(bufferId);
-
-		SdfPath bufferPath = xformPath.AppendChild(TfToken(bufferIdentifier));
-		auto bufferScope = UsdGeomScope::Define(stage, bufferPath);
-		
-		// Get region
-		for(auto* regionNode = buffer->FirstChildElement("region"); regionNode != nullptr; regionNode = regionNode->NextSiblingElement("region"))
-		{
-			const std::string regionId = std::string(regionNode->Attribute("id"));
-			const std::string cleanedRegionId = CleanNameForUSD(regionId);
-
-			SdfPath regionPath = bufferPath.AppendChild(TfToken(cleanedRegionId));
-
-			// Get Frustum
-			auto frustumNode = regionNode->FirstChildElement("frustum");
-			const auto frustumYaw = GetXMLFloat(frustumNode, "yaw") * -1.0f;
-			const auto frustumPitch = GetXMLFloat(frustumNode, "pitch");
-			const auto frustumRoll = GetXMLFloat(frustumNode, "roll");
-			const auto frustumRightAngle = GetXMLFloat(frustumNode, "rightAngle");
-			const auto frustumLeftAngle = GetXMLFloat(frustumNode, "leftAngle");
-			const auto frustumUpAngle = GetXMLFloat(frustumNode, "upAngle");
-			const auto frustumDownAngle = GetXMLFloat(frustumNode, "downAngle");
 
-			constexpr const float toRad = 3.14159265358979323846 / 180.0;
-			constexpr const float focalLength = 10.0f;
-			constexpr const float focusDistance = 2000.0f;
-
-			const float tanRight = std::tan(frustumRightAngle * toRad);
-			const float tanLeft = std::tan(frustumLeftAngle * toRad);
-			const float tanUp = std::tan(frustumUpAngle * toRad);
-			const float tanDown = std::tan(frustumDownAngle * toRad);
-			const float apertureH = (std::abs(tanRight) + std::abs(tanLeft)) * focalLength;
-			const float apertureV = (std::abs(tanUp) + std::abs(tanDown)) * focalLength;
-			const float lightWidth = std::abs(tanRight) + std::abs(tanLeft);
-			const float lightHeight = std::abs(tanUp) + std::abs(tanDown);
-
-			const float lensShiftH = (tanLeft + tanRight) / (tanLeft - tanRight);
-			const float lensShiftV = (tanUp + tanDown) / (tanUp - tanDown);
-			const float apertureOffsetH = lensShiftH * apertureH / 2.0;
-			const float apertureOffsetV = lensShiftV * apertureV / 2.0;
-
-			// Coordinate frame
-			const float posScaling = 10.0f;
-			auto coordFrameNode = regionNode->FirstChildElement("coordinateFrame");
-			const auto posX = GetXMLFloat(coordFrameNode, "posx") * posScaling;
-			const auto posY = GetXMLFloat(coordFrameNode, "posy") * posScaling;
-			const auto posZ = GetXMLFloat(coordFrameNode, "posz") * posScaling;
-
-			const auto yawX = GetXMLFloat(coordFrameNode, "yawx");
-			const auto yawY = GetXMLFloat(coordFrameNode, "yawy");
-			const auto yawZ = GetXMLFloat(coordFrameNode, "yawz");
-			const auto pitchX = GetXMLFloat(coordFrameNode, "pitchx");
-			const auto pitchY = GetXMLFloat(coordFrameNode, "pitchy");
-			const auto pitchZ = GetXMLFloat(coordFrameNode, "pitchz");
-			const auto rollX = GetXMLFloat(coordFrameNode, "rollx");
-			const auto rollY = GetXMLFloat(coordFrameNode, "rolly");
-			const auto rollZ = GetXMLFloat(coordFrameNode, "rollz");
-
-			GfMatrix3f sourceToStandard = GfMatrix3f(pitchX, pitchY, pitchZ, yawX, yawY, yawZ, rollX, rollY, rollZ);
-			auto newPosition = sourceToStandard * GfVec3f(posX, posY, posZ);
-			newPosition[1] = -newPosition[1];
-			newPosition[2] = -newPosition[2];
-
-			// Camera
-			UsdGeomCamera camera = UsdGeomCamera::Define(stage, regionPath);
-
-			// Camera transform
-			auto cameraXform = UsdGeomXformable(camera);
-    		auto translateOperation = cameraXform.AddTranslateOp(UsdGeomXformOp::PrecisionFloat);
-			translateOperation.Set<GfVec3f>(newPosition * 10.0);
-			cameraXform.AddRotateYOp().Set(frustumYaw);
-			cameraXform.AddRotateXOp().Set(frustumPitch);
-			cameraXform.AddRotateZOp().Set(frustumRoll);
-
-			// Set camera attributes
-			camera.GetFocalLengthAttr().Set(focalLength);
-			camera.GetFocusDistanceAttr().Set(focusDistance);
-			camera.GetHorizontalApertureAttr().Set(apertureH);
-			camera.GetHorizontalApertureOffsetAttr().Set(apertureOffsetH);
-			camera.GetVerticalApertureAttr().Set(apertureV);
-			camera.GetVerticalApertureOffsetAttr().Set(apertureOffsetV);
-
-			// Light
-			SdfPath lightPath = regionPath.AppendChild(TfToken("RectLight"));
-			auto rectLight = UsdLuxRectLight::Define(stage, lightPath);
-			auto lightXform = UsdGeomXformable(rectLight);
-    		auto lightTranslateOperation = lightXform.AddTranslateOp(UsdGeomXformOp::PrecisionFloat);
-
-			rectLight.GetPrim().CreateAttribute(
-				TfToken("isProjector"), 
-				SdfValueTypeNames->Bool
-    		).Set(true);
-
-			rectLight.GetPrim().CreateAttribute(
-				TfToken("exposure"), 
-				SdfValueTypeNames->Float
-    		).Set(5.0f);
-
-			rectLight.GetPrim().CreateAttribute(
-				TfToken("intensity"), 
-				SdfValueTypeNames->Float
-    		).Set(15000.0f);
-
-			rectLight.GetWidthAttr().Set(lightWidth);
-			rectLight.GetHeightAttr().Set(lightHeight);
-
-			// Projector box
-			SdfPath cubePath = regionPath.AppendChild(TfToken("ProjectorBox"));
-			UsdGeomCube projectorBoxMesh = UsdGeomCube::Define(stage, cubePath);
-			
-			const auto projectorBoxSize = GfVec3f(50, 15, 40);
-			const auto projectorBoxOffset = GfVec3f(0, 0, 42);
-			auto projectorBoxXform = UsdGeomXformable(projectorBoxMesh);
-    		projectorBoxXform.AddTranslateOp(UsdGeomXformOp::PrecisionFloat).Set<GfVec3f>(projectorBoxOffset);
-			projectorBoxXform.AddScaleOp(UsdGeomXformOp::PrecisionFloat).Set<GfVec3f>(projectorBoxSize);
-		}
-	}
-
-    // Copy contents into output layer.
-    layer->TransferContent(newLayer);
+	SdfAbstractDataRefPtr layerData = data;
+	_SetLayerData(layer, layerData);
 
 	return true;
 }
@@ -311,42 +98,62 @@ bool MpcdiFileFormat::WriteToStream(const SdfSpecHandle& spec, std::ostream& out
 	return false;
 }
 
-/*
-void MpcdiFileFormat::ComposeFieldsForFileFormatArguments(const std::string& assetPath, const PcpDynamicFileFormatContext& context, FileFormatArguments* args, VtValue* contextDependencyData) const
+// joins the names held by a string[] metadata value, empty when there are none
+static std::string _JoinNames(const VtValue& value)
 {
-	 // Default sideLength.
-    double sideLength = 1.0;
+	if (!value.IsHolding<VtStringArray>())
+	{
+		return std::string();
+	}
 
-    VtValue value;
-    if (!context.ComposeValue(MpcdiFileFormatTokens->SideLength,
-                              &value) ||
-        value.IsEmpty()) {
+	const VtStringArray& names = value.UncheckedGet<VtStringArray>();
+	return TfStringJoin(names.begin(), names.end(), ",");
+}
 
-    }
+static bool _IsTrue(const VtValue& value)
+{
+	return value.IsHolding<bool>() && value.UncheckedGet<bool>();
+}
 
-    if (!value.IsHolding<double>()) {
-        // error;
-    }
+void MpcdiFileFormat::ComposeFieldsForFileFormatArguments(const std::string& assetPath, const PcpDynamicFileFormatContext& context, FileFormatArguments* args, VtValue* contextDependencyData) const
+{
+	// arguments are only added for an actual selection, so that unfiltered
+	// references to a document share the same layer
+	VtValue value;
+	if (context.ComposeValue(MpcdiFileFormatTokens->BuffersMetadata, &value))
+	{
+		const std::string buffers = _JoinNames(value);
+		if (!buffers.empty())
+		{
+			(*args)[MpcdiDataProviderTokens->buffers] = buffers;
+		}
+	}
 
-    double length;
+	if (context.ComposeValue(MpcdiFileFormatTokens->RegionsMetadata, &value))
+	{
+		const std::string regions = _JoinNames(value);
+		if (!regions.empty())
+		{
+			(*args)[MpcdiDataProviderTokens->regions] = regions;
+		}
+	}
 
-    (*args)[MpcdiFileFormatTokens->SideLength] = TfStringify(sideLength);
+	if (context.ComposeValue(MpcdiFileFormatTokens->CamerasOnlyMetadata, &value) && _IsTrue(value))
+	{
+		(*args)[MpcdiDataProviderTokens->camerasOnly] = "1";
+	}
 }
 
 bool MpcdiFileFormat::CanFieldChangeAffectFileFormatArguments(const TfToken& field, const VtValue& oldValue, const VtValue& newValue, const VtValue& contextDependencyData) const
 {
-	// Check if the "sideLength" argument changed.
-    double oldLength = oldValue.IsHolding<double>()
-                           ? oldValue.UncheckedGet<double>()
-                           : 1.0;
-    double newLength = newValue.IsHolding<double>()
-                           ? newValue.UncheckedGet<double>()
-                           : 1.0;
-
-    return oldLength != newLength;
+	if (field == MpcdiFileFormatTokens->CamerasOnlyMetadata)
+	{
+		return _IsTrue(oldValue) != _IsTrue(newValue);
+	}
 
+	return _JoinNames(oldValue) != _JoinNames(newValue);
 }
-*/
+
 // these macros emit methods defined in the Pixar namespace
 // but not properly scoped, so we have to use the namespace
 // locally here
@@ -356,7 +163,10 @@ TF_DEFINE_PUBLIC_TOKENS(
 	((Version, "1.0"))
 	((Target, "usd"))
 	((Extension, "xml"))
-	((SideLength, "Usd_Triangle_SideLength"))
+	// prim metadata composed into the file format arguments, see plugInfo.json
+	((BuffersMetadata, "mpcdiBuffers"))
+	((RegionsMetadata, "mpcdiRegions"))
+	((CamerasOnlyMetadata, "mpcdiCamerasOnly"))
 );
 
 TF_REGISTRY_FUNCTION(TfType)
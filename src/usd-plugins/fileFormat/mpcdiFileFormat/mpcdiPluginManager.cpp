@@ -43,6 +43,7 @@ MPCDIPluginManager::~MPCDIPluginManager()
 std::unique_ptr<IEdfDataProvider> MPCDIPluginManager::CreateDataProvider(const std::string& dataProviderId, const EdfDataParameters& parameters)
 {
 	// load the plugins if not already loaded
+	std::lock_guard<std::mutex> lock(this->_mutex);
 	this->_GetDataProviders();
 
 	// attempt to find the plugin responsible for the data provider id
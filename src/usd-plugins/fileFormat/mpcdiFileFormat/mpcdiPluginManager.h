@@ -15,6 +15,7 @@
 #ifndef OMNI_MPCDI_MPCDIPLUGINMANAGER_H_
 #define OMNI_MPCDI_MPCDIPLUGINMANAGER_H_
 
+#include <mutex>
 #include <string>
 #include <unordered_map>
 
@@ -64,6 +65,8 @@ private:
 
 private:
 
+	// layers can be opened from several threads at once
+	std::mutex _mutex;
 	bool _pluginsLoaded;
 	std::unordered_map<std::string, _DataProviderInfo> _dataProviderPlugins;
 };